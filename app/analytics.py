@@ -1,32 +1,25 @@
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import Optional, Dict, Any
-import mysql.connector
+from typing import Optional, Dict, Any, List
 from mysql.connector import Error
 import uuid
 import json as json_lib
 import hashlib
+from .db_pool import db_pool
+from .analytics_queue import AnalyticsEventQueue
+from .rollups import RollupDeltas
+from . import rollups
+from .config import settings
 
 router = APIRouter()
 
-# MySQL Configuration
-MYSQL_CONFIG = {
-    "host": "localhost",
-    "port": 3306,
-    "user": "nirbhay",
-    "password": "Nirbhay@123",
-    "database": "chatbot_analytics"
-}
-
 def get_db_connection():
     try:
-        connection = mysql.connector.connect(**MYSQL_CONFIG)
-        if connection.is_connected():
-            return connection
+        return db_pool.get_connection()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         raise HTTPException(status_code=500, detail="Database connection error")
-    return None
 
 def execute_query(query: str, params: tuple = None, fetch: bool = True, connection=None) -> Optional[Dict[str, Any]]:
     """Execute a query with optional connection for transactions"""
@@ -62,329 +55,430 @@ def execute_query(query: str, params: tuple = None, fetch: bool = True, connecti
     finally:
         if cursor:
             cursor.close()
-        if close_connection and connection and connection.is_connected():
+        if close_connection and connection:
             connection.close()
 
-def record_user_event(user_id: str, session_id: str, event_type: str, event_data: Dict = None):
+def record_user_event(user_id: str, session_id: str, event_type: str, event_data: Dict = None,
+                      timestamp: datetime = None):
     if not user_id:
         print("Warning: No user_id provided for analytics event")
         return
 
-    timestamp = datetime.now().isoformat()
-    page_url = event_data.get('page_url') if event_data else None
-    duration = event_data.get('duration') if event_data else 0
+    event = {
+        "user_id": user_id,
+        "session_id": session_id,
+        "event_type": event_type,
+        "event_data": event_data or {},
+        "timestamp": (timestamp or datetime.now()).isoformat()
+    }
+
+    # Hand the event to the write-behind queue so analytics never adds
+    # latency to the chat path; fall back to a direct write when the
+    # queue is not running (scripts, tests)
+    if event_queue.running:
+        event_queue.enqueue(event)
+        return
 
-    connection = None
     try:
         print(f"Recording analytics event: {event_type} for user {user_id} session {session_id}")
-        connection = get_db_connection()
-        connection.autocommit = False  # Enable transaction mode
-        
-        # Check if user exists
-        user = execute_query(
-            "SELECT * FROM users WHERE user_id = %s",
-            (user_id,),
-            fetch=True,
+        with db_pool.transaction() as connection:
+            apply_event_batch(connection, [event])
+        print(f"Successfully committed analytics event: {event_type}")
+    except Error as e:
+        print(f"Error recording user event {event_type}: {e}")
+        print("Analytics transaction rolled back")
+        # Don't raise HTTPException here to avoid breaking the main flow
+    except Exception as e:
+        print(f"Unexpected error recording user event {event_type}: {e}")
+        print("Analytics transaction rolled back")
+
+def flush_event_batch(events: List[Dict[str, Any]]):
+    """Write a batch of queued events in a single transaction"""
+    with db_pool.transaction() as connection:
+        apply_event_batch(connection, events)
+
+def insert_rows(connection, statement: str, row_template: str, rows: List[tuple], suffix: str = ""):
+    """Run one multi-row INSERT for all ``rows``"""
+    if not rows:
+        return
+    values = ", ".join([row_template] * len(rows))
+    params = tuple(value for row in rows for value in row)
+    execute_query(f"{statement} VALUES {values} {suffix}", params, fetch=False, connection=connection)
+
+def apply_event_batch(connection, events: List[Dict[str, Any]]):
+    """Apply analytics events, in order, inside the caller's transaction.
+
+    Users touched by the batch are upserted with one statement, chat
+    messages are buffered and written with one multi-row INSERT,
+    per-session counters are folded into a single UPDATE per session and
+    dashboard rollups receive one upsert per table.
+    """
+    rollup = RollupDeltas()
+
+    # 1) Create or touch every user referenced by the batch
+    last_seen = {}
+    for event in events:
+        user_id = event["user_id"]
+        last_seen[user_id] = max(last_seen.get(user_id, event["timestamp"]), event["timestamp"])
+    insert_rows(
+        connection,
+        """
+        INSERT INTO users 
+          (user_id, first_seen_at, last_active_at, total_sessions, total_messages, total_duration, total_conversations, is_active)
+        """,
+        "(%s, %s, %s, 0, 0, 0, 0, TRUE)",
+        [(user_id, timestamp, timestamp) for user_id, timestamp in last_seen.items()],
+        "ON DUPLICATE KEY UPDATE last_active_at = VALUES(last_active_at)"
+    )
+
+    # 2) Walk the events in order
+    messages = []           # rows for the multi-row INSERT INTO messages
+    user_messages = {}      # user_id -> questions asked in this batch
+    session_updates = {}    # session_id -> {"messages": n, column: latest value}
+    conversations = {}      # session_id -> active conversation_id
+    open_questions = {}     # conversation_id -> latest user message_id awaiting a reply
+
+    for event in events:
+        user_id = event["user_id"]
+        session_id = event["session_id"]
+        event_type = event["event_type"]
+        event_data = event["event_data"]
+        timestamp = event["timestamp"]
+
+        if event_type == "question_asked":
+            conversation_id = _ensure_conversation(connection, event, conversations, rollup)
+            message_id = str(uuid.uuid4())
+            messages.append((message_id, conversation_id, user_id, 'user', event_data.get('question', ''), timestamp, None, None))
+            open_questions[conversation_id] = message_id
+            rollup.add(timestamp, "user_messages")
+            user_messages[user_id] = user_messages.get(user_id, 0) + 1
+            if event_data.get('user_location'):
+                updates = session_updates.setdefault(session_id, {})
+                updates['location_data'] = json_lib.dumps(event_data['user_location'])
+
+        elif event_type == "bot_response":
+            conversation_id = conversations.get(session_id) or _find_active_conversation(connection, session_id)
+            if conversation_id:
+                conversations[session_id] = conversation_id
+                # Link the answer to the question it replies to, once, at write time
+                reply_to = open_questions.pop(conversation_id, None) or _latest_question(connection, conversation_id)
+                response_time = event_data.get("response_time")
+                response_time_ms = int(response_time * 1000) if response_time is not None else None
+                messages.append((str(uuid.uuid4()), conversation_id, user_id, 'bot', event_data.get("response", ""), timestamp, reply_to, response_time_ms))
+                rollup.add(timestamp, "bot_messages")
+                # Each answered question counts as one interaction on the session
+                updates = session_updates.setdefault(session_id, {})
+                updates['messages'] = updates.get('messages', 0) + 1
+                updates['last_message_time'] = timestamp
+            else:
+                print(f"Warning: No active conversation found for session {session_id}")
+
+        elif event_type == "session_update":
+            updates = session_updates.setdefault(session_id, {})
+            if event_data.get('page_url'):
+                updates['page_url'] = event_data['page_url']
+
+        else:
+            # These events may close or re-key the conversation, so write the
+            # buffered messages first to keep them in order
+            _write_messages(connection, messages)
+            messages = []
+            conversations.pop(session_id, None)
+            _apply_session_event(connection, event, rollup)
+
+    _write_messages(connection, messages)
+    rollup.write(connection)
+
+    # 3) Fold the per-event counter updates into one statement per table/session
+    if user_messages:
+        cases = " ".join(["WHEN %s THEN %s"] * len(user_messages))
+        placeholders = ", ".join(["%s"] * len(user_messages))
+        params = tuple(value for item in user_messages.items() for value in item) + tuple(user_messages)
+        execute_query(
+            f"""
+            UPDATE users
+            SET total_messages = total_messages + CASE user_id {cases} ELSE 0 END
+            WHERE user_id IN ({placeholders})
+            """,
+            params,
+            fetch=False,
             connection=connection
         )
 
-        if not user:
-            print(f"Creating new user: {user_id}")
-            # Create new user with all counters initialized to 0
-            execute_query(
-                """
-                INSERT INTO users 
-                  (user_id, first_seen_at, last_active_at, total_sessions, total_messages, total_duration, total_conversations, is_active)
-                VALUES (%s, %s, %s, 0, 0, 0, 0, TRUE)
-                """,
-                (user_id, timestamp, timestamp),
-                fetch=False,
-                connection=connection
-            )
-        else:
-            # Always update last_active_at for any event
+    for session_id, updates in session_updates.items():
+        assignments = ["message_count = message_count + %s"]
+        params = [updates.pop('messages', 0)]
+        for column in ('page_url', 'location_data', 'last_message_time'):
+            if column in updates:
+                assignments.append(f"{column} = %s")
+                params.append(updates[column])
+        execute_query(
+            f"UPDATE sessions SET {', '.join(assignments)} WHERE session_id = %s",
+            tuple(params) + (session_id,),
+            fetch=False,
+            connection=connection
+        )
+
+def _write_messages(connection, messages: List[tuple]):
+    insert_rows(
+        connection,
+        """
+        INSERT INTO messages 
+          (message_id, conversation_id, user_id, message_type, content, timestamp, reply_to_message_id, response_time_ms)
+        """,
+        "(%s, %s, %s, %s, %s, %s, %s, %s)",
+        messages
+    )
+
+def _latest_question(connection, conversation_id: str) -> Optional[str]:
+    """The most recent user message of a conversation written by an earlier batch"""
+    question = execute_query(
+        """
+        SELECT message_id
+          FROM messages
+         WHERE conversation_id = %s
+           AND message_type = 'user'
+         ORDER BY timestamp DESC
+         LIMIT 1
+        """,
+        (conversation_id,),
+        fetch=True,
+        connection=connection
+    )
+    return question[0]["message_id"] if question else None
+
+def _find_active_conversation(connection, session_id: str) -> Optional[str]:
+    conv = execute_query(
+        """
+        SELECT conversation_id
+          FROM conversations
+         WHERE session_id = %s
+           AND status = 'active'
+         ORDER BY start_time DESC
+         LIMIT 1
+        """,
+        (session_id,),
+        fetch=True,
+        connection=connection
+    )
+    return conv[0]["conversation_id"] if conv else None
+
+def _create_conversation(connection, session_id: str, user_id: str, start_time: str, rollup: RollupDeltas) -> str:
+    conversation_id = str(uuid.uuid4())
+    execute_query(
+        """
+        INSERT INTO conversations 
+          (conversation_id, session_id, user_id, start_time, status)
+        VALUES (%s, %s, %s, %s, 'active')
+        """,
+        (conversation_id, session_id, user_id, start_time),
+        fetch=False,
+        connection=connection
+    )
+    rollup.add(start_time, "conversations_started")
+    print(f"Created new conversation: {conversation_id}")
+    return conversation_id
+
+def _ensure_conversation(connection, event: Dict[str, Any], conversations: Dict[str, str], rollup: RollupDeltas) -> str:
+    """Return the session's active conversation, creating session/conversation rows as needed"""
+    session_id = event["session_id"]
+    if session_id in conversations:
+        return conversations[session_id]
+
+    user_id = event["user_id"]
+    event_data = event["event_data"]
+    timestamp = event["timestamp"]
+
+    session = execute_query(
+        "SELECT session_id FROM sessions WHERE session_id = %s",
+        (session_id,),
+        fetch=True,
+        connection=connection
+    )
+    if not session:
+        print(f"Creating new session: {session_id}")
+        session_start_time = event_data.get('timestamp') or timestamp
+        location = event_data.get('user_location')
+        execute_query(
+            """
+            INSERT INTO sessions 
+              (session_id, user_id, start_time, page_url, message_count, status, location_data) 
+            VALUES (%s, %s, %s, %s, 0, 'active', %s)
+            """,
+            (session_id, user_id, session_start_time, event_data.get('page_url'),
+             json_lib.dumps(location) if location else None),
+            fetch=False,
+            connection=connection
+        )
+        rollup.add(session_start_time, "sessions_started")
+        conversation_id = _create_conversation(connection, session_id, user_id, session_start_time, rollup)
+    else:
+        conversation_id = _find_active_conversation(connection, session_id)
+        if not conversation_id:
+            conversation_id = _create_conversation(connection, session_id, user_id, timestamp, rollup)
+
+    conversations[session_id] = conversation_id
+    return conversation_id
+
+def _session_duration(connection, session_id: str) -> int:
+    result = execute_query(
+        "SELECT duration FROM sessions WHERE session_id = %s",
+        (session_id,),
+        fetch=True,
+        connection=connection
+    )
+    return int(result[0]["duration"] or 0) if result else 0
+
+def _track_session_duration(rollup: RollupDeltas, timestamp, before: int, after: int):
+    """Keep the rollup's count and total of sessions with a duration in step with the table"""
+    before, after = max(before, 0), max(after, 0)
+    if after and not before:
+        rollup.add(timestamp, "sessions_ended")
+    elif before and not after:
+        rollup.add(timestamp, "sessions_ended", -1)
+    rollup.add(timestamp, "session_duration_total", after - before)
+
+def _apply_session_event(connection, event: Dict[str, Any], rollup: RollupDeltas):
+    """Apply a session lifecycle event (start, end, leave, identify)"""
+    user_id = event["user_id"]
+    session_id = event["session_id"]
+    event_type = event["event_type"]
+    event_data = event["event_data"]
+    timestamp = event["timestamp"]
+
+    if event_type == "session_start":
+        print(f"Recording session start for user {user_id}")
+        # Only update user stats, do NOT create session or conversation here
+        execute_query(
+            """
+            UPDATE users 
+              SET total_sessions = total_sessions + 1,
+                  is_active = TRUE,
+                  last_page_url = %s
+            WHERE user_id = %s
+            """,
+            (event_data.get('page_url'), user_id),
+            fetch=False,
+            connection=connection
+        )
+
+    elif event_type == "session_end":
+        print(f"Recording session end for user {user_id}")
+        # 1) Close the session row with the duration measured by the caller
+        if 'duration' in event_data:
+            before = _session_duration(connection, session_id)
             execute_query(
                 """
-                UPDATE users 
-                SET last_active_at = %s
-                WHERE user_id = %s
+                UPDATE sessions 
+                SET end_time = %s,
+                    duration = %s,
+                    status = 'completed'
+                WHERE session_id = %s
                 """,
-                (timestamp, user_id),
+                (timestamp, event_data['duration'], session_id),
                 fetch=False,
                 connection=connection
             )
-
-        # Update user stats based on event type
-        if event_type == "session_start":
-            print(f"Recording session start for user {user_id}")
-            # Only update user stats, do NOT create session or conversation here
+            _track_session_duration(rollup, timestamp, before, _session_duration(connection, session_id))
+        # 2) Find the active conversation
+        conversation_id = _find_active_conversation(connection, session_id)
+        if conversation_id:
+            # 3) Compute the duration in seconds, set conversation to "completed"
             execute_query(
                 """
-                UPDATE users 
-                  SET total_sessions = total_sessions + 1,
-                      is_active = TRUE,
-                      last_page_url = %s
-                WHERE user_id = %s
+                UPDATE conversations
+                  SET end_time = %s,
+                      status   = 'completed',
+                      duration = TIMESTAMPDIFF(SECOND, start_time, %s)
+                 WHERE conversation_id = %s
                 """,
-                (page_url, user_id),
+                (timestamp, timestamp, conversation_id),
                 fetch=False,
                 connection=connection
             )
-
-        elif event_type == "question_asked":
-            print(f"Recording question for user {user_id}: {event_data.get('question', '')[:50]}...")
-            
-            # Check if session exists
-            session = execute_query(
-                "SELECT * FROM sessions WHERE session_id = %s",
-                (session_id,),
-                fetch=True,
-                connection=connection
-            )
-            
-            conversation_id = None
-            if not session:
-                print(f"Creating new session: {session_id}")
-                # Create new session with start_time = event_data['timestamp'] if available
-                session_start_time = event_data.get('timestamp') if event_data and event_data.get('timestamp') else timestamp
-                execute_query(
-                    """
-                    INSERT INTO sessions 
-                      (session_id, user_id, start_time, page_url, message_count, status) 
-                    VALUES (%s, %s, %s, %s, 0, 'active')
-                    """,
-                    (session_id, user_id, session_start_time, page_url),
-                    fetch=False,
-                    connection=connection
-                )
-                # Create new conversation for this session
-                conversation_id = str(uuid.uuid4())
-                execute_query(
-                    """
-                    INSERT INTO conversations 
-                      (conversation_id, session_id, user_id, start_time, status)
-                    VALUES (%s, %s, %s, %s, 'active')
-                    """,
-                    (conversation_id, session_id, user_id, session_start_time),
-                    fetch=False,
-                    connection=connection
-                )
-                print(f"Created new conversation: {conversation_id}")
-            else:
-                # Get the active conversation
-                conversation = execute_query(
-                    """
-                    SELECT conversation_id 
-                    FROM conversations 
-                    WHERE session_id = %s AND status = 'active'
-                    ORDER BY start_time DESC
-                    LIMIT 1
-                    """,
-                    (session_id,),
-                    fetch=True,
-                    connection=connection
-                )
-                if conversation:
-                    conversation_id = conversation[0]['conversation_id']
-                    print(f"Using existing conversation: {conversation_id}")
-                else:
-                    # Create new conversation if none exists
-                    conversation_id = str(uuid.uuid4())
-                    execute_query(
-                        """
-                        INSERT INTO conversations 
-                          (conversation_id, session_id, user_id, start_time, status)
-                        VALUES (%s, %s, %s, %s, 'active')
-                        """,
-                        (conversation_id, session_id, user_id, timestamp),
-                        fetch=False,
-                        connection=connection
-                    )
-                    print(f"Created new conversation: {conversation_id}")
-            
-            # Insert the user's question
-            if conversation_id:
-                message_id = str(uuid.uuid4())
-                execute_query(
-                    """
-                    INSERT INTO messages 
-                    (message_id, conversation_id, user_id, message_type, content, timestamp)
-                    VALUES (%s, %s, %s, 'user', %s, %s)
-                    """,
-                    (message_id, conversation_id, user_id, event_data.get('question', ''), timestamp),
-                    fetch=False,
-                    connection=connection
-                )
-                print(f"Inserted user message: {message_id}")
-                
-                # Update user message count
-                execute_query(
-                    """
-                    UPDATE users 
-                    SET total_messages = total_messages + 1
-                    WHERE user_id = %s
-                    """,
-                    (user_id,),
-                    fetch=False,
-                    connection=connection
-                    )
-
-        elif event_type == "bot_response":
-            print(f"Recording bot response for user {user_id}")
-            # Find the active conversation for this session
-            conv = execute_query(
-                """
-                SELECT conversation_id
-                  FROM conversations
-                 WHERE session_id = %s
-                   AND status = 'active'
-                 ORDER BY start_time DESC
-                 LIMIT 1
-                """,
-                (session_id,),
-                fetch=True,
-                connection=connection
-            )
-            if conv:
-                conversation_id = conv[0]["conversation_id"]
-                # Insert the bot's response
-                message_id = str(uuid.uuid4())
-                execute_query(
-                    """
-                    INSERT INTO messages 
-                      (message_id, conversation_id, user_id, message_type, content, timestamp)
-                    VALUES (%s, %s, %s, 'bot', %s, %s)
-                    """,
-                    (message_id, conversation_id, user_id, event_data.get("response", ""), timestamp),
-                    fetch=False,
-                    connection=connection
-                )
-                print(f"Inserted bot message: {message_id}")
-            else:
-                print(f"Warning: No active conversation found for session {session_id}")
-
-        elif event_type == "session_end":
-            print(f"Recording session end for user {user_id}")
-            # 1) Find the active conversation
-            conv = execute_query(
+            # 4) Retrieve that duration we just computed
+            result = execute_query(
                 """
-                SELECT conversation_id
+                SELECT duration
                   FROM conversations
-                 WHERE session_id = %s
-                   AND status = 'active'
-                 ORDER BY start_time DESC
-                 LIMIT 1
+                 WHERE conversation_id = %s
                 """,
-                (session_id,),
+                (conversation_id,),
                 fetch=True,
                 connection=connection
             )
-            if conv:
-                conversation_id = conv[0]["conversation_id"]
-                # 2) Compute the duration in seconds, set conversation to "completed"
-                execute_query(
-                    """
-                    UPDATE conversations
-                      SET end_time = %s,
-                          status   = 'completed',
-                          duration = TIMESTAMPDIFF(SECOND, start_time, %s)
-                     WHERE conversation_id = %s
-                    """,
-                    (timestamp, timestamp, conversation_id),
-                    fetch=False,
-                    connection=connection
-                )
-                # 3) Retrieve that duration we just computed
-                result = execute_query(
-                    """
-                    SELECT duration
-                      FROM conversations
-                     WHERE conversation_id = %s
-                    """,
-                    (conversation_id,),
-                    fetch=True,
-                    connection=connection
-                )
-                if result:
-                    session_duration = result[0]["duration"] or 0
-                else:
-                    session_duration = 0
-                # 4) Update the user row:
-                execute_query(
-                    """
-                    UPDATE users
-                      SET is_active = FALSE,
-                          last_active_at = %s,
-                          total_duration = total_duration + %s,
-                          total_conversations = total_conversations + 1
-                    WHERE user_id = %s
-                    """,
-                    (timestamp, session_duration, user_id),
-                    fetch=False,
-                    connection=connection
-                )
-
-        elif event_type == "user_left":
-            print(f"Recording user left for user {user_id}")
-            # Mark user as inactive when they leave the website
+            session_duration = (result[0]["duration"] or 0) if result else 0
+            rollup.add(timestamp, "conversations_completed")
+            rollup.add(timestamp, "conversation_duration_total", session_duration)
+            # 5) Update the user row:
             execute_query(
                 """
                 UPDATE users
                   SET is_active = FALSE,
-                      last_active_at = %s
+                      last_active_at = %s,
+                      total_duration = total_duration + %s,
+                      total_conversations = total_conversations + 1
                 WHERE user_id = %s
                 """,
-                (timestamp, user_id),
-                fetch=False,
-                connection=connection
-            )
-            
-            # Mark session as completed
-            execute_query(
-                """
-                UPDATE sessions
-                  SET status = 'completed',
-                      end_time = %s,
-                      duration = TIMESTAMPDIFF(SECOND, start_time, %s)
-                WHERE session_id = %s
-                """,
-                (timestamp, timestamp, session_id),
+                (timestamp, session_duration, user_id),
                 fetch=False,
                 connection=connection
             )
 
-        elif event_type == "user_identified":
-            execute_query(
-                """
-                UPDATE users 
-                SET last_active_at = %s,
-                    user_type = 'returning'
-                WHERE user_id = %s
-                """,
-                (timestamp, user_id),
-                fetch=False,
-                connection=connection
-            )
-
-        # Commit the transaction
-        if connection:
-            connection.commit()
-            print(f"Successfully committed analytics event: {event_type}")
+    elif event_type == "user_left":
+        print(f"Recording user left for user {user_id}")
+        # Mark user as inactive when they leave the website
+        execute_query(
+            """
+            UPDATE users
+              SET is_active = FALSE,
+                  last_active_at = %s
+            WHERE user_id = %s
+            """,
+            (timestamp, user_id),
+            fetch=False,
+            connection=connection
+        )
+        
+        # Mark session as completed
+        before = _session_duration(connection, session_id)
+        execute_query(
+            """
+            UPDATE sessions
+              SET status = 'completed',
+                  end_time = %s,
+                  duration = TIMESTAMPDIFF(SECOND, start_time, %s)
+            WHERE session_id = %s
+            """,
+            (timestamp, timestamp, session_id),
+            fetch=False,
+            connection=connection
+        )
+        _track_session_duration(rollup, timestamp, before, _session_duration(connection, session_id))
 
-    except Error as e:
-        print(f"Error recording user event {event_type}: {e}")
-        if connection:
-            connection.rollback()
-            print("Analytics transaction rolled back")
-        # Don't raise HTTPException here to avoid breaking the main flow
-    except Exception as e:
-        print(f"Unexpected error recording user event {event_type}: {e}")
-        if connection:
-            connection.rollback()
-            print("Analytics transaction rolled back")
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
+    elif event_type == "user_identified":
+        execute_query(
+            """
+            UPDATE users 
+            SET last_active_at = %s,
+                user_type = 'returning'
+            WHERE user_id = %s
+            """,
+            (timestamp, user_id),
+            fetch=False,
+            connection=connection
+        )
+        # Re-key the session to the identified user
+        execute_query(
+            """
+            UPDATE sessions 
+            SET user_id = %s 
+            WHERE session_id = %s
+            """,
+            (user_id, session_id),
+            fetch=False,
+            connection=connection
+        )
 
 def generate_short_id():
     """Generate a shorter, more readable ID"""
@@ -396,175 +490,216 @@ def generate_user_id():
     random_part = hashlib.md5(str(uuid.uuid4()).encode()).hexdigest()[:8]
     return f"user_{timestamp}_{random_part}"
 
+# Write-behind queue for record_user_event (started from the app lifespan)
+event_queue = AnalyticsEventQueue(
+    handler=flush_event_batch,
+    capacity=settings.ANALYTICS_QUEUE_CAPACITY,
+    batch_size=settings.ANALYTICS_BATCH_SIZE,
+    flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+    overflow_policy=settings.ANALYTICS_OVERFLOW_POLICY
+)
+
 # --- Analytics Endpoints ---
 
-@router.get("/")
-async def get_analytics():
+def _parse_event_data(raw):
+    if not raw:
+        return None
     try:
-        # Get total users
-        total_users = execute_query("SELECT COUNT(*) as count FROM users")[0]['count']
-        
-        # Get total sessions
-        total_sessions = execute_query("SELECT SUM(total_sessions) as count FROM users")[0]['count'] or 0
-        
-        # Get total questions
-        total_questions = execute_query("SELECT SUM(total_messages) as count FROM users")[0]['count'] or 0
-        
-        # Get total chatbot opens
-        total_opens = execute_query("SELECT COUNT(*) as count FROM users WHERE total_sessions > 0")[0]['count'] or 0
-        
-        # Get all users with their stats
+        return json_lib.loads(raw)
+    except (ValueError, TypeError):
+        return raw
+
+def _in_clause(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+def _session_histories(user_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Session history (with message events) for a set of users in two queries"""
+    histories = {user_id: [] for user_id in user_ids}
+    if not user_ids:
+        return histories
+
+    sessions = execute_query(f"""
+        SELECT session_id, user_id, start_time, end_time, duration
+        FROM sessions
+        WHERE user_id IN ({_in_clause(user_ids)})
+        ORDER BY user_id, start_time DESC
+    """, tuple(user_ids))
+
+    events = execute_query(f"""
+        SELECT 
+            c.session_id,
+            m.message_type as type,
+            m.timestamp,
+            m.content as data
+        FROM messages m
+        JOIN conversations c ON c.conversation_id = m.conversation_id
+        JOIN sessions s ON s.session_id = c.session_id
+        WHERE s.user_id IN ({_in_clause(user_ids)})
+        ORDER BY c.session_id, m.timestamp
+    """, tuple(user_ids))
+
+    events_by_session = {}
+    for event in events:
+        events_by_session.setdefault(event['session_id'], []).append({
+            "type": event['type'],
+            "timestamp": event['timestamp'],
+            "data": _parse_event_data(event['data'])
+        })
+
+    for session in sessions:
+        session_events = events_by_session.get(session['session_id'], [])
+        histories[session['user_id']].append({
+            "session_id": session['session_id'],
+            "start_time": session['start_time'],
+            "end_time": session['end_time'],
+            "duration": session['duration'],
+            "message_count": len(session_events),
+            "events": session_events
+        })
+    return histories
+
+def _user_page(cursor: Optional[str], limit: int):
+    """One page of users (ordered by user_id) with their session history"""
+    if cursor:
         users = execute_query("""
-            SELECT 
-                u.*,
-                COUNT(DISTINCT s.session_id) as session_count,
-                AVG(s.duration) as avg_session_duration
-            FROM users u
-            LEFT JOIN sessions s ON u.user_id = s.user_id
-            GROUP BY u.user_id
-        """)
-        
-        users_data = {}
-        for user in users:
-            user_id = user['user_id']
-            # Get user's sessions
-            sessions = execute_query("""
-                SELECT 
-                    s.*,
-                    COUNT(m.message_id) as message_count
-                FROM sessions s
-                LEFT JOIN messages m ON s.session_id = m.conversation_id
-                WHERE s.user_id = %s
-                GROUP BY s.session_id
-                ORDER BY s.start_time DESC
-            """, (user_id,))
-            
-            sessions_data = []
-            for session in sessions:
-                # Get events for this session
-                events = execute_query("""
-                    SELECT 
-                        message_type as type,
-                        timestamp,
-                        content as data
-                    FROM messages 
-                    WHERE conversation_id = %s
-                    ORDER BY timestamp
-                """, (session['session_id'],))
-                
-                events_data = []
-                for event in events:
-                    event_data = None
-                    if event['data']:
-                        try:
-                            event_data = json_lib.loads(event['data'])
-                        except:
-                            event_data = event['data']
-                            
-                    events_data.append({
-                        "type": event['type'],
-                        "timestamp": event['timestamp'],
-                        "data": event_data
-                    })
-                
-                sessions_data.append({
-                    "session_id": session['session_id'],
-                    "start_time": session['start_time'],
-                    "end_time": session['end_time'],
-                    "duration": session['duration'],
-                    "message_count": session['message_count'],
-                    "events": events_data
-                })
-            
-            users_data[user_id] = {
-                "sessions": user['total_sessions'],
-                "total_messages": user['total_messages'],
-                "total_duration": user['total_duration'],
-                "last_active": user['last_active_at'],
-                "created_at": user['first_seen_at'],
-                "is_active": user['is_active'],
-                "session_history": sessions_data
-            }
-        
+            SELECT * FROM users
+            WHERE user_id > %s
+            ORDER BY user_id
+            LIMIT %s
+        """, (cursor, limit + 1))
+    else:
+        users = execute_query("""
+            SELECT * FROM users
+            ORDER BY user_id
+            LIMIT %s
+        """, (limit + 1,))
+
+    has_more = len(users) > limit
+    users = users[:limit]
+    histories = _session_histories([user['user_id'] for user in users])
+
+    users_data = {}
+    for user in users:
+        users_data[user['user_id']] = {
+            "sessions": user['total_sessions'],
+            "total_messages": user['total_messages'],
+            "total_duration": user['total_duration'],
+            "last_active": user['last_active_at'],
+            "created_at": user['first_seen_at'],
+            "is_active": user['is_active'],
+            "session_history": histories[user['user_id']]
+        }
+    next_cursor = users[-1]['user_id'] if has_more and users else None
+    return users_data, next_cursor
+
+def _analytics_totals() -> Dict[str, Any]:
+    totals = execute_query("""
+        SELECT 
+            COUNT(*) as total_users,
+            COALESCE(SUM(total_sessions), 0) as total_sessions,
+            COALESCE(SUM(total_messages), 0) as total_questions,
+            COUNT(CASE WHEN total_sessions > 0 THEN 1 END) as total_chatbot_opens
+        FROM users
+    """)[0]
+    return {
+        "total_users": totals['total_users'],
+        "total_sessions": int(totals['total_sessions']),
+        "total_questions": int(totals['total_questions']),
+        "total_chatbot_opens": totals['total_chatbot_opens']
+    }
+
+def _stream_analytics(limit: int):
+    """Yield the full analytics document as JSON, one page of users at a time"""
+    totals = _analytics_totals()
+    yield json_lib.dumps(totals, default=str)[:-1] + ', "users": {'
+    cursor = None
+    first = True
+    while True:
+        users_data, cursor = _user_page(cursor, limit)
+        for user_id, user_data in users_data.items():
+            prefix = "" if first else ", "
+            first = False
+            yield f"{prefix}{json_lib.dumps(user_id)}: {json_lib.dumps(user_data, default=str)}"
+        if not cursor:
+            break
+    yield "}}"
+
+@router.get("/")
+async def get_analytics(cursor: Optional[str] = None, limit: int = 100, stream: bool = False):
+    """Totals plus one page of users; pass next_cursor back to get the next page.
+
+    With ``stream=true`` every user is returned as a streamed JSON document,
+    built page by page instead of in memory.
+    """
+    limit = max(1, min(limit, 1000))
+    try:
+        if stream:
+            return StreamingResponse(_stream_analytics(limit), media_type="application/json")
+
+        users_data, next_cursor = _user_page(cursor, limit)
         return {
-            "total_users": total_users,
-            "total_sessions": total_sessions,
-            "total_questions": total_questions,
-            "total_chatbot_opens": total_opens,
-            "users": users_data
+            **_analytics_totals(),
+            "users": users_data,
+            "next_cursor": next_cursor
         }
     except Error as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sessions", tags=["analytics"])
-async def get_session_analytics():
+async def get_session_analytics(limit: int = 10, offset: int = 0, cursor: Optional[str] = None):
+    """Session summary plus one page of recent sessions.
+
+    Pages can be walked with ``offset`` (as the dashboard does) or with the
+    returned ``next_cursor``, which stays cheap however deep the page is.
+    """
+    limit = max(1, min(limit, 500))
     try:
-        # Get active sessions
-        active_sessions = execute_query("""
-            SELECT COUNT(*) as active_count 
-            FROM sessions 
+        # Active count from the status index; average duration from the rollups
+        active_count = execute_query("""
+            SELECT COUNT(*) as active_count
+            FROM sessions
             WHERE status = 'active'
         """)[0]['active_count']
+        totals = rollups.read_totals()
+        ended = totals["sessions_ended"]
+        avg_duration = totals["session_duration_total"] / ended if ended > 0 else 0
 
-        # Get total sessions today (based on first message timestamp)
-        today_sessions = execute_query("""
-            SELECT COUNT(DISTINCT s.session_id) as today_count
-            FROM sessions s
-            JOIN messages m ON s.session_id = m.conversation_id
-            WHERE DATE(m.timestamp) = CURDATE()
-        """)[0]['today_count']
-
-        # Get average session duration (based on first and last message timestamps)
-        avg_duration_result = execute_query("""
-            SELECT AVG(session_duration) as avg_duration FROM (
-                SELECT 
-                    TIMESTAMPDIFF(SECOND, 
-                        (SELECT MIN(m.timestamp) FROM messages m WHERE m.conversation_id = s.session_id),
-                        (SELECT MAX(m2.timestamp) FROM messages m2 WHERE m2.conversation_id = s.session_id)
-                    ) as session_duration
-                FROM sessions s
-                WHERE EXISTS (SELECT 1 FROM messages m WHERE m.conversation_id = s.session_id)
-            ) as durations
-        """)
-        avg_duration = avg_duration_result[0]['avg_duration'] if avg_duration_result else 0
+        # Sessions started today, from the daily rollup
+        today_sessions = rollups.read_today()["sessions_started"]
 
-        # Get recent sessions (by last message time)
-        recent_sessions = execute_query("""
+        # Recent sessions, newest first, using the stored start/end columns
+        columns = """
             SELECT 
-                s.session_id,
-                s.user_id,
-                s.page_url,
-                s.message_count,
-                s.status
-            FROM sessions s
-            ORDER BY s.session_id DESC
-            LIMIT 10
-        """)
+                session_id,
+                user_id,
+                page_url,
+                message_count,
+                status,
+                start_time,
+                COALESCE(end_time, last_message_time) as end_time,
+                duration
+            FROM sessions
+        """
+        if cursor:
+            cursor_time, _, cursor_id = cursor.partition("|")
+            recent_sessions = execute_query(columns + """
+                WHERE (start_time, session_id) < (%s, %s)
+                ORDER BY start_time DESC, session_id DESC
+                LIMIT %s
+            """, (cursor_time, cursor_id, limit))
+        else:
+            recent_sessions = execute_query(columns + """
+                ORDER BY start_time DESC, session_id DESC
+                LIMIT %s OFFSET %s
+            """, (limit, offset))
 
-        # For each session, get first and last message timestamps and duration
         sessions_data = []
         for session in recent_sessions:
-            times = execute_query(
-                """
-                SELECT 
-                    MIN(timestamp) as start_time,
-                    MAX(timestamp) as end_time
-                FROM messages
-                WHERE conversation_id = %s
-                """,
-                (session['session_id'],)
-            )
-            start_time = times[0]['start_time'] if times and times[0]['start_time'] else None
-            end_time = times[0]['end_time'] if times and times[0]['end_time'] else None
-            # Calculate duration
-            if start_time and end_time:
-                duration_query = execute_query(
-                    "SELECT TIMESTAMPDIFF(SECOND, %s, %s) as duration",
-                    (start_time, end_time)
-                )
-                duration = duration_query[0]['duration'] if duration_query else 0
-            else:
-                duration = 0
+            start_time = session['start_time']
+            end_time = session['end_time']
+            duration = session['duration'] or 0
+            if not duration and start_time and end_time:
+                duration = int((end_time - start_time).total_seconds())
             sessions_data.append({
                 "session_id": session['session_id'],
                 "user_id": session['user_id'],
@@ -576,11 +711,17 @@ async def get_session_analytics():
                 "status": session['status']
             })
 
+        next_cursor = None
+        if len(recent_sessions) == limit:
+            last = recent_sessions[-1]
+            next_cursor = f"{last['start_time']}|{last['session_id']}"
+
         return {
-            "active_sessions": active_sessions or 0,
+            "active_sessions": active_count or 0,
             "today_sessions": today_sessions or 0,
-            "average_duration": round(avg_duration, 2) if avg_duration else 0,
-            "recent_sessions": sessions_data
+            "average_duration": round(float(avg_duration), 2) if avg_duration else 0,
+            "recent_sessions": sessions_data,
+            "next_cursor": next_cursor
         }
     except Error as e:
         print(f"Error in session analytics: {str(e)}")
@@ -588,25 +729,23 @@ async def get_session_analytics():
             "active_sessions": 0,
             "today_sessions": 0,
             "average_duration": 0,
-            "recent_sessions": []
+            "recent_sessions": [],
+            "next_cursor": None
         }
 
 @router.get("/conversations", tags=["analytics"])
-async def get_conversation_analytics():
+async def get_conversation_analytics(limit: int = 10, offset: int = 0):
     try:
-        # Get conversation statistics
-        stats = execute_query("""
-            SELECT 
-                COUNT(*) as total_conversations,
-                COUNT(CASE WHEN status = 'active' THEN 1 END) as active_conversations,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_conversations,
-                COUNT(CASE WHEN status = 'handover' THEN 1 END) as handover_conversations,
-                AVG(duration) as avg_duration,
-                COUNT(CASE WHEN message_type = 'user' THEN 1 END) as user_messages
-            FROM conversations c
-            LEFT JOIN messages m ON c.conversation_id = m.conversation_id
-            GROUP BY c.conversation_id
-        """)[0]
+        # Lifetime totals come from the rollups; current state from the status index
+        totals = rollups.read_totals()
+        status_counts = execute_query("""
+            SELECT status, COUNT(*) as count
+            FROM conversations
+            WHERE status IN ('active', 'handover')
+            GROUP BY status
+        """)
+        by_status = {row['status']: row['count'] for row in status_counts}
+        completed = totals['conversations_completed']
 
         # Get recent conversations with message counts
         recent_conversations = execute_query("""
@@ -616,21 +755,20 @@ async def get_conversation_analytics():
                 c.start_time,
                 c.duration,
                 c.status,
-                COUNT(CASE WHEN m.message_type = 'user' THEN 1 END) as message_count
+                (SELECT COUNT(*) FROM messages m
+                 WHERE m.conversation_id = c.conversation_id AND m.message_type = 'user') as message_count
             FROM conversations c
-            LEFT JOIN messages m ON c.conversation_id = m.conversation_id
-            GROUP BY c.conversation_id
             ORDER BY c.start_time DESC
-            LIMIT 10
-        """)
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
 
         return {
-            "total_conversations": stats['total_conversations'] or 0,
-            "active_conversations": stats['active_conversations'] or 0,
-            "completed_conversations": stats['completed_conversations'] or 0,
-            "handover_conversations": stats['handover_conversations'] or 0,
-            "average_duration": round(stats['avg_duration'], 2) if stats['avg_duration'] else 0,
-            "total_messages": stats['user_messages'] or 0,
+            "total_conversations": totals['conversations_started'],
+            "active_conversations": by_status.get('active', 0),
+            "completed_conversations": completed,
+            "handover_conversations": by_status.get('handover', 0),
+            "average_duration": round(totals['conversation_duration_total'] / completed, 2) if completed else 0,
+            "total_messages": totals['user_messages'],
             "recent_conversations": recent_conversations or []
         }
     except Error as e:
@@ -648,30 +786,35 @@ async def get_conversation_analytics():
 @router.get("/messages", tags=["analytics"])
 async def get_message_analytics():
     try:
-        # Get message statistics - count each user-bot interaction as 1
+        # Each bot message linked to a question is one user-bot interaction;
+        # the response-time percentiles come from the same indexed scan
         stats = execute_query("""
             SELECT 
-                COUNT(DISTINCT CASE 
-                    WHEN m1.message_type = 'user' AND m2.message_type = 'bot' 
-                    AND m1.conversation_id = m2.conversation_id 
-                    THEN m1.message_id 
-                END) as total_messages,
-                COUNT(CASE WHEN m1.message_type = 'user' THEN 1 END) as user_messages,
-                COUNT(CASE WHEN m1.message_type = 'bot' THEN 1 END) as bot_messages,
-                COUNT(CASE WHEN m1.message_type = 'system' THEN 1 END) as system_messages
-            FROM messages m1
-            LEFT JOIN messages m2 ON m1.conversation_id = m2.conversation_id 
-                AND m2.message_type = 'bot'
-                AND m2.timestamp > m1.timestamp
-                AND NOT EXISTS (
-                    SELECT 1 FROM messages m3 
-                    WHERE m3.conversation_id = m1.conversation_id 
-                    AND m3.message_type = 'bot'
-                    AND m3.timestamp > m1.timestamp 
-                    AND m3.timestamp < m2.timestamp
-                )
+                COUNT(*) as interactions,
+                AVG(response_time_ms) as avg_ms,
+                MIN(CASE WHEN cd >= 0.50 THEN response_time_ms END) as p50_ms,
+                MIN(CASE WHEN cd >= 0.90 THEN response_time_ms END) as p90_ms,
+                MIN(CASE WHEN cd >= 0.99 THEN response_time_ms END) as p99_ms
+            FROM (
+                SELECT 
+                    response_time_ms,
+                    CUME_DIST() OVER (ORDER BY response_time_ms) as cd
+                FROM messages
+                WHERE message_type = 'bot'
+                AND reply_to_message_id IS NOT NULL
+                AND response_time_ms IS NOT NULL
+            ) as answered
         """)[0]
 
+        unanswered = execute_query("""
+            SELECT COUNT(*) as count
+            FROM messages q
+            LEFT JOIN messages a ON a.reply_to_message_id = q.message_id
+            WHERE q.message_type = 'user'
+            AND a.message_id IS NULL
+        """)[0]['count']
+        totals = rollups.read_totals()
+
         # Get recent messages with details
         recent_messages = execute_query("""
             SELECT 
@@ -687,16 +830,25 @@ async def get_message_analytics():
         """)
 
         return {
-            "total_messages": stats['total_messages'] or 0,
-            "user_messages": stats['user_messages'] or 0,
-            "bot_messages": stats['bot_messages'] or 0,
-            "system_messages": stats['system_messages'] or 0,
+            "total_messages": stats['interactions'] or 0,
+            "unanswered_questions": unanswered or 0,
+            "response_time_ms": {
+                "avg": round(float(stats['avg_ms']), 1) if stats['avg_ms'] is not None else 0,
+                "p50": stats['p50_ms'] or 0,
+                "p90": stats['p90_ms'] or 0,
+                "p99": stats['p99_ms'] or 0
+            },
+            "user_messages": totals['user_messages'],
+            "bot_messages": totals['bot_messages'],
+            "system_messages": totals['system_messages'],
             "recent_messages": recent_messages or []
         }
     except Error as e:
         print(f"Error in message analytics: {str(e)}")
         return {
             "total_messages": 0,
+            "unanswered_questions": 0,
+            "response_time_ms": {"avg": 0, "p50": 0, "p90": 0, "p99": 0},
             "user_messages": 0,
             "bot_messages": 0,
             "system_messages": 0,
@@ -707,70 +859,13 @@ async def get_message_analytics():
 async def get_user_analytics_by_id(user_id: str):
     try:
         # Get user data
-        user = execute_query("""
-            SELECT 
-                u.*,
-                COUNT(DISTINCT s.session_id) as session_count,
-                AVG(s.duration) as avg_session_duration
-            FROM users u
-            LEFT JOIN sessions s ON u.user_id = s.user_id
-            WHERE u.user_id = %s
-            GROUP BY u.user_id
-        """, (user_id,))
+        user = execute_query("SELECT * FROM users WHERE user_id = %s", (user_id,))
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         user = user[0]
-        
-        # Get user's sessions
-        sessions = execute_query("""
-            SELECT 
-                s.*,
-                COUNT(m.message_id) as message_count
-            FROM sessions s
-            LEFT JOIN messages m ON s.session_id = m.conversation_id
-            WHERE s.user_id = %s
-            GROUP BY s.session_id
-            ORDER BY s.start_time DESC
-        """, (user_id,))
-        
-        sessions_data = []
-        for session in sessions:
-            # Get events for this session
-            events = execute_query("""
-                SELECT 
-                    message_type as type,
-                    timestamp,
-                    content as data
-                FROM messages 
-                WHERE conversation_id = %s
-                ORDER BY timestamp
-            """, (session['session_id'],))
-            
-            events_data = []
-            for event in events:
-                event_data = None
-                if event['data']:
-                    try:
-                        event_data = json_lib.loads(event['data'])
-                    except:
-                        event_data = event['data']
-                        
-                events_data.append({
-                    "type": event['type'],
-                    "timestamp": event['timestamp'],
-                    "data": event_data
-                })
-            
-            sessions_data.append({
-                "session_id": session['session_id'],
-                "start_time": session['start_time'],
-                "end_time": session['end_time'],
-                "duration": session['duration'],
-                "message_count": session['message_count'],
-                "events": events_data
-            })
+        sessions_data = _session_histories([user_id])[user_id]
         
         user_data = {
             "user_id": user['user_id'],
@@ -793,23 +888,29 @@ async def capture_lead(lead_data: dict):
     try:
         # Generate a unique lead ID
         lead_id = str(uuid.uuid4())
+        created_at = datetime.now().isoformat()
         
-        # Insert the lead into the analytics table
-        execute_query(
-            """
-            INSERT INTO lead_analytics 
-            (lead_id, lead_type, name, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (
-                lead_id,
-                'appointment_scheduled',
-                lead_data.get('name', ''),
-                datetime.now().isoformat(),
-                datetime.now().isoformat()
-            ),
-            fetch=False
-        )
+        # Insert the lead and bump the rollups in one transaction
+        with db_pool.transaction() as connection:
+            execute_query(
+                """
+                INSERT INTO lead_analytics 
+                (lead_id, lead_type, name, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (
+                    lead_id,
+                    'appointment_scheduled',
+                    lead_data.get('name', ''),
+                    created_at,
+                    created_at
+                ),
+                fetch=False,
+                connection=connection
+            )
+            rollup = RollupDeltas()
+            rollup.add(created_at, "leads")
+            rollup.write(connection)
         
         return {"status": "success", "lead_id": lead_id}
     except Error as e:
@@ -817,23 +918,22 @@ async def capture_lead(lead_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/leads", tags=["analytics"])
-async def get_lead_analytics():
+async def get_lead_analytics(limit: int = 30, offset: int = 0):
     try:
-        # Get lead statistics
+        # Daily lead counts straight from the rollup (all leads are appointment_scheduled)
         stats = execute_query("""
             SELECT 
-                COUNT(*) as total_leads,
-                COUNT(CASE WHEN lead_type = 'appointment_scheduled' THEN 1 END) as scheduled_leads,
-                DATE(created_at) as date,
-                COUNT(*) as daily_leads
-            FROM lead_analytics
-            GROUP BY DATE(created_at)
-            ORDER BY date DESC
-            LIMIT 30
-        """)
+                day as date,
+                leads as daily_leads,
+                leads as scheduled_leads
+            FROM analytics_daily_rollup
+            WHERE leads > 0
+            ORDER BY day DESC
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
         
         return {
-            "total_leads": len(stats) or 0,
+            "total_leads": rollups.read_totals()["leads"],
             "daily_leads": stats or []
         }
     except Error as e:
@@ -843,6 +943,24 @@ async def get_lead_analytics():
             "daily_leads": []
         }
 
+@router.get("/rollups", tags=["analytics"])
+async def get_rollups(days: int = 30):
+    """Daily rollup rows plus today's hourly breakdown"""
+    try:
+        daily = execute_query("""
+            SELECT * FROM analytics_daily_rollup
+            WHERE day >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            ORDER BY day DESC
+        """, (days,))
+        hourly = execute_query("""
+            SELECT * FROM analytics_hourly_rollup
+            WHERE hour >= CURDATE()
+            ORDER BY hour
+        """)
+        return {"daily": daily or [], "today_hourly": hourly or []}
+    except Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/human_handover", tags=["analytics"])
 async def record_human_handover(data: dict = Body(...)):
     try:
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, List
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+class AnalyticsEventQueue:
+    """In-process write-behind queue for analytics events.
+
+    ``enqueue`` only appends to a deque, so recording an event costs O(1)
+    on the request path. A background thread hands events to ``handler``
+    in batches once ``batch_size`` events are waiting or ``flush_interval``
+    seconds have passed, and drains whatever is left when stopped.
+    """
+
+    def __init__(self, handler: Callable[[List[Dict[str, Any]]], None], capacity: int,
+                 batch_size: int, flush_interval: float, overflow_policy: str = "drop_oldest",
+                 max_attempts: int = 3):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.handler = handler
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.max_attempts = max_attempts
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.running = False
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_flush_ms = 0.0
+        self.last_batch_lag_seconds = 0.0
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+        print("🚀 Started analytics write-behind queue")
+
+    def stop(self, timeout: float = 30.0):
+        """Stop accepting events and flush everything still queued"""
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        print(f"Analytics queue drained ({len(self._events)} events left)")
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Queue an event; returns False if it was dropped"""
+        event["enqueued_at"] = time.time()
+        event.setdefault("attempts", 0)
+        with self._cond:
+            if len(self._events) >= self.capacity:
+                self.dropped += 1
+                if self.overflow_policy == "drop_newest":
+                    return False
+                self._events.popleft()
+            self._events.append(event)
+            self.enqueued += 1
+            if len(self._events) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        count = min(self.batch_size, len(self._events))
+        return [self._events.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self.running and len(self._events) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take_batch()
+                if not batch and not self.running:
+                    return
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            self.handler(batch)
+            self._record_flush(batch, start)
+            return
+        except Exception as e:
+            print(f"Error flushing {len(batch)} analytics events: {e}")
+            self.failed_batches += 1
+
+        retry = []
+        for event in batch:
+            event["attempts"] += 1
+            if event["attempts"] < self.max_attempts:
+                retry.append(event)
+        if len(retry) == len(batch):
+            time.sleep(min(self.flush_interval, 1.0))
+            with self._cond:
+                self._events.extendleft(reversed(retry))
+            return
+
+        # Out of retries: apply events one by one so a single bad event
+        # cannot keep the rest of the batch out of the database
+        for event in batch:
+            try:
+                self.handler([event])
+                self._record_flush([event], start)
+            except Exception as e:
+                print(f"Dropping analytics event {event.get('event_type')}: {e}")
+                self.dropped += 1
+
+    def _record_flush(self, batch: List[Dict[str, Any]], start: float):
+        now = time.time()
+        self.flushed += len(batch)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        self.last_batch_lag_seconds = now - min(event["enqueued_at"] for event in batch)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._events)
+            oldest = self._events[0]["enqueued_at"] if pending else None
+        return {
+            "running": self.running,
+            "pending": pending,
+            "capacity": self.capacity,
+            "overflow_policy": self.overflow_policy,
+            "lag_seconds": round(time.time() - oldest, 3) if oldest else 0,
+            "last_batch_lag_seconds": round(self.last_batch_lag_seconds, 3),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "last_flush_ms": round(self.last_flush_ms, 2)
+        }
@@ -0,0 +1,158 @@
+"""Semantic cache of final answers for repeated questions.
+
+Hot questions (warranty, "tyres for <make>", the suggested-question
+chips) are answered from here instead of going through retrieval and
+generation again. Entries are keyed by the question embedding, the coarse
+location bucket and the index generation that produced the answer; a
+lookup hits when a question in the same bucket and generation is at
+least ``threshold`` cosine-similar. Entries expire after ``ttl_seconds``
+and the least recently used are evicted beyond ``max_entries``.
+
+Questions naming an exact tyre size or pattern are answered from the
+lexical index without any embedding call, so for them the cache is keyed
+on the normalised question text (``text_key``) instead of an embedding.
+
+Only standalone questions are cached (callers skip it when there is
+chat history), so a hit never depends on earlier turns.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union
+import numpy as np
+from .config import settings
+
+def location_bucket(location: Optional[str]) -> str:
+    """Region-level bucket for a location string ("Pune, Maharashtra" -> "maharashtra")"""
+    if not location:
+        return "unknown"
+    region = re.sub(r"\(.*?\)", "", location).split(",")[-1]
+    return " ".join(region.split()).casefold() or "unknown"
+
+def text_key(question: str) -> str:
+    """Exact-match cache key: the question with case and whitespace normalised"""
+    return " ".join(question.split()).casefold()
+
+class AnswerCache:
+    """In-process semantic answer cache (one per worker)"""
+
+    def __init__(self, embeddings=None, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 threshold: float = 0.95):
+        self._embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from .vector_store import embeddings
+            self._embeddings = embeddings
+        return self._embeddings
+
+    def embed(self, question: str) -> np.ndarray:
+        """Unit-normalised question embedding (shares the embedding cache with retrieval)"""
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _check_generation(self, generation: int) -> bool:
+        """False for an index older than the newest seen; a newer one clears the cache"""
+        if self.generation is not None and generation < self.generation:
+            return False
+        if generation != self.generation:
+            # A new index can change answers: drop everything built on the old one
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self.generation = generation
+        return True
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del self._entries[key]
+        self.evictions += len(expired)
+
+    def lookup(self, key: Union[np.ndarray, str], location: Optional[str], generation: int) -> Optional[Dict[str, Any]]:
+        """The cached answer for the most similar question (or the same ``text_key``)"""
+        bucket = location_bucket(location)
+        exact = isinstance(key, str)
+        with self._lock:
+            fresh = self._check_generation(generation)
+            self._expire(time.time())
+            keys = [
+                k for k, entry in self._entries.items()
+                if entry["bucket"] == bucket and (entry["text"] == key if exact else entry["vector"] is not None)
+            ]
+            if fresh and keys:
+                if exact:
+                    similarities = np.ones(len(keys))
+                else:
+                    similarities = np.stack([self._entries[k]["vector"] for k in keys]) @ key
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    self._entries.move_to_end(keys[best])
+                    entry = self._entries[keys[best]]
+                    return {
+                        "answer": entry["answer"],
+                        "question": entry["question"],
+                        "similarity": round(float(similarities[best]), 4)
+                    }
+            self.misses += 1
+            return None
+
+    def store(self, key: Union[np.ndarray, str], question: str, location: Optional[str], generation: int, answer: str):
+        if not answer:
+            return
+        with self._lock:
+            if not self._check_generation(generation):
+                return  # answered by an index that has since been swapped out
+            self._next_id += 1
+            self._entries[self._next_id] = {
+                "vector": None if isinstance(key, str) else key,
+                "text": key if isinstance(key, str) else None,
+                "question": question,
+                "bucket": location_bucket(location),
+                "answer": answer,
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "generation": self.generation
+        }
+
+# Global instance
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_THRESHOLD
+)
@@ -0,0 +1,173 @@
+"""Catalog-aware document building for the tyre CSV.
+
+Every CSV row is one product/size variant and becomes exactly one
+document: empty and NaN fields are dropped, the key columns are lifted
+into Chroma metadata and the rest is rendered as compact ``key: value``
+text. Long free-text fields can be split off first and shared between
+variants (see ``app/dedup.py``).
+"""
+import math
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+# Canonical field -> column names it may appear under in the CSV
+# (compared after lower-casing and collapsing punctuation to "_")
+FIELD_ALIASES = {
+    "brand": ["brand", "brand_name", "make", "manufacturer"],
+    "pattern": ["pattern", "tyre_pattern", "tire_pattern", "product_name", "product", "model", "name", "title"],
+    "size": ["size", "tyre_size", "tire_size", "size_specifications", "size_specification"],
+    "vehicle_category": ["vehicle_category", "vehicle_type", "category", "segment", "vehicle"],
+    "price": ["price", "mrp", "price_inr", "mrp_inr", "price_rs"]
+}
+
+# Fields that identify a variant; a price edit keeps the same row id
+KEY_FIELDS = ["brand", "pattern", "size"]
+
+EMPTY_VALUES = {"", "nan", "none", "null", "n/a", "na", "-"}
+
+# Canonical vehicle category -> words users and the catalog use for it
+CATEGORY_SYNONYMS = {
+    "bike": ["two wheeler", "two-wheeler", "2 wheeler", "motorcycle", "motorbike", "bike", "scooter", "scooty"],
+    "suv": ["suv", "muv", "4x4", "jeep", "crossover"],
+    "car": ["passenger car", "car", "sedan", "hatchback"],
+    "truck": ["truck", "bus", "lorry", "commercial vehicle", "tbr"],
+    "lcv": ["lcv", "light commercial", "pickup", "pick-up", "van"],
+    "tractor": ["tractor", "farm", "agricultural", "agri"]
+}
+
+# 185/65 R15, 185/65R15, 90/90-17, 205/55 ZR16 ...
+METRIC_SIZE = re.compile(r"\b(\d{2,3})\s*/\s*(\d{2,3})\s*(?:z?r|-|\s)\s*(\d{2}(?:\.\d)?)\b", re.IGNORECASE)
+# 2.75-18, 13.6-28, 7.50-16 ...
+NUMERIC_SIZE = re.compile(r"\b(\d{1,2}\.\d{1,2})\s*-\s*(\d{2})\b")
+
+def normalize_column(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_")
+
+def is_empty(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return str(value).strip().lower() in EMPTY_VALUES
+
+def clean_value(value: Any) -> str:
+    # Whole-number floats come back from pandas as "17.0"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return re.sub(r"\s+", " ", str(value)).strip()
+
+def clean_row(row: Dict[str, Any]) -> Dict[str, str]:
+    """Drop empty/NaN fields and normalise whitespace in the rest"""
+    return {str(k).strip(): clean_value(v) for k, v in row.items() if not is_empty(v)}
+
+def detect_columns(columns) -> Dict[str, str]:
+    """Map canonical field names to the CSV's actual column names"""
+    by_normalized = {normalize_column(c): c for c in columns}
+    found = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            column = by_normalized.get(alias)
+            if column is not None and column not in found.values():
+                found[field] = column
+                break
+    return found
+
+def natural_key_columns(columns) -> List[str]:
+    """Columns that identify a product variant, if the CSV has them"""
+    found = detect_columns(columns)
+    return [found[f] for f in KEY_FIELDS if f in found]
+
+def normalize_size(text: str) -> Optional[str]:
+    """Canonical tyre size ("185/65r15", "2.75-18") found in ``text``"""
+    match = METRIC_SIZE.search(text)
+    if match:
+        width, aspect, rim = match.groups()
+        return f"{width}/{aspect}r{rim}"
+    match = NUMERIC_SIZE.search(text)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    return None
+
+def find_sizes(text: str) -> List[str]:
+    """Every canonical tyre size mentioned in ``text``"""
+    sizes = [f"{w}/{a}r{r}" for w, a, r in METRIC_SIZE.findall(text)]
+    sizes.extend(f"{w}-{r}" for w, r in NUMERIC_SIZE.findall(text))
+    return sizes
+
+def rim_diameter(size_key: str) -> Optional[int]:
+    match = re.search(r"(?:r|-)(\d{2})(?:\.\d)?$", size_key or "")
+    return int(match.group(1)) if match else None
+
+def normalize_category(text: str) -> Optional[str]:
+    """Canonical vehicle category mentioned in ``text``"""
+    lowered = f" {text.lower()} "
+    for category, words in CATEGORY_SYNONYMS.items():
+        for word in words:
+            if re.search(rf"\b{re.escape(word)}s?\b", lowered):
+                return category
+    return None
+
+def parse_price(value: str) -> Optional[float]:
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", value)
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+def split_descriptions(row: Dict[str, Any], min_chars: int,
+                       columns: Dict[str, str] = None) -> Tuple[Dict[str, Any], str]:
+    """Split a row into its short fields and a block of its long free-text ones.
+
+    Key columns are never split off, however long they are.
+    """
+    columns = columns if columns is not None else detect_columns(row.keys())
+    keep = {str(c).strip() for c in columns.values()}
+    short, long = {}, []
+    for key, value in clean_row(row).items():
+        if key not in keep and len(value) >= min_chars:
+            long.append(f"{key}: {value}")
+        else:
+            short[key] = value
+    return short, "\n".join(long)
+
+def build_document(row: Dict[str, Any], columns: Dict[str, str] = None) -> Tuple[str, Dict[str, Any]]:
+    """Render one catalog row as (text, metadata)"""
+    fields = clean_row(row)
+    columns = columns if columns is not None else detect_columns(row.keys())
+
+    metadata = {}
+    for field, column in columns.items():
+        value = fields.get(str(column).strip())
+        if value is None:
+            continue
+        if field == "price":
+            price = parse_price(value)
+            if price is not None:
+                metadata["price"] = price
+        else:
+            metadata[field] = value
+
+    # Normalised copies used as exact-match retrieval filters
+    if "brand" in metadata:
+        metadata["brand_key"] = metadata["brand"].lower()
+    size_key = normalize_size(metadata.get("size", ""))
+    if size_key:
+        metadata["size_key"] = size_key
+        rim = rim_diameter(size_key)
+        if rim:
+            metadata["rim"] = rim
+    category_key = normalize_category(metadata.get("vehicle_category", ""))
+    if category_key:
+        metadata["category_key"] = category_key
+
+    # Headline first ("Apollo Alnac 4G 185/65 R15 (Car)") so the most
+    # distinctive terms lead the embedded text, then every remaining field
+    headline = " ".join(metadata[f] for f in KEY_FIELDS if f in metadata)
+    if "vehicle_category" in metadata:
+        headline = f"{headline} ({metadata['vehicle_category']})".strip()
+    lifted = {str(columns[f]).strip() for f in KEY_FIELDS + ["vehicle_category"] if f in columns and f in metadata}
+    lines = [headline] if headline else []
+    lines.extend(f"{k}: {v}" for k, v in fields.items() if k not in lifted)
+    return "\n".join(lines), metadata
@@ -5,14 +5,58 @@ load_dotenv()
 
 class Settings:
     CSV_PATH = os.getenv("CSV_PATH", "data/apolloTyres_combined_cleaned.csv")
+    CATALOG_ID_COLUMNS = [c.strip() for c in os.getenv("CATALOG_ID_COLUMNS", "").split(",") if c.strip()]
     EMBED_MODEL = os.getenv("EMBED_MODEL", "models/embedding-001")
     PERSIST_DIRECTORY = os.getenv("PERSIST_DIRECTORY", "chroma_db")
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # chroma | flat | snapshot
+    FLAT_INDEX_PATH = os.getenv("FLAT_INDEX_PATH", "flat_index")
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "index_snapshots")
+    # Compressed candidate scan; only used with VECTOR_BACKEND=snapshot
+    # (ignored, with a warning, by the flat and chroma backends)
+    VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")  # none | float16 | int8
+    VECTOR_PCA_DIM = int(os.getenv("VECTOR_PCA_DIM", 0))
+    RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", 4))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 100))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+    INGEST_REQUESTS_PER_MINUTE = int(os.getenv("INGEST_REQUESTS_PER_MINUTE", 0))
+    INGEST_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", "ingest_checkpoint.json")
+    INGEST_CHECKPOINT_BATCHES = int(os.getenv("INGEST_CHECKPOINT_BATCHES", 20))
+    INGEST_CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", 30))
+    DEDUP_DESCRIPTIONS = os.getenv("DEDUP_DESCRIPTIONS", "true").lower() == "true"
+    DEDUP_MIN_CHARS = int(os.getenv("DEDUP_MIN_CHARS", 200))
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1000))  # 0 = off
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 6000))
+    PROMPT_HISTORY_TOKENS = int(os.getenv("PROMPT_HISTORY_TOKENS", 1200))
+    PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", 4))
+    MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", 3))
+    MEMORY_MAX_PENDING = int(os.getenv("MEMORY_MAX_PENDING", 6))
+    MEMORY_SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", 150))
+    MEMORY_IDLE_SECONDS = float(os.getenv("MEMORY_IDLE_SECONDS", 3600))
+    MEMORY_RESUME_SECONDS = float(os.getenv("MEMORY_RESUME_SECONDS", 600))
+    HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+    INDEX_MIN_SIZE_RATIO = float(os.getenv("INDEX_MIN_SIZE_RATIO", 0.5))
+    INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", 30))  # seconds, 0 = off
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+    EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", 10000))
+    EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embedding_cache.sqlite3")
     LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     DB_HOST = os.getenv("DB_HOST", "localhost")
-    DB_PORT = os.getenv("DB_PORT", 3306)
+    DB_PORT = int(os.getenv("DB_PORT", 3306))
     DB_USER = os.getenv("DB_USER", "nirbhay")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "Nirbhay@123")
     DB_NAME = os.getenv("DB_NAME", "chatbot_analytics")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+    ANALYTICS_QUEUE_CAPACITY = int(os.getenv("ANALYTICS_QUEUE_CAPACITY", 10000))
+    ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", 200))
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 2))
+    ANALYTICS_OVERFLOW_POLICY = os.getenv("ANALYTICS_OVERFLOW_POLICY", "drop_oldest")
+    ROLLUP_HOURLY_RETENTION_DAYS = int(os.getenv("ROLLUP_HOURLY_RETENTION_DAYS", 30))  # daily rows are kept forever
+    WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", 16))
+    WORKER_QUEUE_LIMIT = int(os.getenv("WORKER_QUEUE_LIMIT", 256))
 
 settings = Settings()
\ No newline at end of file
@@ -1,48 +1,34 @@
-import mysql.connector
 from mysql.connector import Error
-
-# MySQL Configuration (same as root analytics.py)
-MYSQL_CONFIG = {
-    "host": "localhost",
-    "port": 3306,
-    "user": "nirbhay",
-    "password": "Nirbhay@123",
-    "database": "chatbot_analytics"
-}
+from .db_pool import db_pool
 
 def get_db_connection():
     try:
-        connection = mysql.connector.connect(**MYSQL_CONFIG)
-        if connection.is_connected():
-            return connection
+        return db_pool.get_connection()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         raise
-    return None
 
 def execute_query(query, params=None, fetch=True):
-    connection = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(query, params or ())
-        
-        if fetch:
-            result = cursor.fetchall()
-        else:
-            connection.commit()
-            result = None
-        
-        cursor.close()
-        return result
+        with db_pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params or ())
+                
+                if fetch:
+                    result = cursor.fetchall()
+                else:
+                    connection.commit()
+                    result = None
+            except Error:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+            return result
     except Error as e:
         print(f"Error executing query: {e}")
-        if connection:
-            connection.rollback()
         raise
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
 
 def update_sessions_table():
     try:
@@ -92,4 +78,48 @@ def update_sessions_table():
             
         print("Sessions table schema updated successfully")
     except Error as e:
-        print(f"Error updating sessions table: {e}")
\ No newline at end of file
+        print(f"Error updating sessions table: {e}")
+def update_messages_table():
+    """Add the question/answer turn link columns to messages"""
+    try:
+        columns = execute_query("""
+            SELECT COLUMN_NAME 
+            FROM INFORMATION_SCHEMA.COLUMNS 
+            WHERE TABLE_NAME = 'messages' 
+            AND TABLE_SCHEMA = DATABASE()
+        """)
+        existing_columns = [col['COLUMN_NAME'] for col in columns]
+
+        if 'reply_to_message_id' not in existing_columns:
+            execute_query("""
+                ALTER TABLE messages
+                ADD COLUMN reply_to_message_id VARCHAR(36) DEFAULT NULL
+            """, fetch=False)
+
+        if 'response_time_ms' not in existing_columns:
+            execute_query("""
+                ALTER TABLE messages
+                ADD COLUMN response_time_ms INT DEFAULT NULL
+            """, fetch=False)
+
+        ensure_index("messages", "idx_messages_reply_to", "reply_to_message_id")
+        ensure_index("messages", "idx_messages_type_response_time", "message_type, response_time_ms")
+        print("Messages table schema updated successfully")
+    except Error as e:
+        print(f"Error updating messages table: {e}")
+
+def ensure_index(table, index_name, columns):
+    """Create an index unless one with the same name already exists"""
+    try:
+        existing = execute_query("""
+            SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = %s
+            AND INDEX_NAME = %s
+            LIMIT 1
+        """, (table, index_name))
+        if not existing:
+            execute_query(f"CREATE INDEX {index_name} ON {table} ({columns})", fetch=False)
+            print(f"Created index {index_name} on {table}")
+    except Error as e:
+        print(f"Error creating index {index_name}: {e}")
@@ -0,0 +1,127 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+from mysql.connector import pooling, Error
+from mysql.connector.errors import PoolError
+from .config import settings
+
+class DatabasePool:
+    """Shared MySQL connection pool for app/database.py and app/analytics.py.
+
+    Connections are checked out with ``get_connection()`` (or the
+    ``connection()`` / ``transaction()`` context managers) and returned to
+    the pool by calling ``close()`` on them. Every checkout is pinged first
+    so callers never receive a connection the server has already dropped.
+    """
+
+    def __init__(self, pool_name: str, pool_size: int, timeout: float):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_in_use = 0
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=self.pool_name,
+                        pool_size=self.pool_size,
+                        pool_reset_session=True,
+                        host=settings.DB_HOST,
+                        port=settings.DB_PORT,
+                        user=settings.DB_USER,
+                        password=settings.DB_PASSWORD,
+                        database=settings.DB_NAME
+                    )
+        return self._pool
+
+    def _in_use(self) -> int:
+        if self._pool is None:
+            return 0
+        return self.pool_size - self._pool._cnx_queue.qsize()
+
+    def get_connection(self):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds"""
+        pool = self._get_pool()
+        start = time.perf_counter()
+        while True:
+            try:
+                connection = pool.get_connection()
+                break
+            except PoolError:
+                if time.perf_counter() - start >= self.timeout:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise
+                time.sleep(0.005)
+        waited = time.perf_counter() - start
+
+        # Health check: reconnect in place if the server closed the socket
+        try:
+            if not connection.is_connected():
+                connection.reconnect(attempts=2, delay=0)
+                with self._lock:
+                    self.reconnects += 1
+        except Error:
+            connection.close()
+            raise
+
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            self.peak_in_use = max(self.peak_in_use, self._in_use())
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection and always return it to the pool"""
+        connection = self.get_connection()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit on success, roll back on error"""
+        with self.connection() as connection:
+            connection.autocommit = False
+            try:
+                yield connection
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        in_use = self._in_use()
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "pool_size": self.pool_size,
+                "in_use": in_use,
+                "utilisation": round(in_use / self.pool_size, 3) if self.pool_size else 0,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "avg_wait_ms": round(self.wait_seconds_total / checkouts * 1000, 3) if checkouts else 0,
+                "max_wait_ms": round(self.wait_seconds_max * 1000, 3)
+            }
+
+# Global instance
+db_pool = DatabasePool(
+    pool_name="chatbot_pool",
+    pool_size=settings.DB_POOL_SIZE,
+    timeout=settings.DB_POOL_TIMEOUT
+)
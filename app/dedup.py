@@ -0,0 +1,123 @@
+"""Near-duplicate elimination of long descriptive catalog text.
+
+Rows that differ only in size or price repeat the same feature/benefit
+paragraphs. Before embedding, those paragraphs are split off each row
+(``catalog.split_descriptions``) and grouped: exact copies by hash,
+near-copies by MinHash over word shingles with LSH banding. Each group
+becomes one shared document and the variant rows keep a ``shared_id``
+reference to it, so the paragraph is embedded and stored once and only
+lands in the prompt once however many variants are retrieved.
+
+Groups never span patterns, so a shared document's headline is always
+right for every variant that points at it.
+"""
+import hashlib
+import re
+from typing import Dict, Any, List, Tuple
+import numpy as np
+
+SHINGLE_WORDS = 5
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def shingles(text: str, n: int = SHINGLE_WORDS) -> List[str]:
+    """Overlapping word n-grams of the normalised text"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) <= n:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + n]) for i in range(len(words) - n + 1)]
+
+class MinHasher:
+    """Fixed-length signatures whose agreement estimates Jaccard similarity"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        values = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in set(shingles(text))),
+            dtype=np.uint64
+        )
+        # Universal hashing modulo 2**64 (uint64 arithmetic wraps)
+        return (values[:, None] * self.a + self.b).min(axis=0)
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    return float(np.mean(first == second))
+
+class DescriptionDeduper:
+    """Assigns every description to a shared group, creating groups as needed"""
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._exact: Dict[Tuple[str, str], str] = {}
+        self._buckets: Dict[Tuple[str, int, bytes], List[str]] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self.stats = {
+            "descriptions": 0,
+            "shared_documents": 0,
+            "exact_duplicates": 0,
+            "near_duplicates": 0,
+            "description_bytes": 0,
+            "shared_bytes": 0
+        }
+
+    def _band_keys(self, group: str, signature: np.ndarray):
+        for band in range(self.bands):
+            rows = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            yield (group, band, rows.tobytes())
+
+    def assign(self, group: str, text: str) -> Tuple[str, bool]:
+        """(shared_id, is_new) for ``text`` within ``group`` (e.g. brand + pattern)"""
+        self.stats["descriptions"] += 1
+        self.stats["description_bytes"] += len(text.encode("utf-8"))
+
+        shared_id = self._exact.get((group, text))
+        if shared_id:
+            self.stats["exact_duplicates"] += 1
+            return shared_id, False
+
+        signature = self.hasher.signature(text)
+        keys = list(self._band_keys(group, signature))
+        candidates = []
+        for key in keys:
+            for candidate in self._buckets.get(key, []):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+        for candidate in candidates:
+            if similarity(signature, self._signatures[candidate]) >= self.threshold:
+                self._exact[(group, text)] = candidate
+                self.stats["near_duplicates"] += 1
+                return candidate, False
+
+        shared_id = f"shared:{_hash(group + chr(31) + text)[:16]}"
+        self._exact[(group, text)] = shared_id
+        self._signatures[shared_id] = signature
+        for key in keys:
+            self._buckets.setdefault(key, []).append(shared_id)
+        self.stats["shared_documents"] += 1
+        self.stats["shared_bytes"] += len(text.encode("utf-8"))
+        return shared_id, True
+
+    def report(self, dim: int = 0) -> Dict[str, Any]:
+        """What collapsing duplicates saved compared with one copy per row.
+
+        Without dedup every description is embedded (and stored) inside
+        each of its rows; with it, once per shared document. The shared
+        documents are vectors of their own, so ``dim`` (float32) is used
+        to net those out of the index bytes saved.
+        """
+        stats = dict(self.stats)
+        stats["description_copies_embedded_saved"] = stats["descriptions"] - stats["shared_documents"]
+        stats["embedded_bytes_saved"] = stats["description_bytes"] - stats["shared_bytes"]
+        stats["extra_vectors"] = stats["shared_documents"]
+        if dim:
+            stats["index_bytes_saved"] = stats["embedded_bytes_saved"] - stats["shared_documents"] * dim * 4
+        return stats
@@ -0,0 +1,139 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+from langchain_core.embeddings import Embeddings
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different inputs share a cache entry"""
+    return " ".join(text.split()).casefold()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-memory LRU in front of an on-disk store.
+
+    Vectors are keyed by model name, task (query or document, since Gemini
+    embeds them differently) and normalised text. The disk tier is a
+    SQLite file in WAL mode, so every worker process and every index
+    rebuild shares it and it survives restarts.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, memory_size: int = 10000,
+                 disk_path: Optional[str] = None):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.memory_size = memory_size
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --- storage tiers ---
+
+    def _key(self, task: str, text: str) -> str:
+        raw = f"{self.model_name}\x00{task}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_disk(self) -> Optional[sqlite3.Connection]:
+        if self.disk_path and self._disk is None:
+            connection = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL
+                )
+            """)
+            connection.commit()
+            self._disk = connection
+        return self._disk
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            disk = self._get_disk()
+            if missing and disk is not None:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = disk.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f", blob).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+        return found
+
+    def _store(self, entries: Dict[str, List[float]]):
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+            disk = self._get_disk()
+            if disk is not None and entries:
+                disk.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in entries.items()]
+                )
+                disk.commit()
+
+    # --- Embeddings interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(keys)
+
+        # Embed each distinct missing text once
+        pending = OrderedDict()
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        if pending:
+            with self._lock:
+                self.misses += len(pending)
+            vectors = self.underlying.embed_documents(list(pending.values()))
+            new_entries = dict(zip(pending.keys(), vectors))
+            self._store(new_entries)
+            found.update(new_entries)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+        with self._lock:
+            self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_size": self.memory_size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0
+        }
@@ -0,0 +1,275 @@
+"""Flat in-memory vector index backed by a NumPy matrix.
+
+The whole catalog fits in RAM many times over, so instead of going
+through the Chroma client every query is one matrix-vector product
+against a contiguous float32 matrix with precomputed norms, followed by
+``argpartition`` for the top k. Selected with ``VECTOR_BACKEND=flat``.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Filter masks kept per index (one byte per row each)
+MAX_MASKS = 64
+
+def matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma ``where`` syntax the retrievers use"""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches(metadata, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches(metadata, clause) for clause in where["$or"])
+    for field, condition in where.items():
+        if isinstance(condition, dict):
+            if "$eq" in condition and metadata.get(field) != condition["$eq"]:
+                return False
+            if "$in" in condition and metadata.get(field) not in condition["$in"]:
+                return False
+        elif metadata.get(field) != condition:
+            return False
+    return True
+
+class FlatIndex(VectorStore):
+    """Exact cosine-similarity search over a float32 matrix"""
+
+    def __init__(self, embedding: Embeddings, path: Optional[str] = None):
+        self.embedding = embedding
+        self.path = path
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._count = 0
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Optional quantised/PCA copy scanned first; see app/quantization.py
+        self.compressed = None
+        self.rescore_factor = 4
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._count]
+
+    # --- writes ---
+
+    def _ensure_writable(self):
+        """Copy memory-mapped (read-only) arrays into private memory before a write"""
+        # Codes no longer line up with the rows once they change
+        self.compressed = None
+        if not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors)
+            self._norms = np.array(self._norms)
+
+    def _reserve(self, rows: int, dim: int):
+        """Grow the matrix geometrically so appends stay amortised O(1)"""
+        if self._vectors.shape[1] not in (0, dim):
+            raise ValueError(f"Vector dimension {dim} does not match index dimension {self._vectors.shape[1]}")
+        needed = self._count + rows
+        if needed <= self._vectors.shape[0] and self._vectors.shape[1] == dim:
+            return
+        capacity = max(needed, self._vectors.shape[0] * 2, 1024)
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        norms = np.zeros(capacity, dtype=np.float32)
+        if self._count:
+            vectors[:self._count] = self._vectors[:self._count]
+            norms[:self._count] = self._norms[:self._count]
+        self._vectors, self._norms = vectors, norms
+
+    def upsert_embeddings(self, ids: List[str], embeddings: List[List[float]],
+                          documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Insert or replace precomputed vectors (used by the ingestion pipeline)"""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or not len(matrix):
+            return
+        with self._lock:
+            self._ensure_writable()
+            self._reserve(len(matrix), matrix.shape[1])
+            norms = np.linalg.norm(matrix, axis=1)
+            for doc_id, vector, norm, text, metadata in zip(ids, matrix, norms, documents, metadatas):
+                position = self._positions.get(doc_id)
+                if position is None:
+                    position = self._count
+                    self._count += 1
+                    self._positions[doc_id] = position
+                    self.ids.append(doc_id)
+                    self.texts.append(text)
+                    self.metadatas.append(metadata or {})
+                else:
+                    self.texts[position] = text
+                    self.metadatas[position] = metadata or {}
+                self._vectors[position] = vector
+                self._norms[position] = norm
+            self._masks.clear()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(self._count + i) for i in range(len(texts))]
+        self.upsert_embeddings(ids, self.embedding.embed_documents(texts), texts, metadatas)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            doomed = {self._positions[i] for i in ids if i in self._positions}
+            if not doomed:
+                return False
+            self._ensure_writable()
+            keep = np.array([p for p in range(self._count) if p not in doomed], dtype=np.int64)
+            self._vectors = self._vectors[keep] if len(keep) else np.zeros((0, self._vectors.shape[1]), dtype=np.float32)
+            self._norms = self._norms[keep]
+            self.ids = [self.ids[p] for p in keep]
+            self.texts = [self.texts[p] for p in keep]
+            self.metadatas = [self.metadatas[p] for p in keep]
+            self._count = len(keep)
+            self._positions = {doc_id: p for p, doc_id in enumerate(self.ids)}
+            self._masks.clear()
+            return True
+
+    # --- reads ---
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chroma-compatible ``get`` used by the indexer and query analyser"""
+        include = ["metadatas", "documents"] if include is None else include
+        with self._lock:
+            positions = range(self._count) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+            result = {"ids": [self.ids[p] for p in positions]}
+            if "metadatas" in include:
+                result["metadatas"] = [self.metadatas[p] for p in positions]
+            if "documents" in include:
+                result["documents"] = [self.texts[p] for p in positions]
+            return result
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Rows matching ``where``; call with the lock held"""
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches(m, where) for m in self.metadatas), dtype=bool, count=self._count)
+            self._masks[key] = mask
+            while len(self._masks) > MAX_MASKS:
+                self._masks.popitem(last=False)
+        else:
+            self._masks.move_to_end(key)
+        return mask
+
+    def search_vector(self, embedding: List[float], k: int = 4,
+                      filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """(position, cosine similarity) of the top ``k`` rows"""
+        query = np.asarray(embedding, dtype=np.float32)
+        # Only take references under the lock: writers replace the arrays
+        # (or write past ``count``), so the scan itself can run unlocked
+        with self._lock:
+            count = self._count
+            if not count:
+                return []
+            vectors, norms, compressed = self._vectors, self._norms, self.compressed
+            mask = self._mask(filter) if filter else None
+        if compressed is not None:
+            return self._search_compressed(query, k, vectors, norms, count, compressed, mask)
+        scores = vectors[:count] @ query
+        scores /= np.maximum(norms[:count] * np.linalg.norm(query), 1e-12)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(p), float(scores[p])) for p in top if np.isfinite(scores[p])]
+
+    def _search_compressed(self, query: np.ndarray, k: int, vectors: np.ndarray, norms: np.ndarray,
+                           count: int, compressed, mask: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        """Scan the compressed copy, then re-score the best candidates exactly"""
+        approx = compressed.scores(query)
+        if mask is not None:
+            approx = np.where(mask, approx, -np.inf)
+        count = min(k * self.rescore_factor, count)
+        candidates = np.argpartition(-approx, count - 1)[:count]
+        # Sorted so reads from a memory-mapped matrix go front to back
+        candidates = np.sort(candidates[np.isfinite(approx[candidates])])
+        if not len(candidates):
+            return []
+        exact = vectors[candidates] @ query
+        exact /= np.maximum(norms[candidates] * np.linalg.norm(query), 1e-12)
+        order = np.argsort(-exact)[:k]
+        return [(int(candidates[i]), float(exact[i])) for i in order]
+
+    def _to_document(self, position: int) -> Document:
+        return Document(page_content=self.texts[position], metadata=self.metadatas[position])
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [self._to_document(p) for p, _ in self.search_vector(embedding, k, kwargs.get("filter"))]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        hits = self.search_vector(self.embedding.embed_query(query), k, kwargs.get("filter"))
+        return [(self._to_document(p), score) for p, score in hits]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "FlatIndex":
+        index = cls(embedding, path=kwargs.get("path"))
+        index.add_texts(texts, metadatas, ids)
+        return index
+
+    # --- persistence ---
+
+    def persist(self, path: Optional[str] = None):
+        """Write vectors.npy plus a JSON sidecar for ids, texts and metadata"""
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            np.save(os.path.join(path, "vectors.npy"), self.vectors)
+            with open(os.path.join(path, "records.json"), "w") as f:
+                json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+
+    @classmethod
+    def from_arrays(cls, embedding: Embeddings, vectors: np.ndarray, ids: List[str], texts: List[str],
+                    metadatas: List[Dict[str, Any]], norms: Optional[np.ndarray] = None,
+                    path: Optional[str] = None) -> "FlatIndex":
+        """Wrap existing arrays (possibly memory-mapped) without copying them"""
+        index = cls(embedding, path=path)
+        if norms is None:
+            norms = np.linalg.norm(vectors, axis=1).astype(np.float32) if len(vectors) else np.zeros(0, dtype=np.float32)
+        index._vectors = vectors
+        index._norms = norms
+        index._count = len(vectors)
+        index.ids = list(ids)
+        index.texts = list(texts)
+        index.metadatas = list(metadatas)
+        index._positions = {doc_id: p for p, doc_id in enumerate(index.ids)}
+        return index
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings) -> "FlatIndex":
+        vectors_path = os.path.join(path, "vectors.npy")
+        if not os.path.exists(vectors_path):
+            return cls(embedding, path=path)
+        vectors = np.ascontiguousarray(np.load(vectors_path), dtype=np.float32)
+        with open(os.path.join(path, "records.json")) as f:
+            records = json.load(f)
+        return cls.from_arrays(embedding, vectors, records["ids"], records["texts"], records["metadatas"], path=path)
@@ -0,0 +1,101 @@
+"""Incremental catalog re-indexing.
+
+    python -m app.indexer [--csv PATH] [--dry-run]
+
+Diffs the catalog CSV against what is already in the Chroma collection
+using each row's stable id and content hash, embeds only new or changed
+rows and deletes rows that disappeared from the CSV.
+"""
+import argparse
+import json
+import time
+from typing import Dict, Any, List
+from .config import settings
+from . import vector_store
+from .ingest import IngestionPipeline
+
+def existing_rows(store) -> Dict[str, Dict[str, Any]]:
+    """row_id -> {"content_hash", "ids"} for everything in the collection"""
+    rows = {}
+    data = store.get(include=["metadatas"])
+    for doc_id, metadata in zip(data["ids"], data["metadatas"]):
+        metadata = metadata or {}
+        # Chunks written before stable ids existed are keyed by their own id
+        row_id = metadata.get("row_id", doc_id)
+        entry = rows.setdefault(row_id, {"content_hash": metadata.get("content_hash"), "ids": []})
+        entry["ids"].append(doc_id)
+    return rows
+
+def sync(store=None, csv_path: str = None, dry_run: bool = False) -> Dict[str, Any]:
+    """Bring the collection in line with the CSV and report what changed"""
+    start = time.perf_counter()
+    store = store or vector_store.get_vector_store()
+    current = existing_rows(store)
+
+    added: List[str] = []
+    changed: List[str] = []
+    unchanged = 0
+    stale_ids: List[str] = []
+    pending_rows = []
+
+    rows = vector_store.read_catalog_rows(csv_path or settings.CSV_PATH)
+    # Shared description documents come through as entries of their own
+    for row_id, content_hash, ids, documents in vector_store.iter_row_documents(rows, vector_store.make_deduper()):
+        entry = current.pop(row_id, None)
+        if entry and entry["content_hash"] == content_hash:
+            unchanged += 1
+            continue
+        if entry:
+            changed.append(row_id)
+            stale_ids.extend(entry["ids"])
+        else:
+            added.append(row_id)
+        pending_rows.append((row_id, ids, documents))
+
+    # Whatever is left in the collection no longer exists in the CSV
+    removed = list(current)
+    for entry in current.values():
+        stale_ids.extend(entry["ids"])
+
+    # Upsert first so a failed embedding run leaves the old rows searchable;
+    # only ids the new rows did not overwrite are deleted afterwards
+    replaced = {chunk_id for _, ids, _ in pending_rows for chunk_id in ids}
+    stale_ids = [chunk_id for chunk_id in stale_ids if chunk_id not in replaced]
+    chunks_embedded = 0
+    if not dry_run:
+        if pending_rows:
+            chunks_embedded = IngestionPipeline().run(store, pending_rows)["embeddings"]
+        if stale_ids:
+            store.delete(ids=stale_ids)
+        vector_store.persist(store)
+
+    return {
+        "dry_run": dry_run,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": unchanged,
+        "chunks_embedded": chunks_embedded,
+        "chunks_deleted": 0 if dry_run else len(stale_ids),
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally re-index the tyre catalog")
+    parser.add_argument("--csv", default=settings.CSV_PATH, help="catalog CSV to index")
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = sync(csv_path=args.csv, dry_run=args.dry_run)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Added:     {len(report['added'])} rows")
+        print(f"Changed:   {len(report['changed'])} rows")
+        print(f"Removed:   {len(report['removed'])} rows")
+        print(f"Unchanged: {report['unchanged']} rows")
+        print(f"Embedded {report['chunks_embedded']} chunks, deleted {report['chunks_deleted']} in {report['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Parallel, batched and resumable vector store ingestion.
+
+    python -m app.ingest [--csv PATH] [--batch-size N] [--workers N] [--rpm N] [--fresh]
+
+Rows are streamed from the CSV, turned into documents, embedded by a pool
+of workers in batches (optionally rate limited) and upserted into Chroma
+by a single writer. Completed rows are recorded in a checkpoint file so
+an interrupted build resumes where it stopped. The store is persisted and
+the checkpoint rewritten every ``checkpoint_batches`` batches or
+``checkpoint_seconds`` seconds, whichever comes first; at most that much
+work is redone after an interruption.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterable, List, Tuple, Dict, Any, Optional
+from langchain_core.documents import Document
+from .config import settings
+from . import vector_store
+
+class RateLimiter:
+    """Spaces calls evenly to stay under ``per_minute`` requests (0 = unlimited)"""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class IngestionPipeline:
+    """Reader -> chunker -> concurrent embedders -> batched writer"""
+
+    def __init__(self, embeddings=None, batch_size: int = None, workers: int = None,
+                 requests_per_minute: int = None, max_retries: int = 5,
+                 checkpoint_path: Optional[str] = None, checkpoint_batches: int = None,
+                 checkpoint_seconds: float = None):
+        self.embeddings = embeddings or vector_store.embeddings
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.workers = workers or settings.INGEST_WORKERS
+        self.rate_limiter = RateLimiter(
+            settings.INGEST_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        )
+        self.max_retries = max_retries
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_batches = checkpoint_batches or settings.INGEST_CHECKPOINT_BATCHES
+        self.checkpoint_seconds = settings.INGEST_CHECKPOINT_SECONDS if checkpoint_seconds is None else checkpoint_seconds
+        self.stats = {
+            "rows": 0,
+            "rows_skipped": 0,
+            "chunks": 0,
+            "embeddings": 0,
+            "batches": 0,
+            "retries": 0,
+            "checkpoints": 0
+        }
+        self._stats_lock = threading.Lock()
+
+    # --- checkpoint ---
+
+    def _load_checkpoint(self, source: str) -> set:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path) as f:
+            data = json.load(f)
+        if data.get("source") != source:
+            print(f"Ignoring checkpoint for a different source: {data.get('source')}")
+            return set()
+        print(f"Resuming from checkpoint: {len(data['done'])} rows already written")
+        return set(data["done"])
+
+    def _save_checkpoint(self, source: str, done: set):
+        if not self.checkpoint_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"source": source, "done": sorted(done)}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # --- stages ---
+
+    def _batches(self, rows: Iterable[Tuple[str, List[str], List[Document]]], done: set):
+        """Group whole rows into batches of roughly ``batch_size`` chunks"""
+        batch = {"row_ids": [], "ids": [], "documents": []}
+        for row_id, ids, documents in rows:
+            if row_id in done:
+                self.stats["rows_skipped"] += 1
+                continue
+            self.stats["rows"] += 1
+            self.stats["chunks"] += len(documents)
+            batch["row_ids"].append(row_id)
+            batch["ids"].extend(ids)
+            batch["documents"].extend(documents)
+            if len(batch["documents"]) >= self.batch_size:
+                yield batch
+                batch = {"row_ids": [], "ids": [], "documents": []}
+        if batch["documents"]:
+            yield batch
+
+    def _embed(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        texts = [document.page_content for document in batch["documents"]]
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                batch["vectors"] = self.embeddings.embed_documents(texts)
+                with self._stats_lock:
+                    self.stats["embeddings"] += len(texts)
+                return batch
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(2 ** attempt, 30)
+                print(f"Embedding batch failed ({e}), retrying in {delay}s")
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                time.sleep(delay)
+
+    def _checkpoint(self, store, source: str, done: set):
+        # Rows only count as done once they are durable
+        vector_store.persist(store, publish=False)
+        self._save_checkpoint(source, done)
+        self.stats["checkpoints"] += 1
+
+    def _writer(self, store, source: str, done: set, batches: queue.Queue, errors: list):
+        unsaved, last_saved = 0, time.monotonic()
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            try:
+                vector_store.upsert_embeddings(store, batch["ids"], batch["vectors"], batch["documents"])
+                done.update(batch["row_ids"])
+                self.stats["batches"] += 1
+                unsaved += 1
+                if self.checkpoint_path and (unsaved >= self.checkpoint_batches
+                                             or time.monotonic() - last_saved >= self.checkpoint_seconds):
+                    self._checkpoint(store, source, done)
+                    unsaved, last_saved = 0, time.monotonic()
+            except Exception as e:
+                errors.append(e)
+
+    def run(self, store, rows: Iterable[Tuple[str, List[str], List[Document]]], source: str = "") -> Dict[str, Any]:
+        """Embed and upsert ``(row_id, ids, documents)`` items into ``store``"""
+        start = time.perf_counter()
+        done = self._load_checkpoint(source)
+        # Written before the first batch: a store directory without a
+        # finished build always has a checkpoint next to it
+        self._save_checkpoint(source, done)
+        written = queue.Queue(maxsize=self.workers * 2)
+        errors = []
+        writer = threading.Thread(target=self._writer, args=(store, source, done, written, errors), daemon=True)
+        writer.start()
+
+        failed = False
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed-worker") as executor:
+                pending = set()
+                for batch in self._batches(rows, done):
+                    # Keep a bounded number of batches in flight
+                    if len(pending) >= self.workers * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            written.put(future.result())
+                    if errors:
+                        break
+                    pending.add(executor.submit(self._embed, batch))
+                for future in pending:
+                    written.put(future.result())
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            written.put(None)
+            writer.join()
+            if self.checkpoint_path and (failed or errors):
+                # Whichever stage failed, keep the rows written so far
+                try:
+                    self._checkpoint(store, source, done)
+                except Exception as e:
+                    print(f"Failed to save the ingest checkpoint: {e}")
+
+        if errors:
+            raise errors[0]
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        seconds = time.perf_counter() - start
+        report = dict(self.stats)
+        report["seconds"] = round(seconds, 2)
+        report["rows_per_sec"] = round(self.stats["rows"] / seconds, 1) if seconds else 0
+        report["embeddings_per_sec"] = round(self.stats["embeddings"] / seconds, 1) if seconds else 0
+        return report
+
+def catalog_documents(csv_path: str, deduper=None):
+    """Stream ``(row_id, ids, documents)`` for every row of the catalog CSV"""
+    for row_id, _, ids, documents in vector_store.iter_row_documents(vector_store.read_catalog_rows(csv_path), deduper):
+        yield row_id, ids, documents
+
+def ingest_catalog(store, csv_path: str, pipeline: IngestionPipeline = None) -> Dict[str, Any]:
+    """Ingest the catalog CSV into ``store``, sharing repeated descriptions if enabled"""
+    deduper = vector_store.make_deduper()
+    report = (pipeline or IngestionPipeline()).run(store, catalog_documents(csv_path, deduper), source=csv_path)
+    if deduper is not None:
+        report["dedup"] = deduper.report(vector_store.embedding_dim(store))
+        dedup = report["dedup"]
+        print(f"Dedup: {dedup['descriptions']} descriptions -> {dedup['shared_documents']} shared documents "
+              f"({dedup['exact_duplicates']} exact, {dedup['near_duplicates']} near duplicates), "
+              f"{dedup['embedded_bytes_saved']} fewer bytes embedded, "
+              f"{dedup.get('index_bytes_saved', 0)} index bytes saved net of {dedup['extra_vectors']} extra vectors")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the vector store from the catalog CSV")
+    parser.add_argument("--csv", default=settings.CSV_PATH, help="catalog CSV to ingest")
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE, help="chunks per embedding call")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS, help="concurrent embedding workers")
+    parser.add_argument("--rpm", type=int, default=settings.INGEST_REQUESTS_PER_MINUTE, help="embedding requests per minute (0 = unlimited)")
+    parser.add_argument("--checkpoint", default=settings.INGEST_CHECKPOINT, help="checkpoint file for resuming")
+    parser.add_argument("--fresh", action="store_true", help="ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    if args.fresh and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    pipeline = IngestionPipeline(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+        checkpoint_path=args.checkpoint
+    )
+    store = vector_store.open_vector_store()
+    report = ingest_catalog(store, args.csv, pipeline)
+    vector_store.persist(store)
+    print(f"✅ Ingested {report['rows']} rows ({report['rows_skipped']} skipped from checkpoint), "
+          f"{report['embeddings']} embeddings in {report['batches']} batches, {report['seconds']}s")
+    print(f"   {report['rows_per_sec']} rows/sec, {report['embeddings_per_sec']} embeddings/sec, {report['retries']} retries")
+
+if __name__ == "__main__":
+    main()
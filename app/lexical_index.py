@@ -0,0 +1,157 @@
+"""In-process BM25 / inverted index over the tyre catalog.
+
+Built from the same CSV and document builder as the vector store. Exact
+tyre sizes ("265/65 R17") and pattern names ("Alnac 4G") are indexed as
+whole terms, so questions naming one can be answered without an
+embedding call; everything else is fused with the vector results.
+"""
+import math
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple, Iterable
+from langchain_core.documents import Document
+from . import catalog
+
+TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+# Reciprocal rank fusion constant (Cormack et al. use 60)
+RRF_K = 60
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens plus one ``size:`` term per tyre size"""
+    lowered = text.lower()
+    tokens = TOKEN.findall(lowered)
+    tokens.extend(f"size:{size}" for size in catalog.find_sizes(lowered))
+    return tokens
+
+def document_key(document: Document) -> str:
+    return document.metadata.get("row_id") or document.page_content
+
+class LexicalIndex:
+    """BM25 over catalog documents with exact size/pattern lookups"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Document] = []
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.lengths: List[int] = []
+        self.avg_length = 0.0
+        # pattern first token -> [(pattern tokens, doc indexes)]
+        self.patterns: Dict[str, List[Tuple[Tuple[str, ...], List[int]]]] = {}
+        self.sizes: Dict[str, List[int]] = defaultdict(list)
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Document]) -> "LexicalIndex":
+        index = cls()
+        for document in documents:
+            index.add(document)
+        index.finalize()
+        return index
+
+    def add(self, document: Document):
+        position = len(self.documents)
+        self.documents.append(document)
+        tokens = tokenize(document.page_content)
+        self.lengths.append(len(tokens))
+        counts = defaultdict(int)
+        for token in tokens:
+            counts[token] += 1
+        for token, count in counts.items():
+            self.postings[token][position] = count
+
+        size_key = document.metadata.get("size_key")
+        if size_key:
+            self.sizes[size_key].append(position)
+        pattern = document.metadata.get("pattern")
+        if pattern:
+            pattern_tokens = tuple(TOKEN.findall(pattern.lower()))
+            if pattern_tokens:
+                self._add_pattern(pattern_tokens, position)
+
+    def _add_pattern(self, pattern_tokens: Tuple[str, ...], position: int):
+        entries = self.patterns.setdefault(pattern_tokens[0], [])
+        for tokens, positions in entries:
+            if tokens == pattern_tokens:
+                positions.append(position)
+                return
+        entries.append((pattern_tokens, [position]))
+
+    def finalize(self):
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        # Longest patterns first so "Apterra HT2" wins over "Apterra"
+        for entries in self.patterns.values():
+            entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def score(self, tokens: List[str], candidates: Iterable[int] = None) -> Dict[int, float]:
+        """BM25 scores for ``tokens``, optionally restricted to ``candidates``"""
+        allowed = set(candidates) if candidates is not None else None
+        scores = defaultdict(float)
+        total = len(self.documents)
+        for token in set(tokens):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for position, tf in posting.items():
+                if allowed is not None and position not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.avg_length)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int = 5) -> List[Document]:
+        scores = self.score(tokenize(query))
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [self.documents[position] for position in ranked]
+
+    def exact_matches(self, query: str) -> List[int]:
+        """Documents whose tyre size or pattern name appears verbatim in the query"""
+        lowered = query.lower()
+        matched = set()
+        for size in catalog.find_sizes(lowered):
+            matched.update(self.sizes.get(size, []))
+        tokens = TOKEN.findall(lowered)
+        for start, token in enumerate(tokens):
+            for pattern_tokens, positions in self.patterns.get(token, []):
+                if tuple(tokens[start:start + len(pattern_tokens)]) == pattern_tokens:
+                    matched.update(positions)
+                    break
+        return list(matched)
+
+    def exact_search(self, query: str, k: int = 5) -> List[Document]:
+        """Exact size/pattern hits ranked by BM25, or [] when there are none"""
+        matched = self.exact_matches(query)
+        if not matched:
+            return []
+        scores = self.score(tokenize(query), matched)
+        ranked = sorted(matched, key=lambda position: scores.get(position, 0.0), reverse=True)[:k]
+        return [self.documents[position] for position in ranked]
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 5) -> List[Document]:
+    """Fuse ranked lists by summing 1 / (RRF_K + rank) per document"""
+    scores = defaultdict(float)
+    documents = {}
+    for results in result_lists:
+        for rank, document in enumerate(results):
+            key = document_key(document)
+            scores[key] += 1.0 / (RRF_K + rank + 1)
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in ranked]
+
+def build_from_csv(csv_path: str) -> LexicalIndex:
+    """Index the catalog CSV with the same documents the vector store gets"""
+    from . import vector_store
+    start = time.perf_counter()
+    documents = []
+    rows = vector_store.read_catalog_rows(csv_path)
+    for _, _, _, row_documents in vector_store.iter_row_documents(rows, vector_store.make_deduper()):
+        documents.extend(row_documents)
+    index = LexicalIndex.from_documents(documents)
+    print(f"Lexical index: {len(index)} documents, {len(index.postings)} terms in {time.perf_counter() - start:.2f}s")
+    return index
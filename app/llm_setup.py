@@ -2,11 +2,11 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from .config import settings
 
-def get_llm():
+def get_llm(streaming: bool = False):
     return ChatGoogleGenerativeAI(
         model=settings.LLM_MODEL,
         google_api_key=settings.GEMINI_API_KEY,
-        disable_streaming=True
+        disable_streaming=not streaming
     )
 
 SYSTEM_PROMPT = PromptTemplate(
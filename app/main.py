@@ -3,15 +3,37 @@ import asyncio
 import threading
 import time
 import requests
+from contextlib import asynccontextmanager
 os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"] = "python"
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import update_sessions_table
-from .routers import chat
+from .database import update_sessions_table, update_messages_table
+from .rollups import ensure_rollup_tables
+from .routers import chat, admin
 from . import analytics
+from .rag_runtime import rag_runtime, index_watcher
+from .worker_pool import worker_pool
+from .db_pool import db_pool
+from .vector_store import embeddings
+from .answer_cache import answer_cache
+from .session_memory import session_memory
 
-app = FastAPI(title="Google Gen AI RAG App with ChromaDB")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the vector store, LLM client and QA chain once per process
+    rag_runtime.open()
+    analytics.event_queue.start()
+    # Rebuild the index in place when the catalog CSV changes
+    index_watcher.start()
+    yield
+    index_watcher.stop()
+    rag_runtime.close()
+    worker_pool.shutdown()
+    # Flush every analytics event still waiting in memory
+    analytics.event_queue.stop()
+
+app = FastAPI(title="Google Gen AI RAG App with ChromaDB", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,9 +56,12 @@ app.add_middleware(
 # Include routers
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 # Initialize database schema
 update_sessions_table()
+update_messages_table()
+ensure_rollup_tables()
 
 # Background task to mark inactive users
 def cleanup_inactive_users():
@@ -65,6 +90,19 @@ print("🚀 Started background cleanup task (runs every 5 minutes)")
 async def root():
     return {"message": "API is running"}
 
+@app.get("/stats")
+async def runtime_stats():
+    """Construction and reuse statistics for shared runtime components"""
+    return {
+        "rag_runtime": rag_runtime.stats(),
+        "worker_pool": worker_pool.stats(),
+        "db_pool": db_pool.stats(),
+        "analytics_queue": analytics.event_queue.stats(),
+        "embedding_cache": embeddings.stats(),
+        "answer_cache": answer_cache.stats(),
+        "session_memory": session_memory.stats()
+    }
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""One-off data migrations.
+
+    python -m app.migrations backfill-turn-links
+
+links every historical bot message to the user message it answered
+(``messages.reply_to_message_id``) and stores the response time, so
+/analytics/messages can count interactions without self-joins.
+"""
+import sys
+from .db_pool import db_pool
+from .database import update_messages_table
+
+def backfill_turn_links() -> int:
+    """Pair each bot message with the user message right before it in its conversation"""
+    update_messages_table()
+    with db_pool.transaction() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE messages a
+                JOIN (
+                    SELECT 
+                        message_id,
+                        message_type,
+                        timestamp,
+                        LAG(message_id) OVER turn as prev_id,
+                        LAG(message_type) OVER turn as prev_type,
+                        LAG(timestamp) OVER turn as prev_timestamp
+                    FROM messages
+                    WINDOW turn AS (PARTITION BY conversation_id ORDER BY timestamp, message_type DESC)
+                ) t ON t.message_id = a.message_id
+                SET a.reply_to_message_id = t.prev_id,
+                    a.response_time_ms = TIMESTAMPDIFF(MICROSECOND, t.prev_timestamp, t.timestamp) DIV 1000
+                WHERE t.message_type = 'bot'
+                AND t.prev_type = 'user'
+                AND a.reply_to_message_id IS NULL
+            """)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+MIGRATIONS = {
+    "backfill-turn-links": backfill_turn_links,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"Usage: python -m app.migrations [{'|'.join(MIGRATIONS)}]")
+        sys.exit(1)
+    updated = MIGRATIONS[sys.argv[1]]()
+    print(f"✅ {sys.argv[1]}: {updated} rows updated")
@@ -0,0 +1,135 @@
+"""Token-budgeted prompt assembly.
+
+The answer prompt is the static instructions in ``llm_setup.SYSTEM_PROMPT``
+plus the user location, the question, chat history and retrieved
+context. ``PromptAssembler`` measures each part and fits the whole into
+``budget`` tokens:
+
+* instructions, location, question and the session summary are always kept
+* up to ``history_tokens`` are reserved for history
+* context gets the rest; the lowest-ranked documents go first, and the
+  top document is truncated rather than dropped if it alone is too big
+* history then fills what context left over; the oldest turns go first
+
+Token counts are estimated from character length (``chars_per_token``),
+which is close enough to budget by without a tokenizer round-trip.
+"""
+import math
+import threading
+from typing import Dict, Any, List, Tuple
+from .config import settings
+from .rag_pipeline import format_history, format_documents
+
+PARTS = ("instructions", "location", "question", "summary", "history", "context")
+
+class PromptAssembler:
+    """Fits history and context into a token budget and records what went in"""
+
+    def __init__(self, budget: int = None, history_tokens: int = None, chars_per_token: float = None):
+        self.budget = budget or settings.PROMPT_TOKEN_BUDGET
+        self.history_tokens = settings.PROMPT_HISTORY_TOKENS if history_tokens is None else history_tokens
+        self.chars_per_token = chars_per_token or settings.PROMPT_CHARS_PER_TOKEN
+        self._lock = threading.Lock()
+        self._instructions = {}
+        self.totals = {part: 0 for part in PARTS}
+        self.prompts = 0
+        self.over_budget = 0
+        self.documents_dropped = 0
+        self.turns_dropped = 0
+        self.truncations = 0
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token) if text else 0
+
+    def instructions_tokens(self, prompt) -> int:
+        """Tokens of the template itself, with every variable empty"""
+        key = id(prompt)
+        if key not in self._instructions:
+            self._instructions[key] = self.count(prompt.format(**{name: "" for name in prompt.input_variables}))
+        return self._instructions[key]
+
+    def fit_history(self, chat_history: List[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        """The newest turns whose formatted text fits in ``limit`` tokens"""
+        kept, used = [], 0
+        for turn in reversed(chat_history):
+            tokens = self.count(format_history([turn])) + 1
+            if used + tokens > limit:
+                break
+            kept.append(turn)
+            used += tokens
+        return kept[::-1]
+
+    def fit_documents(self, documents, limit: int) -> Tuple[list, bool]:
+        """The highest-ranked documents that fit in ``limit`` tokens (and whether one was cut)"""
+        kept, used = [], 0
+        for document in documents:
+            tokens = self.count(document.page_content) + 1
+            if used + tokens > limit:
+                break
+            kept.append(document)
+            used += tokens
+        if documents and not kept and limit > 0:
+            top = documents[0]
+            chars = int(limit * self.chars_per_token)
+            return [top.__class__(page_content=top.page_content[:chars], metadata=top.metadata)], True
+        return kept, False
+
+    def build(self, prompt, question: str, chat_history: List[Tuple[str, str]], documents,
+              user_location: str, summary: str = "") -> Tuple[str, Dict[str, Any]]:
+        """(prompt text, token composition) within the budget"""
+        fixed = {
+            "instructions": self.instructions_tokens(prompt),
+            "location": self.count(user_location),
+            "question": self.count(question),
+            "summary": self.count(summary)
+        }
+        available = max(self.budget - sum(fixed.values()), 0)
+
+        # Reserve history's share first so context cannot starve it entirely
+        history_reserve = min(self.history_tokens, self.count(format_history(chat_history)) + len(chat_history))
+        kept_documents, truncated = self.fit_documents(documents, max(available - history_reserve, 0))
+        context = format_documents(kept_documents)
+        kept_turns = self.fit_history(chat_history, max(available - self.count(context), 0))
+        history = format_history(kept_turns)
+
+        text = prompt.format(
+            context=context, question=question, chat_history=format_history(kept_turns, summary),
+            user_location=user_location
+        )
+        composition = dict(fixed)
+        composition.update({
+            "history": self.count(history),
+            "context": self.count(context),
+            "total": self.count(text),
+            "budget": self.budget,
+            "documents_kept": len(kept_documents),
+            "documents_dropped": len(documents) - len(kept_documents),
+            "turns_kept": len(kept_turns),
+            "turns_dropped": len(chat_history) - len(kept_turns),
+            "truncated": truncated
+        })
+        self._record(composition)
+        return text, composition
+
+    def _record(self, composition: Dict[str, Any]):
+        with self._lock:
+            self.prompts += 1
+            for part in PARTS:
+                self.totals[part] += composition[part]
+            self.over_budget += composition["total"] > self.budget
+            self.documents_dropped += composition["documents_dropped"]
+            self.turns_dropped += composition["turns_dropped"]
+            self.truncations += composition["truncated"]
+
+    def stats(self) -> Dict[str, Any]:
+        prompts = self.prompts
+        return {
+            "budget": self.budget,
+            "history_tokens": self.history_tokens,
+            "prompts": prompts,
+            "avg_tokens": {part: round(self.totals[part] / prompts, 1) if prompts else 0 for part in PARTS},
+            "over_budget": self.over_budget,
+            "documents_dropped": self.documents_dropped,
+            "turns_dropped": self.turns_dropped,
+            "truncations": self.truncations
+        }
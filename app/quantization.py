@@ -0,0 +1,137 @@
+"""Compressed vector copies for the candidate scan.
+
+The full-precision vectors stay on disk (memory-mapped in a snapshot);
+queries scan a compressed copy to pick ``k * rescore_factor`` candidates
+and only those rows are re-scored exactly against the originals.
+
+Supported encodings, optionally after a PCA projection learned from the
+indexed vectors:
+
+* ``float16`` - half precision, 2 bytes per dimension
+* ``int8``    - scalar quantisation with a per-dimension scale and offset,
+                1 byte per dimension
+* ``float32`` - only useful together with PCA
+
+Compression is applied when a snapshot is written, so it only takes
+effect with ``VECTOR_BACKEND=snapshot``; see ``warn_if_unused``.
+"""
+import os
+from typing import Optional
+import numpy as np
+
+KINDS = ("float32", "float16", "int8")
+
+# Rows decoded to float32 per step of the scan; small enough that the
+# decode buffer stays in cache
+CHUNK_ROWS = 1024
+
+def warn_if_unused(backend: str, quantization: str, pca_dim: int):
+    """Say so when compression is configured for a backend that ignores it"""
+    if backend != "snapshot" and (quantization not in ("none", "") or pca_dim):
+        print(f"⚠️ VECTOR_QUANTIZATION={quantization} / VECTOR_PCA_DIM={pca_dim} only apply with "
+              f"VECTOR_BACKEND=snapshot; ignored with VECTOR_BACKEND={backend}")
+
+class CompressedVectors:
+    """Approximate inner products against unit-normalised index vectors"""
+
+    def __init__(self, codes: np.ndarray, kind: str, scale: Optional[np.ndarray] = None,
+                 offset: Optional[np.ndarray] = None, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown vector encoding {kind!r}, expected one of {KINDS}")
+        self.codes = codes
+        self.kind = kind
+        self.scale = scale
+        self.offset = offset
+        self.mean = mean
+        self.components = components
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, kind: str = "int8", pca_dim: int = 0,
+              sample: int = 50000, seed: int = 0) -> "CompressedVectors":
+        """Learn the optional PCA and quantisation ranges, then encode ``vectors``"""
+        unit = _normalise(vectors)
+        mean = components = None
+        if pca_dim and pca_dim < unit.shape[1]:
+            rng = np.random.default_rng(seed)
+            rows = rng.choice(len(unit), size=min(sample, len(unit)), replace=False)
+            mean = unit[rows].mean(axis=0)
+            # Right singular vectors of the centred sample = principal axes
+            _, _, vt = np.linalg.svd(unit[rows] - mean, full_matrices=False)
+            components = np.ascontiguousarray(vt[:pca_dim].T, dtype=np.float32)
+            mean = mean.astype(np.float32)
+        codec = cls(np.zeros((0, 0), dtype=np.float32), kind, mean=mean, components=components)
+        projected = codec._project(unit)
+
+        if kind == "int8":
+            low = projected.min(axis=0)
+            high = projected.max(axis=0)
+            codec.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+            codec.offset = low.astype(np.float32)
+        codec.codes = codec._encode(projected)
+        return codec
+
+    def _project(self, unit: np.ndarray) -> np.ndarray:
+        if self.components is None:
+            return np.asarray(unit, dtype=np.float32)
+        return (unit - self.mean) @ self.components
+
+    def _encode(self, projected: np.ndarray) -> np.ndarray:
+        if self.kind == "int8":
+            levels = np.rint((projected - self.offset) / self.scale) - 128
+            return np.clip(levels, -128, 127).astype(np.int8)
+        return np.ascontiguousarray(projected, dtype=self.kind)
+
+    @property
+    def nbytes(self) -> int:
+        extra = sum(a.nbytes for a in (self.scale, self.offset, self.mean, self.components) if a is not None)
+        return int(self.codes.nbytes) + extra
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of every row to ``query`` (rank-preserving)"""
+        q = self._project(_normalise(query[None, :]))[0].astype(np.float32)
+        if self.kind == "int8":
+            # x ~= (code + 128) * scale + offset, so x.q = code.(scale*q) + const
+            weights = self.scale * q
+            constant = float(128.0 * weights.sum() + self.offset @ q)
+        else:
+            weights, constant = q, 0.0
+        if self.kind == "float32":
+            return self.codes @ weights + constant
+        out = np.empty(len(self.codes), dtype=np.float32)
+        buffer = np.empty((min(CHUNK_ROWS, len(self.codes)), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), CHUNK_ROWS):
+            block = self.codes[start:start + CHUNK_ROWS]
+            rows = len(block)
+            buffer[:rows] = block
+            out[start:start + rows] = buffer[:rows] @ weights
+        out += constant
+        return out
+
+    def save(self, path: str):
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        arrays = {"kind": np.array(self.kind)}
+        for name in ("scale", "offset", "mean", "components"):
+            value = getattr(self, name)
+            if value is not None:
+                arrays[name] = value
+        np.savez(os.path.join(path, "codec.npz"), **arrays)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Optional["CompressedVectors"]:
+        codes_path = os.path.join(path, "codes.npy")
+        if not os.path.exists(codes_path):
+            return None
+        codes = np.load(codes_path, mmap_mode="r" if mmap else None)
+        with np.load(os.path.join(path, "codec.npz")) as arrays:
+            extra = {name: arrays[name] for name in ("scale", "offset", "mean", "components") if name in arrays}
+            kind = str(arrays["kind"])
+        return cls(codes, kind, **extra)
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
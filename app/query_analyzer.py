@@ -0,0 +1,176 @@
+"""Lightweight query analysis for metadata-filtered retrieval.
+
+Pulls the vehicle category, tyre size, rim diameter and brand out of a
+question and turns them into Chroma ``where`` filters on the normalised
+metadata written by ``catalog.build_document``.
+"""
+import re
+import threading
+from typing import Dict, Any, List, Optional, Iterable
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+from . import catalog
+from .lexical_index import reciprocal_rank_fusion
+
+# 15 inch, 15", R15, rim 15, 15-inch rim
+RIM_PATTERNS = [
+    re.compile(r"\b(\d{2})\s*(?:-\s*)?(?:inch|inches|\")", re.IGNORECASE),
+    re.compile(r"\brim\s*(?:size\s*)?(?:of\s*)?(\d{2})\b", re.IGNORECASE),
+    re.compile(r"(?<![/\d])\bz?r\s?(\d{2})\b", re.IGNORECASE)
+]
+
+# Filter relaxation order: most specific first, unfiltered last
+RELAXATION = [
+    ["size_key", "brand_key", "category_key"],
+    ["size_key"],
+    ["rim", "brand_key", "category_key"],
+    ["rim", "category_key"],
+    ["brand_key", "category_key"],
+    ["category_key"],
+    []
+]
+
+class QueryAnalyzer:
+    """Extracts catalog filters from free-text questions"""
+
+    def __init__(self, brands: Iterable[str] = ("apollo", "vredestein")):
+        self.brands = {b.lower() for b in brands}
+
+    def learn(self, metadatas: Iterable[Dict[str, Any]]):
+        """Pick up brand names from the indexed catalog"""
+        for metadata in metadatas:
+            brand = (metadata or {}).get("brand_key")
+            if brand:
+                self.brands.add(brand)
+
+    def extract_rim(self, question: str) -> Optional[int]:
+        for pattern in RIM_PATTERNS:
+            match = pattern.search(question)
+            if match:
+                rim = int(match.group(1))
+                # Tyre rims run from 8" (scooters) to 42" (tractor rears)
+                if 8 <= rim <= 42:
+                    return rim
+        return None
+
+    def extract_brand(self, question: str) -> Optional[str]:
+        lowered = question.lower()
+        for brand in sorted(self.brands, key=len, reverse=True):
+            if re.search(rf"\b{re.escape(brand)}\b", lowered):
+                return brand
+        return None
+
+    def analyze(self, question: str) -> Dict[str, Any]:
+        """Filters mentioned in ``question``, keyed by metadata field"""
+        filters = {}
+        size_key = catalog.normalize_size(question)
+        if size_key:
+            filters["size_key"] = size_key
+        rim = catalog.rim_diameter(size_key) if size_key else self.extract_rim(question)
+        if rim:
+            filters["rim"] = rim
+        category = catalog.normalize_category(question)
+        if category:
+            filters["category_key"] = category
+        brand = self.extract_brand(question)
+        if brand:
+            filters["brand_key"] = brand
+        return filters
+
+def to_where(filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Chroma ``where`` clause for the given field -> value filters"""
+    clauses = [{field: value} for field, value in filters.items()]
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+def relaxed_filters(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Progressively looser filter sets, ending with no filter at all"""
+    candidates = []
+    for fields in RELAXATION:
+        candidate = {f: filters[f] for f in fields if f in filters}
+        if (candidate or not fields) and candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+class FilteredRetriever(BaseRetriever):
+    """Similarity search narrowed by filters extracted from the question.
+
+    Tries the most specific filter set first and relaxes it until a search
+    returns documents, so a question about a size or category that is not
+    in the catalog still falls back to an unfiltered search.
+
+    With a ``lexical`` index, questions naming an exact tyre size or
+    pattern are answered from it alone (no embedding call); all others get
+    the vector results fused with BM25 results.
+
+    Variants that point at a shared description document (see
+    ``app/dedup.py``) get it appended once, after the variants.
+    """
+
+    store: Any
+    analyzer: Any
+    lexical: Any = None
+    k: int = 5
+    _counters: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {
+            "queries": 0, "lexical_only": 0, "filtered": 0, "relaxed": 0, "unfiltered": 0,
+            "shared_attached": 0
+        }
+    )
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        self._count("queries")
+        if self.lexical is None:
+            return self._with_shared(self._vector_search(query))
+        exact = self.lexical.exact_search(query, self.k)
+        if exact:
+            self._count("lexical_only")
+            return self._with_shared(exact)
+        fused = reciprocal_rank_fusion([self._vector_search(query), self.lexical.search(query, self.k)], self.k)
+        return self._with_shared(fused)
+
+    def _with_shared(self, documents: List[Document]) -> List[Document]:
+        present = {document.metadata.get("row_id") for document in documents}
+        wanted = []
+        for document in documents:
+            shared_id = document.metadata.get("shared_id")
+            if shared_id and shared_id not in present and shared_id not in wanted:
+                wanted.append(shared_id)
+        if not wanted:
+            return documents
+        data = self.store.get(ids=[f"{shared_id}:0" for shared_id in wanted], include=["documents", "metadatas"])
+        shared = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+        ]
+        with self._lock:
+            self._counters["shared_attached"] += len(shared)
+        return documents + shared
+
+    def _vector_search(self, query: str) -> List[Document]:
+        filters = self.analyzer.analyze(query)
+        candidates = relaxed_filters(filters)
+        for attempt, candidate in enumerate(candidates):
+            documents = self.store.similarity_search(query, k=self.k, filter=to_where(candidate))
+            if documents or not candidate:
+                if not candidate:
+                    self._count("unfiltered")
+                elif attempt == 0:
+                    self._count("filtered")
+                else:
+                    self._count("relaxed")
+                return documents
+        return []
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
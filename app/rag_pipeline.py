@@ -0,0 +1,182 @@
+"""Retrieval + answer pipeline with an optional question-condense step.
+
+Replaces ``ConversationalRetrievalChain``, which always spent one LLM
+round-trip rewriting the question into a standalone query before the
+answer call. Here the rewrite only happens when the question actually
+leans on the conversation:
+
+* no history                      -> ask as-is          (path ``no_history``)
+* self-contained by the heuristic -> ask as-is          (path ``standalone``)
+* rewritten before for this history -> reuse the rewrite (path ``memoized``)
+* otherwise                       -> one condense call  (path ``rewritten``)
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, List, Tuple
+from langchain_core.prompts import PromptTemplate
+
+CONDENSE_PROMPT = PromptTemplate.from_template(
+    """Given the following conversation and a follow up question, rephrase the follow up question to be a standalone question, in its original language.
+
+Chat History:
+{chat_history}
+Follow Up Input: {question}
+Standalone question:"""
+)
+
+# Words that point back at something said earlier
+FOLLOW_UP = re.compile(
+    r"\b(it|its|it's|they|them|their|that|those|these|this one|one|ones|same|above|"
+    r"previous|earlier|mentioned|former|latter|else|other|another|instead|also|too)\b"
+    r"|^\s*(and|or|but|so|what about|how about)\b",
+    re.IGNORECASE
+)
+
+# Topics a question can be about without naming a product
+TOPICS = re.compile(
+    r"\b(warranty|guarantee|dealers?|showroom|store|puncture|pressure|rotation|alignment|"
+    r"balancing|installation|tubeless|tread|tyres?|tires?)\b",
+    re.IGNORECASE
+)
+
+MIN_STANDALONE_WORDS = 4
+
+def format_history(chat_history: List[Tuple[str, str]], summary: str = "") -> str:
+    """Render (question, answer) turns the way the prompts expect, after any session summary"""
+    lines = [summary] if summary else []
+    for question, answer in chat_history:
+        lines.append(f"Human: {question}")
+        if answer:
+            lines.append(f"Assistant: {answer}")
+    return "\n".join(lines)
+
+def format_documents(documents) -> str:
+    return "\n\n".join(document.page_content for document in documents)
+
+class QuestionCondenser:
+    """Turns follow-up questions into standalone ones, calling the LLM only when needed.
+
+    Shared by every index generation: rewrites do not depend on the index.
+    """
+
+    PATHS = ("no_history", "standalone", "memoized", "rewritten")
+
+    def __init__(self, llm=None, memo_size: int = 1000):
+        self.llm = llm
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.paths = {path: 0 for path in self.PATHS}
+
+    def is_standalone(self, question: str, analyzer=None, lexical=None) -> bool:
+        """Cheap check: no back-references and enough subject matter to retrieve on"""
+        if FOLLOW_UP.search(question):
+            return False
+        if len(question.split()) < MIN_STANDALONE_WORDS:
+            return False
+        if TOPICS.search(question):
+            return True
+        if analyzer is not None and analyzer.analyze(question):
+            return True
+        return bool(lexical is not None and lexical.exact_matches(question))
+
+    def _key(self, history: str, question: str) -> str:
+        return hashlib.sha1(f"{history}\x00{' '.join(question.split()).casefold()}".encode("utf-8")).hexdigest()
+
+    def _count(self, path: str):
+        with self._lock:
+            self.paths[path] += 1
+
+    async def condense(self, question: str, chat_history: List[Tuple[str, str]],
+                       analyzer=None, lexical=None, summary: str = "") -> Tuple[str, str]:
+        """(standalone question, path taken)"""
+        if not chat_history and not summary:
+            self._count("no_history")
+            return question, "no_history"
+        if self.is_standalone(question, analyzer, lexical):
+            self._count("standalone")
+            return question, "standalone"
+
+        history = format_history(chat_history, summary)
+        key = self._key(history, question)
+        with self._lock:
+            rewrite = self._memo.get(key)
+            if rewrite is not None:
+                self._memo.move_to_end(key)
+                self.paths["memoized"] += 1
+                return rewrite, "memoized"
+
+        response = await self.llm.ainvoke(CONDENSE_PROMPT.format(chat_history=history, question=question))
+        rewrite = response.content.strip() or question
+        with self._lock:
+            self._memo[key] = rewrite
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+            self.paths["rewritten"] += 1
+        return rewrite, "rewritten"
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.paths.values())
+        return {
+            "paths": dict(self.paths),
+            "llm_calls_saved": total - self.paths["rewritten"],
+            "memo_entries": len(self._memo)
+        }
+
+class RAGPipeline:
+    """Condense (when needed) -> retrieve -> assemble within budget -> stream the answer"""
+
+    def __init__(self, retriever, condenser: QuestionCondenser, answer_llm, prompt: PromptTemplate,
+                 assembler=None):
+        self.retriever = retriever
+        self.condenser = condenser
+        self.answer_llm = answer_llm
+        self.prompt = prompt
+        self.assembler = assembler
+
+    def is_standalone(self, question: str) -> bool:
+        return self.condenser.is_standalone(
+            question, getattr(self.retriever, "analyzer", None), getattr(self.retriever, "lexical", None)
+        )
+
+    async def astream(self, inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``{"delta": text}`` per answer chunk, then ``{"answer", "question", "path", "tokens"}``"""
+        chat_history = inputs.get("chat_history") or []
+        # Session summary and slot record (see app/session_memory.py)
+        summary = inputs.get("chat_summary") or ""
+        if self.assembler is not None:
+            # The rewrite never needs more history than the answer may use
+            chat_history = self.assembler.fit_history(chat_history, self.assembler.budget)
+        question, path = await self.condenser.condense(
+            inputs["question"], chat_history,
+            getattr(self.retriever, "analyzer", None), getattr(self.retriever, "lexical", None), summary
+        )
+        documents = await self.retriever.ainvoke(question)
+        user_location = inputs.get("user_location", "Unknown")
+        tokens = None
+        if self.assembler is not None:
+            prompt, tokens = self.assembler.build(
+                self.prompt, question, chat_history, documents, user_location, summary
+            )
+        else:
+            prompt = self.prompt.format(
+                context=format_documents(documents),
+                question=question,
+                chat_history=format_history(chat_history, summary),
+                user_location=user_location
+            )
+        parts = []
+        async for chunk in self.answer_llm.astream(prompt):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {"delta": chunk.content}
+        yield {"answer": "".join(parts), "question": question, "path": path, "tokens": tokens}
+
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        result = {}
+        async for part in self.astream(inputs):
+            if "answer" in part:
+                result = part
+        return result
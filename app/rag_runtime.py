@@ -0,0 +1,398 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, AsyncIterator, Optional
+from . import vector_store, llm_setup
+from .config import settings
+from .query_analyzer import QueryAnalyzer, FilteredRetriever
+from .lexical_index import build_from_csv
+from .rag_pipeline import RAGPipeline, QuestionCondenser
+from .prompt_budget import PromptAssembler
+
+# Queries every freshly built index must answer before it goes live
+SMOKE_QUERIES = [
+    "185/65 R15 tyre price",
+    "best tyres for a motorcycle",
+    "SUV tyres for highway driving"
+]
+
+class IndexGeneration:
+    """One built index (store, retriever and pipeline) and the requests using it"""
+
+    def __init__(self, number: int, location: Optional[str], store, retriever, chain):
+        self.number = number
+        self.location = location
+        self.store = store
+        self.retriever = retriever
+        self.chain = chain
+        self.leases = 0
+        self.retired = False
+        self.created_at = time.time()
+
+    def release(self):
+        """Drop the index once no request holds it any more"""
+        print(f"Releasing index generation {self.number} ({self.location})")
+        # Close the backend first: its directory may be pruned afterwards
+        try:
+            vector_store.close_store(self.store)
+        except Exception as e:
+            print(f"❌ Failed to close index generation {self.number}: {e}")
+        self.chain = None
+        self.retriever = None
+        self.store = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "number": self.number,
+            "location": self.location,
+            "leases": self.leases,
+            "age_seconds": round(time.time() - self.created_at, 1)
+        }
+
+class RAGRuntime:
+    """Process-wide owner of the vector store, retriever and RAG pipeline.
+
+    Everything here is built once when the app starts and shared by every
+    request. The pipeline itself is stateless between calls (chat history
+    is passed in per invocation) so a single instance can serve all
+    sessions.
+
+    The index can be rebuilt while serving (``refresh``): requests take a
+    ``lease`` on the current generation, a new one is swapped in for new
+    requests, and the old one is released when its last lease ends.
+    """
+
+    def __init__(self, k: int = 5):
+        self.k = k
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.generation: Optional[IndexGeneration] = None
+        self.retired = []
+        # Locations of retired generations that have drained in this process
+        self.drained_locations = []
+        self.llm = None
+        self.answer_llm = None
+        self.condenser = QuestionCondenser()
+        self.assembler = PromptAssembler()
+        self.construction_seconds = 0.0
+        self.opened_at = None
+        self.requests_served = 0
+        self.acquire_seconds_total = 0.0
+        self.streams_served = 0
+        self.first_token_seconds_total = 0.0
+        self.swaps = 0
+        self.last_refresh: Dict[str, Any] = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self.generation is not None
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh_lock.locked()
+
+    @property
+    def store(self):
+        return self.generation.store if self.generation else None
+
+    @property
+    def retriever(self):
+        return self.generation.retriever if self.generation else None
+
+    def _build_generation(self, number: int, location: Optional[str], store,
+                          csv_path: str = None) -> IndexGeneration:
+        analyzer = QueryAnalyzer()
+        analyzer.learn(store.get(include=["metadatas"])["metadatas"])
+        # Lexical and vector indexes must come from the same catalog
+        lexical = build_from_csv(csv_path or settings.CSV_PATH) if settings.HYBRID_RETRIEVAL else None
+        retriever = FilteredRetriever(store=store, analyzer=analyzer, lexical=lexical, k=self.k)
+        chain = RAGPipeline(retriever, self.condenser, self.answer_llm, llm_setup.SYSTEM_PROMPT, self.assembler)
+        return IndexGeneration(number, location, store, retriever, chain)
+
+    def open(self):
+        """Build the vector store, LLM clients and pipeline (idempotent)"""
+        with self._lock:
+            if self.generation is not None:
+                return
+            start = time.perf_counter()
+            store = vector_store.get_vector_store()
+            self.llm = llm_setup.get_llm()
+            self.answer_llm = llm_setup.get_llm(streaming=True)
+            self.condenser.llm = self.llm
+            self.generation = self._build_generation(1, vector_store.active_location(), store)
+            self.construction_seconds = time.perf_counter() - start
+            self.opened_at = time.time()
+            print(f"RAG runtime ready in {self.construction_seconds:.2f}s")
+
+    def close(self):
+        """Drop the shared components so the Chroma client can be released"""
+        with self._lock:
+            if self.generation:
+                self.generation.release()
+            self.generation = None
+            self.retired = []
+            self.drained_locations = []
+            self.llm = None
+            self.answer_llm = None
+            print("RAG runtime closed")
+
+    @contextmanager
+    def lease(self):
+        """Hold the current index generation for the duration of one request"""
+        start = time.perf_counter()
+        if self.generation is None:
+            self.open()
+        with self._lock:
+            generation = self.generation
+            generation.leases += 1
+            self.requests_served += 1
+            self.acquire_seconds_total += time.perf_counter() - start
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.leases -= 1
+                drained = generation.retired and generation.leases == 0
+                if drained:
+                    self.retired.remove(generation)
+                    self.drained_locations.append(generation.location)
+            if drained:
+                generation.release()
+
+    def get_llm(self):
+        if self.llm is None:
+            self.open()
+        return self.llm
+
+    def _swap(self, generation: IndexGeneration):
+        """Point new requests at ``generation``; the old one drains"""
+        with self._lock:
+            old = self.generation
+            self.generation = generation
+            self.swaps += 1
+            drained = False
+            if old is not None:
+                old.retired = True
+                drained = old.leases == 0
+                if drained:
+                    self.drained_locations.append(old.location)
+                else:
+                    self.retired.append(old)
+        if drained:
+            old.release()
+        print(f"Index generation {generation.number} is live ({generation.location})")
+
+    def _validate(self, store, previous_count: int) -> int:
+        """Smoke-test a freshly built index before it goes live"""
+        count = len(store.get(include=[])["ids"])
+        if count == 0:
+            raise ValueError("New index is empty")
+        if previous_count and count < previous_count * settings.INDEX_MIN_SIZE_RATIO:
+            raise ValueError(f"New index has {count} documents, previous had {previous_count}")
+        for query in SMOKE_QUERIES:
+            if not store.similarity_search(query, k=3):
+                raise ValueError(f"Smoke query returned nothing: {query!r}")
+        return count
+
+    def refresh(self, csv_path: str = None) -> Dict[str, Any]:
+        """Blue/green rebuild: build aside, validate, activate, swap.
+
+        Raises RuntimeError if another refresh is already running in this
+        process.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            raise RuntimeError("An index refresh is already running")
+        start = time.perf_counter()
+        location = store = None
+        self.last_refresh = {"status": "building", "started_at": time.time()}
+        try:
+            if self.generation is None:
+                self.open()
+            current = self.generation
+            previous_count = len(current.store.get(include=[])["ids"])
+
+            store, location, report = vector_store.build_generation(csv_path)
+            count = self._validate(store, previous_count)
+            generation = self._build_generation(current.number + 1, location, store, csv_path)
+            vector_store.activate_generation(location)
+            self._swap(generation)
+            self._prune(keep={location, current.location})
+
+            self.last_refresh = {
+                "status": "live",
+                "generation": generation.number,
+                "location": location,
+                "documents": count,
+                "embeddings": report["embeddings"],
+                "seconds": round(time.perf_counter() - start, 2)
+            }
+            return self.last_refresh
+        except Exception as e:
+            live = self.generation.location if self.generation else None
+            if location != live:
+                if store is not None:
+                    vector_store.close_store(store)
+                vector_store.discard_generation(location)
+            self.last_refresh = {"status": "failed", "error": str(e), "seconds": round(time.perf_counter() - start, 2)}
+            print(f"❌ Index refresh failed, still serving the previous index: {e}")
+            raise
+        finally:
+            self._refresh_lock.release()
+
+    def _prune(self, keep):
+        """Delete drained generations' directories.
+
+        Generations still draining are never touched, and the one just
+        replaced is kept until the next refresh so other workers have time
+        to adopt the new index.
+        """
+        with self._lock:
+            keep = set(keep) | {g.location for g in self.retired}
+            doomed = [loc for loc in self.drained_locations if loc not in keep]
+            self.drained_locations = [loc for loc in self.drained_locations if loc in keep]
+        vector_store.prune_generations(doomed, keep)
+
+    def adopt(self, location: str):
+        """Swap to an index another worker built and activated"""
+        with self._refresh_lock:
+            if self.generation is None or self.generation.location == location:
+                return
+            store = vector_store.open_generation(location)
+            self._swap(self._build_generation(self.generation.number + 1, location, store))
+
+    async def astream_answer(self, inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, str]]:
+        """Run the pipeline and yield answer tokens as they are generated.
+
+        Yields ``{"delta": text}`` for every chunk of the answer LLM and a
+        final ``{"answer": text, "question": ..., "path": ..., "tokens": ...}``
+        holding the complete answer, the question retrieval used, the
+        condense path taken and the prompt's token composition.
+        """
+        with self.lease() as generation:
+            start = time.perf_counter()
+            first_token_at = None
+            async for part in generation.chain.astream(inputs):
+                if "delta" in part and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield part
+
+        if first_token_at is not None:
+            with self._lock:
+                self.streams_served += 1
+                self.first_token_seconds_total += first_token_at - start
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.requests_served
+        streams = self.streams_served
+        return {
+            "open": self.is_open,
+            "construction_seconds": round(self.construction_seconds, 4),
+            "requests_served": served,
+            "avg_acquire_ms": round(self.acquire_seconds_total / served * 1000, 4) if served else 0,
+            "streams_served": streams,
+            "avg_time_to_first_token_ms": round(self.first_token_seconds_total / streams * 1000, 1) if streams else 0,
+            "retrieval": self.retriever.stats() if self.retriever else {},
+            "condense": self.condenser.stats(),
+            "prompt": self.assembler.stats(),
+            "generation": self.generation.stats() if self.generation else None,
+            "draining_generations": [g.stats() for g in self.retired],
+            "swaps": self.swaps,
+            "last_refresh": self.last_refresh,
+            "uptime_seconds": round(time.time() - self.opened_at, 1) if self.opened_at else 0
+        }
+
+class IndexWatcher:
+    """Polls CSV_PATH and the active-index pointer for changes.
+
+    A changed CSV (once its mtime has been stable for one interval)
+    triggers ``refresh``; an exclusive lock file makes sure only one
+    worker process builds. A changed pointer means another worker built
+    and activated a new index, which this process then ``adopt``s.
+    """
+
+    def __init__(self, runtime: RAGRuntime, interval: float):
+        self.runtime = runtime
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _csv_signature(self):
+        try:
+            stat = os.stat(settings.CSV_PATH)
+            return (stat.st_mtime, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _attempted_path(self) -> str:
+        return f"{vector_store.base_path()}.build.attempted"
+
+    def _attempted(self):
+        """CSV signature of the last build any worker started (read under the build lock)"""
+        try:
+            with open(self._attempted_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _mark_attempted(self, signature):
+        with open(self._attempted_path(), "w") as f:
+            json.dump(list(signature), f)
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        import fcntl
+        seen = self._csv_signature()
+        pending = None
+        while not self._stop.wait(self.interval):
+            try:
+                location = vector_store.active_location()
+                generation = self.runtime.generation
+                if generation is not None and location and location != generation.location:
+                    self.runtime.adopt(location)
+                    seen = self._csv_signature()
+                    continue
+
+                signature = self._csv_signature()
+                if signature is None or signature == seen:
+                    pending = None
+                    continue
+                if signature != pending:
+                    # Wait one more interval in case the file is still being written
+                    pending = signature
+                    continue
+
+                # This signature counts as attempted whether this worker
+                # builds it, another one does, or the build fails: a bad
+                # CSV is tried once until the file changes again
+                seen = signature
+                pending = None
+                with open(f"{vector_store.base_path()}.build.lock", "w") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # another worker is building; adopt its result later
+                    if self._attempted() == list(signature):
+                        continue  # another worker already tried this version
+                    self._mark_attempted(signature)
+                    print(f"📄 {settings.CSV_PATH} changed, rebuilding the index")
+                    self.runtime.refresh()
+            except Exception as e:
+                print(f"❌ Index watcher error: {e}")
+
+# Global instances
+rag_runtime = RAGRuntime()
+index_watcher = IndexWatcher(rag_runtime, settings.INDEX_WATCH_INTERVAL)
@@ -0,0 +1,194 @@
+"""Daily and hourly rollups of dashboard metrics.
+
+The analytics writer adds deltas to these tables as events are flushed,
+so dashboard endpoints read a handful of pre-aggregated rows instead of
+scanning the raw sessions/conversations/messages tables. Daily rows are
+kept forever; hourly rows older than ``ROLLUP_HOURLY_RETENTION_DAYS`` are
+deleted (their totals are already in the daily rows). Run
+
+    python -m app.rollups backfill
+
+once to rebuild the rollups from existing data.
+"""
+import sys
+import time
+from typing import Dict, Any
+from mysql.connector import Error
+from .config import settings
+from .db_pool import db_pool
+from .database import execute_query, ensure_index
+
+METRICS = (
+    "sessions_started",
+    "conversations_started",
+    "conversations_completed",
+    "conversation_duration_total",
+    "sessions_ended",
+    "session_duration_total",
+    "user_messages",
+    "bot_messages",
+    "system_messages",
+    "leads",
+)
+
+TABLES = {
+    "analytics_daily_rollup": "day DATE NOT NULL",
+    "analytics_hourly_rollup": "hour DATETIME NOT NULL",
+}
+
+# Hourly retention is enforced at most this often by the writer
+PRUNE_INTERVAL = 3600
+_last_prune = [0.0]
+
+def prune_hourly(cursor):
+    """Delete hourly rows past the retention window (a primary-key range delete)"""
+    cursor.execute(
+        "DELETE FROM analytics_hourly_rollup WHERE hour < DATE_SUB(CURDATE(), INTERVAL %s DAY)",
+        (settings.ROLLUP_HOURLY_RETENTION_DAYS,)
+    )
+    _last_prune[0] = time.time()
+
+def ensure_rollup_tables():
+    try:
+        metric_columns = ",\n".join(f"{metric} BIGINT NOT NULL DEFAULT 0" for metric in METRICS)
+        for table, key_column in TABLES.items():
+            key = key_column.split()[0]
+            execute_query(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {key_column},
+                    {metric_columns},
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    PRIMARY KEY ({key})
+                )
+            """, fetch=False)
+            # Tables created before a metric existed get its column added
+            columns = execute_query("""
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_NAME = %s
+                AND TABLE_SCHEMA = DATABASE()
+            """, (table,))
+            existing_columns = {col['COLUMN_NAME'] for col in columns}
+            for metric in METRICS:
+                if metric not in existing_columns:
+                    execute_query(f"""
+                        ALTER TABLE {table}
+                        ADD COLUMN {metric} BIGINT NOT NULL DEFAULT 0
+                    """, fetch=False)
+        # Indexes for the live-state counts and "recent" lists on the dashboard
+        ensure_index("conversations", "idx_conversations_status", "status")
+        ensure_index("conversations", "idx_conversations_start_time", "start_time")
+        ensure_index("sessions", "idx_sessions_status", "status")
+        # Keyset pagination of recent sessions (newest first)
+        ensure_index("sessions", "idx_sessions_start_time", "start_time, session_id")
+        ensure_index("messages", "idx_messages_timestamp", "timestamp")
+        print("Rollup tables ready")
+    except Error as e:
+        print(f"Error creating rollup tables: {e}")
+
+class RollupDeltas:
+    """Metric increments collected while a batch of events is applied"""
+
+    def __init__(self):
+        self.daily = {}
+        self.hourly = {}
+
+    def add(self, timestamp, metric: str, amount: int = 1):
+        if not amount:
+            return
+        timestamp = str(timestamp).replace("T", " ")
+        day = timestamp[:10]
+        hour = f"{timestamp[:13]}:00:00"
+        for buckets, key in ((self.daily, day), (self.hourly, hour)):
+            row = buckets.setdefault(key, {})
+            row[metric] = row.get(metric, 0) + amount
+
+    def write(self, connection):
+        """Apply all deltas with one multi-row upsert per table"""
+        cursor = connection.cursor()
+        try:
+            for table, buckets in (("analytics_daily_rollup", self.daily), ("analytics_hourly_rollup", self.hourly)):
+                if not buckets:
+                    continue
+                key = TABLES[table].split()[0]
+                row_template = "(" + ", ".join(["%s"] * (len(METRICS) + 1)) + ")"
+                updates = ", ".join(f"{m} = {m} + VALUES({m})" for m in METRICS)
+                params = []
+                for bucket, row in buckets.items():
+                    params.append(bucket)
+                    params.extend(row.get(metric, 0) for metric in METRICS)
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} ({key}, {', '.join(METRICS)})
+                    VALUES {', '.join([row_template] * len(buckets))}
+                    ON DUPLICATE KEY UPDATE {updates}
+                    """,
+                    tuple(params)
+                )
+            if time.time() - _last_prune[0] >= PRUNE_INTERVAL:
+                prune_hourly(cursor)
+        finally:
+            cursor.close()
+
+# Source query for each metric: (table, timestamp column, value expression, filter)
+BACKFILL_SOURCES = {
+    "sessions_started": ("sessions", "start_time", "COUNT(*)", "1 = 1"),
+    "conversations_started": ("conversations", "start_time", "COUNT(*)", "1 = 1"),
+    "conversations_completed": ("conversations", "end_time", "COUNT(*)", "status = 'completed'"),
+    "conversation_duration_total": ("conversations", "end_time", "COALESCE(SUM(duration), 0)", "status = 'completed'"),
+    "sessions_ended": ("sessions", "end_time", "COUNT(*)", "duration > 0"),
+    "session_duration_total": ("sessions", "end_time", "COALESCE(SUM(duration), 0)", "duration > 0"),
+    "user_messages": ("messages", "timestamp", "COUNT(*)", "message_type = 'user'"),
+    "bot_messages": ("messages", "timestamp", "COUNT(*)", "message_type = 'bot'"),
+    "system_messages": ("messages", "timestamp", "COUNT(*)", "message_type = 'system'"),
+    "leads": ("lead_analytics", "created_at", "COUNT(*)", "1 = 1"),
+}
+
+def backfill() -> Dict[str, Any]:
+    """Rebuild both rollup tables from the raw analytics tables"""
+    ensure_rollup_tables()
+    granularities = {
+        "analytics_daily_rollup": "DATE({column})",
+        "analytics_hourly_rollup": "DATE_FORMAT({column}, '%Y-%m-%d %H:00:00')",
+    }
+    with db_pool.transaction() as connection:
+        cursor = connection.cursor()
+        try:
+            for table, bucket_expr in granularities.items():
+                key = TABLES[table].split()[0]
+                cursor.execute(f"DELETE FROM {table}")
+                for metric, (source, column, value, condition) in BACKFILL_SOURCES.items():
+                    bucket = bucket_expr.format(column=column)
+                    cursor.execute(f"""
+                        INSERT INTO {table} ({key}, {metric})
+                        SELECT {bucket} AS bucket, {value}
+                        FROM {source}
+                        WHERE {column} IS NOT NULL AND {condition}
+                        GROUP BY bucket
+                        ON DUPLICATE KEY UPDATE {metric} = VALUES({metric})
+                    """)
+            prune_hourly(cursor)
+            cursor.execute("SELECT COUNT(*) FROM analytics_daily_rollup")
+            days = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM analytics_hourly_rollup")
+            hours = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    return {"days": days, "hours": hours}
+
+def read_totals() -> Dict[str, int]:
+    """All-time totals for every metric"""
+    sums = ", ".join(f"COALESCE(SUM({metric}), 0) AS {metric}" for metric in METRICS)
+    row = execute_query(f"SELECT {sums} FROM analytics_daily_rollup")[0]
+    return {metric: int(row[metric]) for metric in METRICS}
+
+def read_today() -> Dict[str, int]:
+    row = execute_query(f"SELECT {', '.join(METRICS)} FROM analytics_daily_rollup WHERE day = CURDATE()")
+    return {metric: int(row[0][metric]) if row else 0 for metric in METRICS}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Usage: python -m app.rollups backfill")
+        sys.exit(1)
+    result = backfill()
+    print(f"✅ Rollups rebuilt: {result['days']} days, {result['hours']} hours")
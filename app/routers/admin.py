@@ -0,0 +1,42 @@
+import secrets
+import threading
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header
+from ..config import settings
+from ..rag_runtime import rag_runtime
+
+router = APIRouter()
+
+def check_token(token: Optional[str]):
+    # Fail closed: without a configured token the admin API is off
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API is disabled (ADMIN_TOKEN is not set)")
+    if not token or not secrets.compare_digest(token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def run_refresh():
+    try:
+        rag_runtime.refresh()
+    except Exception as e:
+        print(f"❌ Reindex failed: {e}")
+
+@router.post("/reindex")
+async def reindex(x_admin_token: Optional[str] = Header(None)):
+    """Rebuild the catalog index in the background and hot-swap it when valid"""
+    check_token(x_admin_token)
+    if rag_runtime.refreshing:
+        raise HTTPException(status_code=409, detail="An index refresh is already running")
+    threading.Thread(target=run_refresh, name="reindex", daemon=True).start()
+    return {"status": "started", "generation": rag_runtime.generation.number if rag_runtime.generation else None}
+
+@router.get("/reindex")
+async def reindex_status(x_admin_token: Optional[str] = Header(None)):
+    """Outcome of the last refresh and the generations currently in use"""
+    check_token(x_admin_token)
+    stats = rag_runtime.stats()
+    return {
+        "last_refresh": stats["last_refresh"],
+        "generation": stats["generation"],
+        "draining_generations": stats["draining_generations"],
+        "swaps": stats["swaps"]
+    }
@@ -1,14 +1,21 @@
+import asyncio
 import json
-import uuid
 from datetime import datetime
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Body
-from langchain.chains import ConversationalRetrievalChain
-from .. import database, vector_store, llm_setup, analytics
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
+from .. import analytics
 from ..geocoding import geocoding_service
+from ..rag_runtime import rag_runtime
+from ..answer_cache import answer_cache, text_key
+from ..config import settings
+from ..session_memory import session_memory
+from ..worker_pool import worker_pool
 from ..schemas import QueryRequest
 
 router = APIRouter()
-chat_histories = {}
+# The socket currently serving each websocket session (the newest after a resume)
+session_sockets = {}
+_session_end_tasks = set()
 
 def get_location_context(latitude: float, longitude: float) -> str:
     """Get location context based on coordinates with city name"""
@@ -24,19 +31,56 @@ def get_location_context(latitude: float, longitude: float) -> str:
     
     return location_string
 
+def format_sse(event: str, data: dict) -> str:
+    """Format a single Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def history_from_messages(messages: list) -> list:
+    """(question, answer) turns from a client message list of user/assistant messages"""
+    turns = []
+    for msg in messages:
+        content = msg.get("content", msg.get("text", ""))
+        if msg.get("role") == "user":
+            turns.append((content, ""))
+        elif msg.get("role") == "assistant" and turns and not turns[-1][1]:
+            turns[-1] = (turns[-1][0], content)
+    return turns
+
+async def check_answer_cache(question: str, location_info: str, chat_history: list):
+    """(key, generation, hit) for a standalone question.
+
+    ``key`` is None when the cache does not apply (disabled, or the
+    question leans on earlier turns and is not standalone on its own).
+    """
+    if not answer_cache.enabled:
+        return None, None, None
+    if rag_runtime.generation is None:
+        rag_runtime.open()
+    generation = rag_runtime.generation
+    if chat_history and not generation.chain.is_standalone(question):
+        return None, None, None
+    lexical = getattr(generation.retriever, "lexical", None)
+    if lexical is not None and lexical.exact_matches(question):
+        # Retrieval answers exact size/pattern questions without embedding; so does the cache
+        key = text_key(question)
+    else:
+        key = await worker_pool.run(answer_cache.embed, question)
+    return key, generation.number, answer_cache.lookup(key, location_info, generation.number)
+
+def remember_answer(key, generation, question: str, location_info: str, chat_history: list, answer: str):
+    # Answers written with history may refer back to it; only first turns are shared
+    if key is not None and not chat_history:
+        answer_cache.store(key, question, location_info, generation, answer)
+
+def remember_turn(session_id, question: str, answer: str):
+    if session_id:
+        session_memory.record(session_id, question, answer)
+
 @router.post("/query")
-async def query_qa(req: QueryRequest):
-    retriever = vector_store.get_vector_store().as_retriever(search_kwargs={"k": 5})
-    session_id = req.session_id or "default"
-    
-    if session_id not in chat_histories:
-        chat_histories[session_id] = []
-    
-    qa = ConversationalRetrievalChain.from_llm(
-        llm=llm_setup.get_llm(),
-        retriever=retriever,
-        combine_docs_chain_kwargs={"prompt": llm_setup.SYSTEM_PROMPT}
-    )
+async def query_qa(req: QueryRequest, request: Request):
+    # Without a session id there is no memory: a shared "default" session
+    # would mix summaries and user facts across unrelated clients
+    session_id = req.session_id
     
     try:
         # Get location from request if available
@@ -46,20 +90,64 @@ async def query_qa(req: QueryRequest):
         if user_location and user_location.get('latitude') and user_location.get('longitude'):
             lat = user_location['latitude']
             lng = user_location['longitude']
-            location_info = get_location_context(lat, lng)
+            location_info = await worker_pool.run(get_location_context, lat, lng)
         
-        result = qa.invoke({
+        chat_history, chat_summary = [], ""
+        if session_id:
+            session_memory.observe(session_id, req.question, location_info)
+            chat_history = session_memory.history(session_id)
+            chat_summary = session_memory.context(session_id)
+        inputs = {
             "question": req.question,
-            "chat_history": chat_histories[session_id],
+            "chat_history": chat_history,
+            "chat_summary": chat_summary,
             "user_location": location_info
-        })
-        answer = result["answer"]
-        chat_histories[session_id].append((req.question, answer))
+        }
+        cache_key, generation, cached = await check_answer_cache(req.question, location_info, chat_history)
+        streaming = req.stream or "text/event-stream" in request.headers.get("accept", "")
+        
+        if cached:
+            remember_turn(session_id, req.question, cached["answer"])
+            if streaming:
+                async def cached_stream():
+                    yield format_sse("delta", {"text": cached["answer"]})
+                    yield format_sse("done", {"answer": cached["answer"], "cached": True})
+                return StreamingResponse(
+                    cached_stream(),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+                )
+            return {"answer": cached["answer"], "cached": True}
         
-        if len(chat_histories[session_id]) > 10:
-            chat_histories[session_id] = chat_histories[session_id][-10:]
+        # Server-Sent Events mode: push answer tokens as they are generated
+        if streaming:
+            async def event_stream():
+                try:
+                    async for part in rag_runtime.astream_answer(inputs):
+                        if "delta" in part:
+                            yield format_sse("delta", {"text": part["delta"]})
+                        else:
+                            answer = part["answer"]
+                            remember_answer(cache_key, generation, req.question, location_info, chat_history, answer)
+                            remember_turn(session_id, req.question, answer)
+                            yield format_sse("done", {"answer": answer, "cached": False})
+                except Exception as e:
+                    print(f"Error streaming answer: {e}")
+                    yield format_sse("error", {"error": str(e)})
+            
+            return StreamingResponse(
+                event_stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
-        return {"answer": answer}
+        with rag_runtime.lease() as index:
+            result = await index.chain.ainvoke(inputs)
+        answer = result["answer"]
+        remember_answer(cache_key, generation, req.question, location_info, chat_history, answer)
+        remember_turn(session_id, req.question, answer)
+        
+        return {"answer": answer, "cached": False}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -120,8 +208,8 @@ Return only the questions, one per line, without numbering or bullet points.
 """
         
         # Use the LLM to generate questions
-        llm = llm_setup.get_llm()
-        response = llm.invoke(prompt)
+        llm = rag_runtime.get_llm()
+        response = await llm.ainvoke(prompt)
         
         # Extract questions from the response
         questions_text = response.content.strip()
@@ -158,6 +246,48 @@ Return only the questions, one per line, without numbering or bullet points.
         ]
         return {"questions": fallback_questions}
 
+async def send_to_session(session_id: str, payload: dict) -> bool:
+    """Send to the session's current socket; False if there is none or it is gone"""
+    target = session_sockets.get(session_id)
+    if target is None:
+        return False
+    try:
+        await target.send_json(payload)
+        return True
+    except Exception:
+        return False
+
+async def end_session_later(session_id: str, detached_at: float):
+    """Record session_end once the resume window has passed without a resume"""
+    try:
+        await asyncio.sleep(settings.MEMORY_RESUME_SECONDS)
+    except asyncio.CancelledError:
+        # Shutting down: nothing can resume the session any more, so end it
+        # now and let the cancellation through
+        finish_session(session_id, detached_at)
+        raise
+    finish_session(session_id, detached_at)
+
+def finish_session(session_id: str, detached_at: float):
+    """Record session_end unless the session was resumed since detached_at"""
+    memory = session_memory.find(session_id)
+    if memory is None or memory.connections or memory.detached_at != detached_at:
+        return  # resumed (a later disconnect ends it) or already ended
+    session_memory.drop(session_id)
+    ended_at = datetime.fromtimestamp(detached_at)
+    # Session end time and duration are written by the analytics writer
+    analytics.record_user_event(
+        memory.user_id,
+        session_id,
+        "session_end",
+        {
+            "timestamp": ended_at.isoformat(),
+            "total_messages": memory.turns,
+            "duration": (ended_at - (memory.started_at or ended_at)).total_seconds()
+        },
+        timestamp=ended_at
+    )
+
 @router.websocket("/ws")
 async def websocket_endpoint_ws(websocket: WebSocket):
     try:
@@ -165,32 +295,65 @@ async def websocket_endpoint_ws(websocket: WebSocket):
         await websocket.accept()
         print("WebSocket connection accepted")
         
-        # Create a unique session ID for this WebSocket connection
-        session_id = analytics.generate_short_id()
-        user_id = analytics.generate_user_id()  # Generate a meaningful user ID
-        session_start_time = datetime.now()
-        chat_histories[session_id] = []
-        print(f"Created new session: {session_id} for user: {user_id}")
+        # A reconnecting client presents its resume token and the last
+        # turn it received; otherwise this is a new session
+        try:
+            last_seq = int(websocket.query_params.get("last_seq") or 0)
+        except ValueError:
+            last_seq = 0
+        session_id = session_memory.resume(websocket.query_params.get("session"))
+        resumed = session_id is not None
+        if resumed:
+            # Same analytics session: keep its user and start time
+            memory = session_memory.get(session_id)
+            user_id = memory.user_id or analytics.generate_user_id()
+            session_start_time = memory.started_at or datetime.now()
+            memory.user_id, memory.started_at = user_id, session_start_time
+        else:
+            session_id = analytics.generate_short_id()
+            user_id = analytics.generate_user_id()  # Generate a meaningful user ID
+            session_start_time = datetime.now()
+            memory = session_memory.get(session_id)
+            memory.user_id, memory.started_at = user_id, session_start_time
+        session_sockets[session_id] = websocket
+        print(f"{'Resumed' if resumed else 'Created new'} session: {session_id} for user: {user_id}")
         
         # Get client info
         client = websocket.client
         page_url = "unknown"  # Default value
         
         # Record session start
-        analytics.record_user_event(
-            user_id=user_id,
-            session_id=session_id,
-            event_type="session_start",
-            event_data={
-                "page_url": page_url,
-                "timestamp": session_start_time.isoformat(),
-                "connection_type": "websocket",
-                "client_info": {
-                    "host": client.host if hasattr(client, 'host') else 'unknown',
-                    "port": client.port if hasattr(client, 'port') else 'unknown'
+        if not resumed:
+            analytics.record_user_event(
+                user_id=user_id,
+                session_id=session_id,
+                event_type="session_start",
+                event_data={
+                    "page_url": page_url,
+                    "timestamp": session_start_time.isoformat(),
+                    "connection_type": "websocket",
+                    "client_info": {
+                        "host": client.host if hasattr(client, 'host') else 'unknown',
+                        "port": client.port if hasattr(client, 'port') else 'unknown'
+                    }
                 }
-            }
-        )
+            )
+        
+        await websocket.send_json({
+            "type": "session",
+            "session_token": session_memory.token(session_id),
+            "seq": session_memory.get(session_id).turns,
+            "resumed": resumed
+        })
+        # Answers that finished while the client was away
+        if resumed:
+            for seq, question, answer in session_memory.turns_since(session_id, last_seq):
+                await websocket.send_json({
+                    "text": answer,
+                    "done": True,
+                    "seq": seq,
+                    "replayed": True
+                })
         
         while True:
             try:
@@ -203,21 +366,19 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                 if "page_url" in message:
                     page_url = message["page_url"]
                     # Update session with page URL
-                    database.execute_query(
-                        """
-                        UPDATE sessions 
-                        SET page_url = %s 
-                        WHERE session_id = %s
-                        """,
-                        (page_url, session_id),
-                        fetch=False
+                    analytics.record_user_event(
+                        user_id,
+                        session_id,
+                        "session_update",
+                        {"page_url": page_url}
                     )
                 
                 # Extract user_id from message if provided
                 if "user_id" in message and message["user_id"]:
                     new_user_id = message["user_id"]
                     
-                    # First ensure the user exists by recording the identification event
+                    # Record the identification event; the analytics writer creates
+                    # the user and re-keys the session to it
                     analytics.record_user_event(
                         new_user_id,
                         session_id,
@@ -228,18 +389,8 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                         }
                     )
                     
-                    # Now that we know the user exists, update the session
-                    database.execute_query(
-                        """
-                        UPDATE sessions 
-                        SET user_id = %s 
-                        WHERE session_id = %s
-                        """,
-                        (new_user_id, session_id),
-                        fetch=False
-                    )
-                    
                     user_id = new_user_id
+                    session_memory.get(session_id).user_id = user_id
                 
                 # Process the message
                 if "user_input" in message:
@@ -255,23 +406,14 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                         if user_location.get('latitude') and user_location.get('longitude'):
                             lat = user_location['latitude']
                             lng = user_location['longitude']
-                            city_name = geocoding_service.get_city_from_coordinates(lat, lng)
+                            city_name = await worker_pool.run(geocoding_service.get_city_from_coordinates, lat, lng)
                             if city_name:
                                 user_location['city'] = city_name
                                 print(f"Detected city: {city_name}")
-                        
-                        # Store location data in session
-                        database.execute_query(
-                            """
-                            UPDATE sessions 
-                            SET location_data = %s 
-                            WHERE session_id = %s
-                            """,
-                            (json.dumps(user_location), session_id),
-                            fetch=False
-                        )
                     
-                    # Record the user's question with location
+                    # Record the user's question with location; the analytics
+                    # writer creates the session/conversation rows and stores
+                    # the location on the session
                     analytics.record_user_event(
                         user_id,
                         session_id,
@@ -279,51 +421,20 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                         {
                             "question": message["user_input"],
                             "timestamp": message_start_time.isoformat(),
-                            "chat_history_length": len(chat_histories[session_id]),
+                            "chat_history_length": session_memory.get(session_id).turns,
                             "user_location": user_location
                         }
                     )
 
-                    # Check if conversation exists for this session
-                    conversation = database.execute_query(
-                        """
-                        SELECT conversation_id 
-                        FROM conversations 
-                        WHERE session_id = %s AND status = 'active'
-                        """,
-                        (session_id,)
-                    )
-
-                    if not conversation:
-                        # Create new conversation if none exists
-                        conversation_id = str(uuid.uuid4())
-                        database.execute_query(
-                            """
-                            INSERT INTO conversations 
-                            (conversation_id, session_id, user_id, start_time, status)
-                            VALUES (%s, %s, %s, %s, 'active')
-                            """,
-                            (conversation_id, session_id, user_id, message_start_time.isoformat()),
-                            fetch=False
-                        )
-                    else:
-                        conversation_id = conversation[0]['conversation_id']
-                    
-                    # Get chat history from message
+                    # The server keeps the real (question, answer) turns; a
+                    # transcript from an older widget only seeds a new session
                     chat_history = message.get("chat_history", [])
-                    if chat_history:
-                        formatted_history = [(msg["content"], "") for msg in chat_history if msg["role"] == "user"]
-                        chat_histories[session_id] = formatted_history
-                    
-                    # Build retriever
-                    retriever = vector_store.get_vector_store().as_retriever(search_kwargs={"k": 5})
-                    
-                    # Use ConversationalRetrievalChain
-                    qa = ConversationalRetrievalChain.from_llm(
-                        llm=llm_setup.get_llm(),
-                        retriever=retriever,
-                        combine_docs_chain_kwargs={"prompt": llm_setup.SYSTEM_PROMPT}
-                    )
+                    if chat_history and not session_memory.get(session_id).turns:
+                        turns = history_from_messages(chat_history)
+                        # The client may already list the question being asked
+                        if turns and not turns[-1][1] and turns[-1][0] == message["user_input"]:
+                            turns.pop()
+                        session_memory.seed(session_id, turns)
                     
                     try:
                         # Format location information for the LLM
@@ -331,15 +442,43 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                         if user_location and user_location.get('latitude') and user_location.get('longitude'):
                             lat = user_location['latitude']
                             lng = user_location['longitude']
-                            location_info = get_location_context(lat, lng)
+                            location_info = await worker_pool.run(get_location_context, lat, lng)
                         
-                        # Get answer using chat history and location
-                        result = qa.invoke({
-                            "question": message["user_input"],
-                            "chat_history": chat_histories[session_id],
-                            "user_location": location_info
-                        })
-                        answer = result["answer"]
+                        session_memory.observe(session_id, message["user_input"], location_info)
+                        chat_history = session_memory.history(session_id)
+                        
+                        # Repeated standalone questions are answered from the cache
+                        cache_key, generation, cached = await check_answer_cache(
+                            message["user_input"], location_info, chat_history
+                        )
+                        condense_path = "cached"
+                        prompt_tokens = None
+                        if cached:
+                            answer = cached["answer"]
+                        else:
+                            # Stream the answer using recent turns, the session
+                            # summary and location; each chunk is pushed as
+                            # soon as the model emits it
+                            answer = ""
+                            async for part in rag_runtime.astream_answer({
+                                "question": message["user_input"],
+                                "chat_history": chat_history,
+                                "chat_summary": session_memory.context(session_id),
+                                "user_location": location_info
+                            }):
+                                if "delta" in part:
+                                    # Chunks follow the client to a resumed
+                                    # socket; if it is away the answer is
+                                    # still finished and replayed on resume
+                                    await send_to_session(session_id, {
+                                        "delta": part["delta"],
+                                        "done": False
+                                    })
+                                else:
+                                    answer = part["answer"]
+                                    condense_path = part.get("path")
+                                    prompt_tokens = part.get("tokens")
+                            remember_answer(cache_key, generation, message["user_input"], location_info, chat_history, answer)
                         response_time = (datetime.now() - message_start_time).total_seconds()
                         
                         # Record the bot's response
@@ -350,36 +489,27 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                             {
                                 "response": answer,
                                 "timestamp": datetime.now().isoformat(),
-                                "response_time": response_time
+                                "response_time": response_time,
+                                "cached": bool(cached),
+                                "condense_path": condense_path,
+                                "prompt_tokens": prompt_tokens
                             }
                         )
 
-                        # Update chat history
-                        chat_histories[session_id].append((message["user_input"], answer))
-                        
-                        # Update message count in sessions table (count each interaction as 1)
-                        database.execute_query(
-                            """
-                            UPDATE sessions 
-                            SET message_count = message_count + 1,
-                                last_message_time = %s
-                            WHERE session_id = %s
-                            """,
-                            (datetime.now().isoformat(), session_id),
-                            fetch=False
-                        )
-                        
-                        # Limit chat history length
-                        if len(chat_histories[session_id]) > 10:
-                            chat_histories[session_id] = chat_histories[session_id][-10:]
+                        # Older turns are summarised in the background
+                        seq = session_memory.record(session_id, message["user_input"], answer)
                         
-                        # Send response back to client
+                        # Send response back to the session's current socket
                         response = {
                             "text": answer,
-                            "done": True
+                            "done": True,
+                            "cached": bool(cached),
+                            "seq": seq
                         }
-                        await websocket.send_json(response)
-                        print(f"Response sent successfully for session {session_id}")
+                        if await send_to_session(session_id, response):
+                            print(f"Response sent successfully for session {session_id}")
+                        else:
+                            print(f"Client away; answer kept for resume in session {session_id}")
                     except Exception as e:
                         error_msg = f"Error processing request: {str(e)}"
                         print(error_msg)
@@ -401,33 +531,8 @@ async def websocket_endpoint_ws(websocket: WebSocket):
                             "done": True
                         })
             except WebSocketDisconnect:
+                # The session ends when its resume window passes (see end_session_later)
                 print(f"WebSocket disconnected for session {session_id}")
-                session_end_time = datetime.now()
-                session_duration = (session_end_time - session_start_time).total_seconds()
-                
-                # Update session with end time and duration
-                database.execute_query(
-                    """
-                    UPDATE sessions 
-                    SET end_time = %s,
-                        duration = %s,
-                        status = 'completed'
-                    WHERE session_id = %s
-                    """,
-                    (session_end_time.isoformat(), session_duration, session_id),
-                    fetch=False
-                )
-                
-                analytics.record_user_event(
-                    user_id,
-                    session_id,
-                    "session_end",
-                    {
-                        "timestamp": session_end_time.isoformat(),
-                        "total_messages": len(chat_histories[session_id]),
-                        "duration": session_duration
-                    }
-                )
                 break
             except Exception as e:
                 print(f"Error in WebSocket loop: {str(e)}")
@@ -451,8 +556,13 @@ async def websocket_endpoint_ws(websocket: WebSocket):
         print(f"Fatal WebSocket error: {str(e)}")
     finally:
         print(f"Cleaning up session {session_id}")
-        if session_id in chat_histories:
-            del chat_histories[session_id]
+        if session_sockets.get(session_id) is websocket:
+            del session_sockets[session_id]
+        detached_at = session_memory.detach(session_id)
+        if detached_at is not None:
+            task = asyncio.create_task(end_session_later(session_id, detached_at))
+            _session_end_tasks.add(task)
+            task.add_done_callback(_session_end_tasks.discard)
         try:
             await websocket.close()
         except:
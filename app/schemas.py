@@ -4,4 +4,5 @@ from typing import Optional, Dict, Any
 class QueryRequest(BaseModel):
     question: str
     session_id: str = None
-    user_location: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    user_location: Optional[Dict[str, Any]] = None
+    stream: bool = False
\ No newline at end of file
@@ -0,0 +1,357 @@
+"""Per-session conversation memory with a rolling summary.
+
+Each session keeps its last ``recent_turns`` (question, answer) turns
+verbatim. Older turns are folded into a short running summary by the
+LLM in the background, so the history part of the prompt stays roughly
+the same size however long the conversation gets. Until a fold finishes
+its turns stay in the verbatim history, so nothing drops out of context
+while the summary catches up.
+
+Alongside the summary a slot record tracks what the user has told us
+(vehicle, usage, priorities, tyre size, location). Slots are extracted
+by rules on every question, need no LLM call, and are always in the
+prompt.
+
+The server owns the history: every finished turn gets a sequence number
+and every session a resume token. A client that reconnects presents the
+token and the last sequence number it saw, and gets back only the turns
+it missed. Disconnected sessions are kept for ``MEMORY_RESUME_SECONDS``;
+the websocket router ends them (and records ``session_end``) once that
+window passes without a resume.
+"""
+import asyncio
+import re
+import secrets
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from .config import settings
+from . import catalog
+
+SUMMARY_PROMPT = """You maintain a running summary of a customer's conversation with Apollo Tyres' assistant.
+Update the summary with the new turns. Keep what the customer needs, their vehicle, how they drive,
+what they care about, which tyres were recommended and why, and any open questions. Drop greetings
+and marketing language. Write at most {max_words} words of plain text.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+# Answers are long markdown; only their start goes into the summariser
+SUMMARY_ANSWER_CHARS = 600
+
+VEHICLE_MAKES = [
+    "maruti", "suzuki", "hyundai", "tata", "mahindra", "honda", "toyota", "kia", "mg", "skoda",
+    "volkswagen", "vw", "renault", "nissan", "ford", "jeep", "bmw", "mercedes", "audi",
+    "bajaj", "hero", "tvs", "royal enfield", "yamaha", "ktm", "ashok leyland", "eicher"
+]
+MAKE_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(make) for make in VEHICLE_MAKES) + r")\b(?:\s+([a-z][a-z0-9-]{1,15}))?",
+    re.IGNORECASE
+)
+NOT_MODELS = {"car", "bike", "suv", "tyre", "tyres", "tire", "tires", "and", "or", "with", "for", "is", "has"}
+
+USAGE_WORDS = {
+    "city": ["city", "urban", "traffic", "town"],
+    "highway": ["highway", "expressway", "long drive", "long trip", "long distance", "touring"],
+    "off-road": ["off-road", "offroad", "off road", "dirt", "rough road", "mud", "trail"],
+    "heavy load": ["heavy load", "loaded", "cargo", "goods"]
+}
+PRIORITY_WORDS = {
+    "fuel efficiency": ["fuel", "mileage", "economy", "efficient"],
+    "comfort": ["comfort", "smooth", "quiet", "noise"],
+    "performance": ["performance", "grip", "handling", "sporty", "cornering"],
+    "durability": ["durable", "durability", "long life", "longevity", "last long", "tread life"],
+    "budget": ["budget", "cheap", "affordable", "low price", "inexpensive", "price"],
+    "wet grip": ["rain", "wet", "monsoon"]
+}
+
+def _mentions(text: str, table: Dict[str, List[str]]) -> List[str]:
+    lowered = text.lower()
+    return [label for label, words in table.items() if any(re.search(rf"\b{re.escape(w)}", lowered) for w in words)]
+
+def extract_slots(question: str) -> Dict[str, Any]:
+    """Slot values stated in one user question"""
+    slots = {}
+    match = MAKE_PATTERN.search(question)
+    if match:
+        vehicle = match.group(1).lower()
+        model = (match.group(2) or "").lower()
+        if model and model not in NOT_MODELS:
+            vehicle = f"{vehicle} {model}"
+        slots["vehicle"] = vehicle
+    category = catalog.normalize_category(question)
+    if category:
+        slots["vehicle_type"] = category
+    size = catalog.normalize_size(question)
+    if size:
+        slots["tyre_size"] = size
+    usage = _mentions(question, USAGE_WORDS)
+    if usage:
+        slots["usage"] = usage
+    priorities = _mentions(question, PRIORITY_WORDS)
+    if priorities:
+        slots["priorities"] = priorities
+    return slots
+
+class SessionMemory:
+    """Recent turns, the turns awaiting a fold, the running summary and the slots"""
+
+    def __init__(self):
+        self.recent: List[Tuple[str, str]] = []
+        self.pending: List[Tuple[str, str]] = []
+        # Turns ever dropped from the front of ``pending`` (see ``fold``)
+        self.pending_dropped = 0
+        self.summary = ""
+        self.slots: Dict[str, Any] = {}
+        self.turns = 0
+        self.folding = False
+        self.updated_at = time.time()
+        self.token = secrets.token_urlsafe(16)
+        self.connections = 1
+        self.detached_at = None
+        # Analytics identity of the session, restored on resume
+        self.user_id = None
+        self.started_at = None
+
+    def update_slots(self, found: Dict[str, Any]):
+        for key, value in found.items():
+            if isinstance(value, list):
+                merged = self.slots.get(key, [])
+                self.slots[key] = merged + [v for v in value if v not in merged]
+            else:
+                self.slots[key] = value
+
+class SessionMemoryStore:
+    """All sessions' memories for this worker"""
+
+    def __init__(self, recent_turns: int = None, max_pending: int = None, summary_words: int = None, llm=None):
+        self.recent_turns = recent_turns or settings.MEMORY_RECENT_TURNS
+        self.max_pending = max_pending or settings.MEMORY_MAX_PENDING
+        self.summary_words = summary_words or settings.MEMORY_SUMMARY_WORDS
+        self._llm = llm
+        self._sessions: Dict[str, SessionMemory] = {}
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self.folds = 0
+        self.fold_failures = 0
+        self.turns_dropped = 0
+        self.resumes = 0
+        self.resume_misses = 0
+        self.turns_replayed = 0
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from .rag_runtime import rag_runtime
+            self._llm = rag_runtime.get_llm()
+        return self._llm
+
+    def get(self, session_id: str) -> SessionMemory:
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                self._prune_idle()
+                memory = self._sessions[session_id] = SessionMemory()
+                self._tokens[memory.token] = session_id
+            return memory
+
+    def _prune_idle(self):
+        now = time.time()
+        for session_id, memory in list(self._sessions.items()):
+            # Disconnected sessions are normally ended by their owner after
+            # MEMORY_RESUME_SECONDS; this is only the fallback
+            limit = settings.MEMORY_IDLE_SECONDS if memory.connections else 2 * settings.MEMORY_RESUME_SECONDS
+            if memory.updated_at < now - limit:
+                self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        memory = self._sessions.pop(session_id, None)
+        if memory is not None:
+            self._tokens.pop(memory.token, None)
+
+    def has(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def find(self, session_id: str) -> Optional[SessionMemory]:
+        """The session's memory if it still exists (never creates one)"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+
+    def token(self, session_id: str) -> str:
+        return self.get(session_id).token
+
+    def resume(self, token: Optional[str]) -> Optional[str]:
+        """Session id for a resume token, reattached; None if unknown or expired"""
+        if not token:
+            return None
+        with self._lock:
+            self._prune_idle()
+            session_id = self._tokens.get(token)
+            if session_id is None:
+                self.resume_misses += 1
+                return None
+            memory = self._sessions[session_id]
+            # The old socket may not have noticed it is gone yet
+            memory.connections += 1
+            memory.updated_at = time.time()
+            self.resumes += 1
+            return session_id
+
+    def detach(self, session_id: str) -> Optional[float]:
+        """The client went away; keep the session resumable for a while.
+
+        Returns the detach time, which identifies this disconnect.
+        """
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                return None
+            memory.connections = max(memory.connections - 1, 0)
+            memory.updated_at = memory.detached_at = time.time()
+            return memory.detached_at
+
+    def turns_since(self, session_id: str, last_seq: int) -> List[Tuple[int, str, str]]:
+        """(seq, question, answer) for the turns after ``last_seq`` that are still held verbatim"""
+        memory = self.get(session_id)
+        with self._lock:
+            held = list(memory.pending) + list(memory.recent)
+            first = memory.turns - len(held) + 1
+            missed = [(first + i, q, a) for i, (q, a) in enumerate(held) if first + i > last_seq]
+            self.turns_replayed += len(missed)
+        return missed
+
+    def history(self, session_id: str) -> List[Tuple[str, str]]:
+        """Verbatim turns for the prompt: not-yet-summarised ones, then the recent ones"""
+        memory = self.get(session_id)
+        with self._lock:
+            return list(memory.pending) + list(memory.recent)
+
+    def context(self, session_id: str) -> str:
+        """Summary and slot record rendered for the prompt ("" when there is none)"""
+        memory = self.get(session_id)
+        with self._lock:
+            summary, slots = memory.summary, dict(memory.slots)
+        lines = []
+        if slots:
+            known = "; ".join(
+                f"{key.replace('_', ' ')}: {', '.join(value) if isinstance(value, list) else value}"
+                for key, value in slots.items()
+            )
+            lines.append(f"Known about the user: {known}")
+        if summary:
+            lines.append(f"Earlier conversation (summary): {summary}")
+        return "\n".join(lines)
+
+    def observe(self, session_id: str, question: str, location: Optional[str] = None):
+        """Update the slot record from a new question (before it is answered)"""
+        found = extract_slots(question)
+        if location and location != "Unknown":
+            found["location"] = location
+        if found:
+            memory = self.get(session_id)
+            with self._lock:
+                memory.update_slots(found)
+
+    def seed(self, session_id: str, turns: List[Tuple[str, str]]):
+        """Start a session from a transcript sent by an older widget build"""
+        for question, answer in turns:
+            self.observe(session_id, question)
+            self.record(session_id, question, answer)
+
+    def record(self, session_id: str, question: str, answer: str) -> int:
+        """Add a finished turn and return its sequence number.
+
+        Turns beyond ``recent_turns`` are queued for folding.
+        """
+        memory = self.get(session_id)
+        with self._lock:
+            memory.recent.append((question, answer))
+            memory.turns += 1
+            seq = memory.turns
+            memory.updated_at = time.time()
+            while len(memory.recent) > self.recent_turns:
+                memory.pending.append(memory.recent.pop(0))
+            if len(memory.pending) > self.max_pending:
+                # Summariser cannot keep up (or keeps failing): oldest turns are lost
+                excess = len(memory.pending) - self.max_pending
+                del memory.pending[:excess]
+                memory.pending_dropped += excess
+                self.turns_dropped += excess
+            start_fold = memory.pending and not memory.folding
+            if start_fold:
+                memory.folding = True
+        if start_fold:
+            self._schedule(session_id, memory)
+        return seq
+
+    def _schedule(self, session_id: str, memory: SessionMemory):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            memory.folding = False  # no event loop: fold later via ``fold``
+            return
+        task = loop.create_task(self.fold(session_id, memory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def fold(self, session_id: str, memory: SessionMemory = None):
+        """Summarise the pending turns into the running summary"""
+        memory = memory or self.get(session_id)
+        memory.folding = True
+        try:
+            while True:
+                with self._lock:
+                    batch = list(memory.pending)
+                    dropped = memory.pending_dropped
+                    summary = memory.summary
+                if not batch:
+                    return
+                turns = "\n".join(
+                    f"Customer: {question}\nAssistant: {answer[:SUMMARY_ANSWER_CHARS]}" for question, answer in batch
+                )
+                response = await self.llm.ainvoke(
+                    SUMMARY_PROMPT.format(max_words=self.summary_words, summary=summary or "(none)", turns=turns)
+                )
+                with self._lock:
+                    memory.summary = response.content.strip()
+                    # New turns may have been queued (or old ones dropped)
+                    # meanwhile: remove by count, the batch is the front
+                    folded = max(len(batch) - (memory.pending_dropped - dropped), 0)
+                    del memory.pending[:folded]
+                    self.folds += 1
+        except Exception as e:
+            self.fold_failures += 1
+            print(f"❌ Failed to summarise session {session_id}: {e}")
+        finally:
+            memory.folding = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "disconnected": sum(not m.connections for m in sessions),
+            "resumes": self.resumes,
+            "resume_misses": self.resume_misses,
+            "turns_replayed": self.turns_replayed,
+            "recent_turns": self.recent_turns,
+            "folds": self.folds,
+            "fold_failures": self.fold_failures,
+            "folds_running": len(self._tasks),
+            "pending_turns": sum(len(m.pending) for m in sessions),
+            "turns_dropped": self.turns_dropped,
+            "avg_summary_words": round(sum(len(m.summary.split()) for m in sessions) / len(sessions), 1) if sessions else 0
+        }
+
+# Global instance
+session_memory = SessionMemoryStore()
@@ -0,0 +1,199 @@
+"""Versioned, memory-mapped index snapshots.
+
+    python -m app.snapshot export     # write a snapshot of the current store
+    python -m app.snapshot info       # show the current snapshot manifest
+
+Layout under ``settings.SNAPSHOT_DIR``::
+
+    CURRENT                 name of the live version, swapped atomically
+    v20250707T012558/
+        manifest.json       format, count, dim, embedding model, checksums
+        vectors.npy         float32 (count, dim), C order
+        norms.npy           float32 (count,)
+        ids.json            document ids, row-aligned with vectors.npy
+        records.json        {"texts": [...], "metadatas": [...]}, row-aligned
+        codes.npy           optional float16/int8 (PCA-projected) copy
+        codec.npz           its scales, offsets and PCA basis
+
+Workers open ``vectors.npy`` and ``norms.npy`` with ``mmap_mode="r"``, so
+every uvicorn worker maps the same page-cache pages instead of holding a
+private copy, and startup does no parsing of the vectors at all. With
+``VECTOR_QUANTIZATION`` / ``VECTOR_PCA_DIM`` set, queries scan the
+compressed codes and only touch the float32 rows they re-score.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+import numpy as np
+from .config import settings
+from .quantization import CompressedVectors
+
+FORMAT_VERSION = 1
+
+def _sha1_file(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def current_version(root: str = None) -> Optional[str]:
+    root = root or settings.SNAPSHOT_DIR
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def read_manifest(root: str = None, version: str = None) -> Optional[Dict[str, Any]]:
+    root = root or settings.SNAPSHOT_DIR
+    version = version or current_version(root)
+    if not version:
+        return None
+    with open(os.path.join(root, version, "manifest.json")) as f:
+        return json.load(f)
+
+def _store_contents(store) -> Dict[str, Any]:
+    """ids, vectors, texts and metadata from a FlatIndex or Chroma store"""
+    if hasattr(store, "upsert_embeddings"):
+        return {
+            "ids": list(store.ids),
+            "vectors": np.asarray(store.vectors, dtype=np.float32),
+            "texts": list(store.texts),
+            "metadatas": list(store.metadatas)
+        }
+    data = store.get(include=["embeddings", "documents", "metadatas"])
+    return {
+        "ids": data["ids"],
+        "vectors": np.asarray(data["embeddings"], dtype=np.float32),
+        "texts": data["documents"],
+        "metadatas": [m or {} for m in data["metadatas"]]
+    }
+
+def set_current(version: str, root: str = None):
+    """Atomically point CURRENT at ``version``"""
+    root = root or settings.SNAPSHOT_DIR
+    pointer = os.path.join(root, "CURRENT.tmp")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, "CURRENT"))
+
+def write_snapshot(store, root: str = None, keep: int = 3,
+                   quantization: str = None, pca_dim: int = None, make_current: bool = True) -> str:
+    """Write ``store`` as a new snapshot version (and by default make it current)"""
+    root = root or settings.SNAPSHOT_DIR
+    quantization = quantization or settings.VECTOR_QUANTIZATION
+    pca_dim = settings.VECTOR_PCA_DIM if pca_dim is None else pca_dim
+    os.makedirs(root, exist_ok=True)
+    start = time.perf_counter()
+    contents = _store_contents(store)
+    vectors = np.ascontiguousarray(contents["vectors"], dtype=np.float32)
+    if vectors.ndim != 2:
+        vectors = vectors.reshape(len(contents["ids"]), -1)
+    norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+
+    version = datetime.utcnow().strftime("v%Y%m%dT%H%M%S%f")
+    staging = os.path.join(root, f".{version}.tmp")
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "vectors.npy"), vectors)
+    np.save(os.path.join(staging, "norms.npy"), norms)
+    with open(os.path.join(staging, "ids.json"), "w") as f:
+        json.dump(contents["ids"], f)
+    with open(os.path.join(staging, "records.json"), "w") as f:
+        json.dump({"texts": contents["texts"], "metadatas": contents["metadatas"]}, f)
+    compressed = None
+    if len(vectors) and (quantization != "none" or pca_dim):
+        kind = "float32" if quantization == "none" else quantization
+        compressed = CompressedVectors.build(vectors, kind=kind, pca_dim=pca_dim)
+        compressed.save(staging)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]) if vectors.shape[0] else 0,
+        "dtype": "float32",
+        "quantization": compressed.kind if compressed else None,
+        "pca_dim": int(compressed.components.shape[1]) if compressed is not None and compressed.components is not None else 0,
+        "embed_model": settings.EMBED_MODEL,
+        "vectors_sha1": _sha1_file(os.path.join(staging, "vectors.npy"))
+    }
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.rename(staging, os.path.join(root, version))
+    if make_current:
+        set_current(version, root)
+    prune(root, keep)
+    print(f"Snapshot {version}: {manifest['count']} vectors in {time.perf_counter() - start:.2f}s")
+    return version
+
+def prune(root: str, keep: int):
+    """Delete all but the newest ``keep`` versions (never the current one)"""
+    live = current_version(root)
+    versions = sorted(d for d in os.listdir(root) if d.startswith("v") and os.path.isdir(os.path.join(root, d)))
+    for version in versions[:-keep] if keep else []:
+        if version != live:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+def open_snapshot(embedding, root: str = None, version: str = None):
+    """Open a snapshot as a read-only, memory-mapped FlatIndex (None if absent)"""
+    from .flat_index import FlatIndex
+    root = root or settings.SNAPSHOT_DIR
+    version = version or current_version(root)
+    if not version:
+        return None
+    path = os.path.join(root, version)
+    manifest = read_manifest(root, version)
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest['format_version']} in {path}")
+    if manifest["embed_model"] != settings.EMBED_MODEL:
+        print(f"⚠️ Snapshot {version} was built with {manifest['embed_model']}, not {settings.EMBED_MODEL}")
+
+    vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+    norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+    with open(os.path.join(path, "ids.json")) as f:
+        ids = json.load(f)
+    with open(os.path.join(path, "records.json")) as f:
+        records = json.load(f)
+    index = FlatIndex.from_arrays(embedding, vectors, ids, records["texts"], records["metadatas"], norms=norms)
+    index.compressed = CompressedVectors.load(path)
+    index.rescore_factor = settings.RESCORE_FACTOR
+    index.snapshot_version = version
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage memory-mapped index snapshots")
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("--root", default=settings.SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--source", choices=["chroma", "flat"], default="chroma", help="store to export from")
+    parser.add_argument("--keep", type=int, default=3, help="versions to keep")
+    parser.add_argument("--quantization", choices=["none", "float16", "int8"], default=settings.VECTOR_QUANTIZATION)
+    parser.add_argument("--pca-dim", type=int, default=settings.VECTOR_PCA_DIM, help="PCA dimensions (0 = off)")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        manifest = read_manifest(args.root)
+        if not manifest:
+            print(f"No snapshot in {args.root}")
+            sys.exit(1)
+        print(json.dumps(manifest, indent=2))
+        return
+
+    from . import vector_store
+    if args.source == "flat":
+        from .flat_index import FlatIndex
+        store = FlatIndex.load(settings.FLAT_INDEX_PATH, vector_store.embeddings)
+    else:
+        from langchain_chroma import Chroma
+        store = Chroma(persist_directory=settings.PERSIST_DIRECTORY, embedding_function=vector_store.embeddings)
+    write_snapshot(store, args.root, keep=args.keep, quantization=args.quantization, pca_dim=args.pca_dim)
+
+if __name__ == "__main__":
+    main()
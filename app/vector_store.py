@@ -1,42 +1,282 @@
 import os
-import uuid
+import shutil
+import hashlib
+from datetime import datetime
 import pandas as pd
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
-from langchain.text_splitter import CharacterTextSplitter
 from langchain_core.documents import Document
 from .config import settings
 from .database import execute_query
+from .embedding_cache import CachedEmbeddings
+from . import catalog
 
-embeddings = GoogleGenerativeAIEmbeddings(
-    model=settings.EMBED_MODEL, 
-    google_api_key=settings.GEMINI_API_KEY
+# Gemini embeddings behind a memory + on-disk cache shared by queries and
+# index builds
+embeddings = CachedEmbeddings(
+    GoogleGenerativeAIEmbeddings(
+        model=settings.EMBED_MODEL, 
+        google_api_key=settings.GEMINI_API_KEY
+    ),
+    model_name=settings.EMBED_MODEL,
+    memory_size=settings.EMBED_CACHE_SIZE,
+    disk_path=settings.EMBED_CACHE_PATH
 )
 
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def row_content(row: dict) -> str:
+    return catalog.build_document(row)[0]
+
+def read_catalog_rows(csv_path: str, chunksize: int = 1000):
+    """Stream the catalog CSV as row dicts without loading it all at once"""
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        for row in chunk.to_dict("records"):
+            yield row
+
+def iter_catalog_rows(rows):
+    """Yield (row_id, content_hash, row) for every catalog row.
+
+    The row id is derived from ``settings.CATALOG_ID_COLUMNS``, or failing
+    that the detected brand/pattern/size columns, so an edited price keeps
+    its id and shows up as a change. Without either the whole row is
+    hashed, and an edit shows up as one removal plus one addition.
+    """
+    id_columns = None
+    seen = {}
+    for row in rows:
+        if id_columns is None:
+            id_columns = [c for c in settings.CATALOG_ID_COLUMNS if c in row] or catalog.natural_key_columns(row.keys())
+        content = row_content(row)
+        if id_columns:
+            base_id = _hash("\x1f".join(str(row[c]) for c in id_columns))
+        else:
+            base_id = _hash(content)
+        # Identical keys (duplicate rows) get a stable occurrence suffix
+        occurrence = seen.get(base_id, 0)
+        seen[base_id] = occurrence + 1
+        row_id = base_id if occurrence == 0 else f"{base_id}-{occurrence}"
+        yield row_id, _hash(content), row
+
+def build_row_documents(row_id: str, content_hash: str, row: dict):
+    """The single document (one per product/size variant) for a catalog row"""
+    text, metadata = catalog.build_document(row)
+    metadata.update({"row_id": row_id, "content_hash": content_hash})
+    return [f"{row_id}:0"], [Document(page_content=text, metadata=metadata)]
+
+def make_deduper():
+    """A description deduper per the settings, or None when disabled"""
+    if not settings.DEDUP_DESCRIPTIONS:
+        return None
+    from .dedup import DescriptionDeduper
+    return DescriptionDeduper(threshold=settings.DEDUP_THRESHOLD)
+
+def iter_row_documents(rows, deduper=None):
+    """Yield (row_id, content_hash, ids, documents) for every catalog row.
+
+    With a ``deduper`` long descriptive fields are moved into shared
+    documents, each yielded as an entry of its own just before the first
+    variant row that references it.
+    """
+    for row_id, content_hash, row in iter_catalog_rows(rows):
+        if deduper is None:
+            yield (row_id, content_hash) + build_row_documents(row_id, content_hash, row)
+            continue
+        short, description = catalog.split_descriptions(row, settings.DEDUP_MIN_CHARS)
+        if not description:
+            yield (row_id, content_hash) + build_row_documents(row_id, content_hash, row)
+            continue
+        text, metadata = catalog.build_document(short)
+        group = f"{metadata.get('brand_key', '')}|{metadata.get('pattern', '').lower()}"
+        shared_id, is_new = deduper.assign(group, description)
+        if is_new:
+            headline = " ".join(metadata[f] for f in ("brand", "pattern") if f in metadata)
+            shared_text = f"{headline}\n{description}" if headline else description
+            shared_metadata = {k: metadata[k] for k in ("brand", "pattern", "brand_key", "category_key") if k in metadata}
+            shared_metadata.update({"row_id": shared_id, "content_hash": _hash(shared_text), "kind": "description"})
+            yield shared_id, shared_metadata["content_hash"], [f"{shared_id}:0"], [
+                Document(page_content=shared_text, metadata=shared_metadata)
+            ]
+        # A row re-pointed at another shared document counts as changed
+        content_hash = _hash(content_hash + shared_id)
+        metadata.update({"row_id": row_id, "content_hash": content_hash, "shared_id": shared_id})
+        yield row_id, content_hash, [f"{row_id}:0"], [Document(page_content=text, metadata=metadata)]
+
+def embedding_dim(store) -> int:
+    """Vector width of a populated store (0 if empty)"""
+    if hasattr(store, "upsert_embeddings"):
+        return int(store.vectors.shape[1]) if len(store.ids) else 0
+    data = store.get(limit=1, include=["embeddings"])
+    return len(data["embeddings"][0]) if len(data["embeddings"]) else 0
+
+def base_path() -> str:
+    return settings.FLAT_INDEX_PATH if settings.VECTOR_BACKEND == "flat" else settings.PERSIST_DIRECTORY
+
+def active_location() -> str:
+    """Where the live index is: a snapshot version, or a Chroma/flat directory.
+
+    Hot swaps (see ``rag_runtime.refresh``) build into a side directory
+    and then point ``<base>.current`` at it, so the configured directory
+    name stays the fallback.
+    """
+    if settings.VECTOR_BACKEND == "snapshot":
+        from .snapshot import current_version
+        return current_version()
+    try:
+        with open(f"{base_path()}.current") as f:
+            location = f.read().strip()
+        if location and os.path.exists(location):
+            return location
+    except FileNotFoundError:
+        pass
+    return base_path()
+
+def store_path() -> str:
+    if settings.VECTOR_BACKEND == "snapshot":
+        return os.path.join(settings.SNAPSHOT_DIR, "CURRENT")
+    return active_location()
+
+def open_vector_store(persist_directory: str = None):
+    """Open (or create empty) the configured backend.
+
+    ``snapshot`` maps the current snapshot read-only; until one exists (or
+    while building one) it falls back to the writable flat index files.
+    """
+    if settings.VECTOR_BACKEND in ("flat", "snapshot"):
+        from .flat_index import FlatIndex
+        if settings.VECTOR_BACKEND == "snapshot" and persist_directory is None:
+            from .snapshot import open_snapshot
+            store = open_snapshot(embeddings)
+            if store is not None:
+                return store
+        if settings.VECTOR_BACKEND == "snapshot":
+            return FlatIndex.load(persist_directory or settings.FLAT_INDEX_PATH, embeddings)
+        return FlatIndex.load(persist_directory or active_location(), embeddings)
+    return Chroma(
+        persist_directory=persist_directory or active_location(),
+        embedding_function=embeddings
+    )
+
+def open_generation(location: str):
+    """Open the index at ``location`` as returned by ``build_generation``"""
+    if settings.VECTOR_BACKEND == "snapshot":
+        from .snapshot import open_snapshot
+        return open_snapshot(embeddings, version=location)
+    return open_vector_store(location)
+
+def build_generation(csv_path: str = None):
+    """Build a complete new index next to the live one; returns (store, location, report).
+
+    Unchanged rows come straight from the embedding cache, so a rebuild
+    only pays for rows that actually changed.
+    """
+    from .ingest import ingest_catalog
+    csv_path = csv_path or settings.CSV_PATH
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    if settings.VECTOR_BACKEND == "snapshot":
+        from .flat_index import FlatIndex
+        store, location = FlatIndex(embeddings), None
+    else:
+        location = f"{base_path()}-{stamp}"
+        store = open_vector_store(location)
+    report = ingest_catalog(store, csv_path)
+    if settings.VECTOR_BACKEND == "snapshot":
+        from .snapshot import write_snapshot
+        location = write_snapshot(store, make_current=False)
+        store = open_generation(location)
+    else:
+        persist(store, publish=False)
+    return store, location, report
+
+def activate_generation(location: str):
+    """Make ``location`` the index new processes (and other workers) open"""
+    if settings.VECTOR_BACKEND == "snapshot":
+        from .snapshot import set_current
+        set_current(location)
+        return
+    pointer = f"{base_path()}.current"
+    with open(f"{pointer}.tmp", "w") as f:
+        f.write(location)
+    os.replace(f"{pointer}.tmp", pointer)
+
+def discard_generation(location: str, keep=()):
+    """Delete a built generation that failed validation or is no longer needed"""
+    if not location or location in keep or location == base_path():
+        return
+    if settings.VECTOR_BACKEND == "snapshot":
+        shutil.rmtree(os.path.join(settings.SNAPSHOT_DIR, location), ignore_errors=True)
+    else:
+        shutil.rmtree(location, ignore_errors=True)
+
+def close_store(store):
+    """Release a store's backend resources so its directory can be deleted.
+
+    Chroma keeps one shared client system (SQLite connection, HNSW
+    segments) per path until it is stopped; flat and snapshot stores hold
+    only arrays.
+    """
+    client = getattr(store, "_client", None)
+    if client is None:
+        return
+    try:
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient._identifer_to_system.pop(getattr(client, "_identifier", None), None)
+    except (ImportError, AttributeError):
+        pass
+    system = getattr(client, "_system", None)
+    if system is not None:
+        system.stop()
+
+def prune_generations(locations, keep=()):
+    """Remove the side directories of drained generations, except those in ``keep``.
+
+    Only the given locations are touched: other directories may be builds
+    in progress or indexes other workers still serve.
+    """
+    if settings.VECTOR_BACKEND == "snapshot":
+        return  # write_snapshot already keeps the newest few versions
+    keep = set(keep) | {active_location()}
+    for location in locations:
+        discard_generation(location, keep)
+
+def upsert_embeddings(store, ids, vectors, documents):
+    """Write precomputed vectors to either backend"""
+    texts = [document.page_content for document in documents]
+    metadatas = [document.metadata for document in documents]
+    if hasattr(store, "upsert_embeddings"):
+        store.upsert_embeddings(ids, vectors, texts, metadatas)
+    else:
+        store._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+def persist(store, publish: bool = True):
+    """Flush backends that do not write through on every change.
+
+    With the snapshot backend ``publish`` also writes a new snapshot
+    version; a snapshot-mapped store has no path, so edits to it only
+    become durable that way.
+    """
+    if hasattr(store, "upsert_embeddings"):
+        store.persist()
+        if publish and settings.VECTOR_BACKEND == "snapshot":
+            from .snapshot import write_snapshot
+            write_snapshot(store)
+
 def get_vector_store():
-    if os.path.exists(settings.PERSIST_DIRECTORY):
+    from .quantization import warn_if_unused
+    warn_if_unused(settings.VECTOR_BACKEND, settings.VECTOR_QUANTIZATION, settings.VECTOR_PCA_DIM)
+    # A leftover checkpoint means an earlier build was interrupted: resume it
+    if os.path.exists(store_path()) and not os.path.exists(settings.INGEST_CHECKPOINT):
         print("Loading existing vector store...")
-        return Chroma(
-            persist_directory=settings.PERSIST_DIRECTORY,
-            embedding_function=embeddings
-        )
+        return open_vector_store()
     
     print("Creating new vector store...")
-    df = pd.read_csv(settings.CSV_PATH)
-    splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    
-    documents = []
-    for _, row in df.iterrows():
-        content = "\n".join([f"{k}: {v}" for k, v in row.to_dict().items()])
-        for chunk in splitter.split_text(content):
-            documents.append(Document(page_content=chunk))
-    
-    print(f"Created {len(documents)} document chunks")
-    ids = [str(uuid.uuid4()) for _ in documents]
-    
-    return Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        persist_directory=settings.PERSIST_DIRECTORY,
-        ids=ids
-    )
\ No newline at end of file
+    from .ingest import IngestionPipeline, ingest_catalog
+    store = open_vector_store()
+    report = ingest_catalog(store, settings.CSV_PATH, IngestionPipeline(checkpoint_path=settings.INGEST_CHECKPOINT))
+    persist(store)
+    print(f"Created {report['chunks']} document chunks")
+    if settings.VECTOR_BACKEND == "snapshot":
+        # Serve from the shared mapping rather than this process's private copy
+        return open_vector_store()
+    return store
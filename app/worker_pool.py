@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+from .config import settings
+
+class WorkerPoolSaturated(RuntimeError):
+    """Raised when the pool already holds its maximum number of queued calls"""
+
+class BoundedWorkerPool:
+    """Bounded thread pool for the blocking parts of the chat pipeline.
+
+    Geocoding lookups, MySQL writes and other synchronous calls are handed
+    to this pool so they never block the event loop. At most
+    ``max_workers`` calls run at once and at most ``max_queue`` wait behind
+    them; anything beyond that is rejected instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.peak_queue_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="chat-worker"
+                    )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool and await its result"""
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise WorkerPoolSaturated(
+                    f"Worker pool saturated ({self._running} running, {self._queued} queued)"
+                )
+            self._queued += 1
+            self.submitted += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self._queued)
+        enqueued_at = time.perf_counter()
+
+        def task():
+            waited = time.perf_counter() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+            return result
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), task)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "peak_queue_depth": self.peak_queue_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_seconds_total / started * 1000, 3) if started else 0,
+                "max_wait_ms": round(self.wait_seconds_max * 1000, 3)
+            }
+
+# Global instance
+worker_pool = BoundedWorkerPool(
+    max_workers=settings.WORKER_POOL_SIZE,
+    max_queue=settings.WORKER_QUEUE_LIMIT
+)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark the NumPy flat index against Chroma for query latency and memory.
+
+    python benchmark_vector_index.py                       # 10k, 100k, 1M for both backends
+    python benchmark_vector_index.py --sizes 10000 --dim 768 --queries 200
+
+Uses random unit vectors, so no API key or catalog is needed. Each
+backend/size pair runs in its own subprocess so RSS numbers don't bleed
+into each other.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+def rss_mb():
+    """Current resident set size in MB (Linux), falling back to peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class RandomEmbeddings:
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+def make_vectors(size, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def bench_flat(vectors, queries, k):
+    from app.flat_index import FlatIndex
+    index = FlatIndex(RandomEmbeddings())
+    ids = [str(i) for i in range(len(vectors))]
+    metadatas = [{"rim": 12 + i % 10} for i in range(len(vectors))]
+    index.upsert_embeddings(ids, vectors, [""] * len(vectors), metadatas)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search_vector(query, k)
+        latencies.append(time.perf_counter() - start)
+    # Measured while the index is still alive
+    return latencies, rss_mb()
+
+def bench_chroma(vectors, queries, k):
+    import chromadb
+    client = chromadb.Client()
+    collection = client.create_collection("bench")
+    batch = 5000
+    for offset in range(0, len(vectors), batch):
+        chunk = vectors[offset:offset + batch]
+        collection.add(
+            ids=[str(i) for i in range(offset, offset + len(chunk))],
+            embeddings=chunk.tolist(),
+            metadatas=[{"rim": 12 + i % 10} for i in range(offset, offset + len(chunk))]
+        )
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - start)
+    # Measured while the index is still alive
+    return latencies, rss_mb()
+
+def run_one(backend, size, dim, n_queries, k):
+    baseline = rss_mb()
+    vectors = make_vectors(size, dim)
+    queries = make_vectors(n_queries, dim, seed=1)
+    data_mb = rss_mb() - baseline
+    start = time.perf_counter()
+    latencies, loaded_mb = (bench_flat if backend == "flat" else bench_chroma)(vectors, queries, k)
+    total = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "size": size,
+        "build_and_query_seconds": round(total, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        # Index memory (plus library imports), excluding the source vectors
+        # both backends start from
+        "index_rss_mb": round(loaded_mb - baseline - data_mb, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Flat NumPy index vs Chroma benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["flat", "chroma"])
+    parser.add_argument("--dim", type=int, default=768, help="embedding-001 vectors are 768-d")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--one", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(run_one(args.one[0], int(args.one[1]), args.dim, args.queries, args.k)))
+        return
+
+    print(f"{'backend':<8} {'vectors':>10} {'p50 ms':>9} {'p95 ms':>9} {'index MB':>9} {'total s':>8}")
+    for size in args.sizes:
+        for backend in args.backends:
+            output = subprocess.run(
+                [sys.executable, __file__, "--one", backend, str(size),
+                 "--dim", str(args.dim), "--queries", str(args.queries), "--k", str(args.k)],
+                capture_output=True, text=True
+            )
+            if output.returncode != 0:
+                reason = output.stderr.strip().splitlines()[-1:] or [f"exit code {output.returncode} (out of memory?)"]
+                print(f"{backend:<8} {size:>10} ❌ {reason[0]}")
+                continue
+            r = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{backend:<8} {size:>10} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['index_rss_mb']:>9} {r['build_and_query_seconds']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,10 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
   const ws = useRef(null);
   const retryCount = useRef(0);
   const reconnectTimeout = useRef(null);
-  const chatHistoryRef = useRef([]);
+  // The server owns the conversation; on reconnect we only present the
+  // resume token and the last answer we received
+  const sessionTokenRef = useRef(null);
+  const lastSeqRef = useRef(0);
 
   // Use the provided URL or fall back to default
   const chatUrl = customChatUrl;
@@ -60,7 +63,14 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
         ws.current.close();
       }
 
-      ws.current = new WebSocket(chatUrl);
+      let url = chatUrl;
+      if (sessionTokenRef.current) {
+        const resumeUrl = new URL(chatUrl, window.location.href);
+        resumeUrl.searchParams.set("session", sessionTokenRef.current);
+        resumeUrl.searchParams.set("last_seq", lastSeqRef.current);
+        url = resumeUrl.toString();
+      }
+      ws.current = new WebSocket(url);
 
       ws.current.onopen = () => {
         console.log("Connected to WebSocket server");
@@ -73,6 +83,23 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
         try {
           const data = JSON.parse(event.data);
 
+          if (data.type === "session") {
+            if (sessionTokenRef.current && !data.resumed) {
+              console.log("Previous session expired, starting a new one");
+            }
+            sessionTokenRef.current = data.session_token;
+            lastSeqRef.current = data.resumed ? lastSeqRef.current : data.seq;
+            return;
+          }
+
+          if (data.seq) {
+            // A finished answer can arrive both live and as a replay
+            if (data.seq <= lastSeqRef.current) {
+              return;
+            }
+            lastSeqRef.current = data.seq;
+          }
+
           if (data.error) {
             console.error("Error from server:", data.error);
             setChatHistory((prev) => [
@@ -83,6 +110,27 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
             return;
           }
 
+          // Incremental answer chunk: append to the in-progress reply
+          if (data.delta) {
+            setChatHistory((prev) => {
+              const lastMessage = prev[prev.length - 1];
+              if (
+                lastMessage &&
+                lastMessage.role === "assistant" &&
+                !lastMessage.completed
+              ) {
+                return [
+                  ...prev.slice(0, -1),
+                  { ...lastMessage, text: lastMessage.text + data.delta },
+                ];
+              }
+              return [
+                ...prev,
+                { role: "assistant", text: data.delta, completed: false },
+              ];
+            });
+          }
+
           if (data.text) {
             setChatHistory((prev) => {
               const lastMessage = prev[prev.length - 1];
@@ -188,10 +236,6 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
             
             const formattedMessage = {
               user_input: message.user_input || message,
-              chat_history: chatHistoryRef.current.map((msg) => ({
-                role: msg.role,
-                content: msg.text,
-              })),
               user_id: userId,
               session_id: sessionId,
               user_location: locationData,
@@ -242,10 +286,6 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
         
         const formattedMessage = {
           user_input: message.user_input || message,
-          chat_history: chatHistoryRef.current.map((msg) => ({
-            role: msg.role,
-            content: msg.text,
-          })),
           user_id: userId,
           session_id: sessionId,
           user_location: locationData,
@@ -302,10 +342,7 @@ export const useChatSocket = (setChatHistory, setStreaming, customChatUrl) => {
     }
   }, []);
 
-  // Update chat history ref when chat history changes
   useEffect(() => {
-    chatHistoryRef.current = chatHistoryRef.current || [];
-
     // Expose the trackUserAction function globally for direct access
     window.sendAnalyticsEvent = trackUserAction;
 
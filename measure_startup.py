@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Measure worker startup time and memory for each vector backend.
+
+    python measure_startup.py --synthetic 100000 --workers 4
+    python measure_startup.py --backends chroma snapshot --workers 4
+
+Starts ``--workers`` processes per backend at the same time (like uvicorn
+workers). Each opens the store, runs one query so every vector page is
+touched, then reports open time and RSS / PSS / private memory while its
+siblings are still alive. PSS splits shared pages between processes, so
+a memory-mapped snapshot shows up as one copy spread over N workers.
+
+With ``--synthetic N`` random vectors are written to a temporary flat
+index and snapshot first, so no catalog or API key is needed; otherwise
+the configured stores (PERSIST_DIRECTORY, FLAT_INDEX_PATH, SNAPSHOT_DIR)
+are measured.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def memory_kb():
+    """Rss / Pss / Private (kB) from /proc/self/smaps_rollup"""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": round(values.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(values.get("Pss", 0) / 1024, 1),
+        "private_mb": round((values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024, 1)
+    }
+
+class NoEmbeddings:
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+def open_store(backend, root):
+    """Open one backend the way a worker would"""
+    if root:
+        if backend == "flat":
+            from app.flat_index import FlatIndex
+            return FlatIndex.load(os.path.join(root, "flat"), NoEmbeddings())
+        from app.snapshot import open_snapshot
+        return open_snapshot(NoEmbeddings(), root=os.path.join(root, "snapshots"))
+    os.environ["VECTOR_BACKEND"] = backend
+    from app import vector_store
+    return vector_store.open_vector_store()
+
+def worker(backend, root):
+    import numpy as np
+    # Import cost is the same for every backend; keep it out of the timing
+    if root:
+        import app.flat_index, app.snapshot
+    else:
+        import app.vector_store
+    baseline = memory_kb()
+    start = time.perf_counter()
+    store = open_store(backend, root)
+    open_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if hasattr(store, "search_vector"):
+        query = np.ones(store.vectors.shape[1], dtype=np.float32)
+        store.search_vector(query, 5)
+    else:
+        dim = len(store.get(limit=1, include=["embeddings"])["embeddings"][0])
+        store.similarity_search_by_vector([1.0] * dim, k=5)
+    first_query_seconds = time.perf_counter() - start
+
+    # Wait until every sibling has loaded so shared pages are counted as shared
+    print("ready", flush=True)
+    sys.stdin.readline()
+    result = {
+        "backend": backend,
+        "open_ms": round(open_seconds * 1000, 1),
+        "first_query_ms": round(first_query_seconds * 1000, 1),
+        "baseline_rss_mb": baseline["rss_mb"]
+    }
+    result.update(memory_kb())
+    print(json.dumps(result), flush=True)
+    # Stay alive until every sibling has measured too
+    sys.stdin.readline()
+
+def build_synthetic(root, size, dim):
+    import numpy as np
+    from app.flat_index import FlatIndex
+    from app.snapshot import write_snapshot
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    ids = [str(i) for i in range(size)]
+    texts = [f"product {i}" for i in range(size)]
+    metadatas = [{"row_id": str(i), "rim": 12 + i % 10} for i in range(size)]
+    store = FlatIndex.from_arrays(NoEmbeddings(), vectors, ids, texts, metadatas)
+    store.persist(os.path.join(root, "flat"))
+    write_snapshot(store, os.path.join(root, "snapshots"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and RSS per vector backend")
+    parser.add_argument("--backends", nargs="+", default=["flat", "snapshot"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--synthetic", type=int, default=0, help="build N random vectors instead of using real stores")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "ROOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1] if args.worker[1] != "-" else None)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = "-"
+        if args.synthetic:
+            print(f"Building synthetic stores with {args.synthetic} x {args.dim} vectors...")
+            build_synthetic(tmp, args.synthetic, args.dim)
+            root = tmp
+
+        print(f"{'backend':<9} {'worker':>6} {'open ms':>9} {'query ms':>9} {'RSS MB':>8} {'PSS MB':>8} {'private MB':>11}")
+        for backend in args.backends:
+            processes = [
+                subprocess.Popen(
+                    [sys.executable, __file__, "--worker", backend, root],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+                )
+                for _ in range(args.workers)
+            ]
+            # Two barriers: all loaded -> all measure -> all exit
+            for step in ("ready", "measured"):
+                lines = [process.stdout.readline() for process in processes]
+                for process in processes:
+                    if process.poll() is None:
+                        process.stdin.write("go\n")
+                        process.stdin.flush()
+            total_pss = 0.0
+            for number, (process, line) in enumerate(zip(processes, lines)):
+                _, stderr = process.communicate()
+                if not line.strip().startswith("{"):
+                    reason = stderr.strip().splitlines()[-1:] or [f"exit code {process.returncode}"]
+                    print(f"{backend:<9} {number:>6} ❌ {reason[0]}")
+                    continue
+                r = json.loads(line)
+                total_pss += r["pss_mb"]
+                print(f"{backend:<9} {number:>6} {r['open_ms']:>9} {r['first_query_ms']:>9} "
+                      f"{r['rss_mb']:>8} {r['pss_mb']:>8} {r['private_mb']:>11}")
+            print(f"{backend:<9} {'total':>6} {'':>9} {'':>9} {'':>8} {round(total_pss, 1):>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Recall@5 vs memory and latency for compressed vector storage.
+
+    python recall_report.py                     # current snapshot + message_exchanges.csv
+    python recall_report.py --synthetic 50000   # random clustered vectors, no API key
+
+Ground truth is the exact float32 top 5. Every configuration scans its
+compressed copy for k * rescore-factor candidates and re-scores those
+exactly, the same path FlatIndex uses for a quantised snapshot.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from app.flat_index import FlatIndex
+from app.quantization import CompressedVectors
+
+CONFIGS = [
+    ("float16", 0),
+    ("int8", 0),
+    ("float32", 256),
+    ("float16", 256),
+    ("int8", 256),
+    ("int8", 128),
+]
+
+def load_queries(path, limit):
+    """Held-out user questions from the exported message exchanges"""
+    with open(path, newline="") as f:
+        questions = [row["user_message"].strip() for row in csv.DictReader(f) if row.get("user_message", "").strip()]
+    return list(dict.fromkeys(questions))[:limit]
+
+def real_data(csv_path, limit):
+    from app.snapshot import open_snapshot
+    from app.vector_store import embeddings
+    store = open_snapshot(embeddings)
+    if store is None:
+        sys.exit("No snapshot found; run `python -m app.snapshot export` first")
+    questions = load_queries(csv_path, limit)
+    if not questions:
+        sys.exit(f"No user messages in {csv_path}")
+    queries = np.asarray([embeddings.embed_query(q) for q in questions], dtype=np.float32)
+    return np.asarray(store.vectors, dtype=np.float32), queries
+
+def synthetic_data(size, dim, n_queries, seed=0):
+    """Clustered vectors (products of a family sit close together)"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(size // 50, 1), dim), dtype=np.float32)
+    vectors = centres[rng.integers(0, len(centres), size)] + 0.35 * rng.standard_normal((size, dim), dtype=np.float32)
+    queries = vectors[rng.integers(0, size, n_queries)] + 0.25 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+    return vectors, queries
+
+def evaluate(index, queries, truth, k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = [p for p, _ in index.search_vector(query, k)]
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found) & expected)
+    return hits / (len(queries) * k), float(np.percentile(np.array(latencies) * 1000, 50))
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@5 vs memory/latency for vector compression")
+    parser.add_argument("--csv", default="message_exchanges.csv", help="held-out questions")
+    parser.add_argument("--limit", type=int, default=500, help="max questions")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random clustered vectors instead")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors, queries = synthetic_data(args.synthetic, args.dim, min(args.limit, 200))
+    else:
+        vectors, queries = real_data(args.csv, args.limit)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries\n")
+
+    ids = [str(i) for i in range(len(vectors))]
+    index = FlatIndex.from_arrays(None, vectors, ids, [""] * len(ids), [{}] * len(ids))
+    truth = [{p for p, _ in index.search_vector(q, args.k)} for q in queries]
+    _, base_ms = evaluate(index, queries, truth, args.k)
+    base_mb = vectors.nbytes / 1024 / 1024
+
+    print(f"{'encoding':<10} {'pca':>5} {'rescore':>8} {'recall@5':>9} {'scan MB':>8} {'ratio':>6} {'p50 ms':>8}")
+    print(f"{'float32':<10} {'-':>5} {'-':>8} {1.0:>9.3f} {base_mb:>8.1f} {1.0:>6.2f} {base_ms:>8.2f}")
+    for kind, pca_dim in CONFIGS:
+        if pca_dim >= vectors.shape[1]:
+            continue
+        index.compressed = CompressedVectors.build(vectors, kind=kind, pca_dim=pca_dim)
+        scan_mb = index.compressed.nbytes / 1024 / 1024
+        for factor in args.rescore_factor:
+            index.rescore_factor = factor
+            recall, p50 = evaluate(index, queries, truth, args.k)
+            print(f"{kind:<10} {pca_dim or '-':>5} {factor:>8} {recall:>9.3f} {scan_mb:>8.1f} "
+                  f"{scan_mb / base_mb:>6.2f} {p50:>8.2f}")
+
+if __name__ == "__main__":
+    main()
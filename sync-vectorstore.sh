@@ -0,0 +1,16 @@
+#!/usr/bin/env bash
+# sync-vectorstore.sh
+# Re-index only the catalog rows that were added, changed or removed.
+# Pass --dry-run to preview the diff without embedding anything.
+
+export PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python
+
+echo "🔄 Syncing vector store with catalog CSV..."
+python3 -m app.indexer "$@"
+
+if [ $? -eq 0 ]; then
+    echo "🎉 Vector store sync complete!"
+else
+    echo "❌ Vector store sync failed"
+    exit 1
+fi
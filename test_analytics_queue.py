@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the analytics write-behind queue.
+Uses an in-memory handler, so no database is needed.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.analytics_queue import AnalyticsEventQueue
+
+def make_event(i):
+    return {"user_id": f"user_{i}", "session_id": "s1", "event_type": "question_asked", "event_data": {}}
+
+def test_size_threshold_flush():
+    """A full batch is flushed without waiting for the interval"""
+    batches = []
+    queue = AnalyticsEventQueue(batches.append, capacity=100, batch_size=5, flush_interval=10)
+    queue.start()
+    for i in range(5):
+        queue.enqueue(make_event(i))
+    time.sleep(0.2)
+    assert [len(b) for b in batches] == [5], batches
+    queue.stop()
+    print("✅ Size threshold flush works")
+
+def test_time_threshold_and_drain():
+    """Partial batches flush on the timer and on shutdown"""
+    batches = []
+    queue = AnalyticsEventQueue(batches.append, capacity=100, batch_size=50, flush_interval=0.1)
+    queue.start()
+    queue.enqueue(make_event(1))
+    time.sleep(0.3)
+    assert sum(len(b) for b in batches) == 1
+    queue.enqueue(make_event(2))
+    queue.stop()
+    assert sum(len(b) for b in batches) == 2
+    assert queue.stats()["pending"] == 0
+    print("✅ Time threshold flush and shutdown drain work")
+
+def test_overflow_policies():
+    """Bounded capacity drops the oldest or newest events"""
+    queue = AnalyticsEventQueue(lambda batch: None, capacity=3, batch_size=10, flush_interval=10)
+    for i in range(5):
+        queue.enqueue(make_event(i))
+    assert [e["user_id"] for e in queue._events] == ["user_2", "user_3", "user_4"]
+    assert queue.stats()["dropped"] == 2
+
+    queue = AnalyticsEventQueue(lambda batch: None, capacity=3, batch_size=10, flush_interval=10,
+                                overflow_policy="drop_newest")
+    results = [queue.enqueue(make_event(i)) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert [e["user_id"] for e in queue._events] == ["user_0", "user_1", "user_2"]
+    print("✅ Overflow policies work")
+
+def test_poison_event_is_isolated():
+    """After retries a failing event is dropped and the rest are written"""
+    written = []
+    def handler(batch):
+        if any(e["user_id"] == "user_bad" for e in batch):
+            raise RuntimeError("bad event")
+        written.extend(batch)
+
+    queue = AnalyticsEventQueue(handler, capacity=100, batch_size=3, flush_interval=0.01, max_attempts=2)
+    queue.start()
+    queue.enqueue(make_event(1))
+    queue.enqueue(make_event("bad"))
+    queue.enqueue(make_event(2))
+    queue.stop()
+    assert [e["user_id"] for e in written] == ["user_1", "user_2"]
+    assert queue.stats()["dropped"] == 1
+    print("✅ Failing events are isolated and dropped")
+
+if __name__ == "__main__":
+    test_size_threshold_flush()
+    test_time_threshold_and_drain()
+    test_overflow_policies()
+    test_poison_event_is_isolated()
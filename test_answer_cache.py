@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the semantic answer cache.
+Uses a fake embeddings model, so no Gemini API key is needed.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.answer_cache import AnswerCache, location_bucket, text_key
+
+class WordEmbeddings:
+    """Bag of known words, so rephrasings with the same words are identical"""
+
+    WORDS = ["warranty", "tyre", "car", "bike", "price", "dealer"]
+
+    def embed_query(self, text):
+        words = text.lower().replace("?", "").split()
+        return [float(words.count(w)) + 0.01 for w in self.WORDS]
+
+def make_cache(**kwargs):
+    return AnswerCache(embeddings=WordEmbeddings(), **kwargs)
+
+def test_hits_similar_questions_in_bucket():
+    """Near-identical questions hit; other regions and topics miss"""
+    cache = make_cache(threshold=0.95)
+    cache.store(cache.embed("What is the tyre warranty?"), "What is the tyre warranty?",
+                "Pune, Maharashtra", 1, "Five years.")
+    hit = cache.lookup(cache.embed("tyre warranty?"), "Mumbai, Maharashtra", 1)
+    assert hit and hit["answer"] == "Five years."
+    assert cache.lookup(cache.embed("tyre warranty?"), "Chennai, Tamil Nadu", 1) is None
+    assert cache.lookup(cache.embed("bike tyre price"), "Pune, Maharashtra", 1) is None
+    assert location_bucket("Maharashtra (19.0760, 72.8777)") == "maharashtra"
+    assert location_bucket(None) == location_bucket("Unknown") == "unknown"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    print("✅ Similar questions hit within a location bucket")
+
+def test_ttl_and_size_bound():
+    """Entries expire and the least recently used are evicted"""
+    cache = make_cache(ttl_seconds=0.05, max_entries=2)
+    for question in ("warranty", "car price", "bike price"):
+        cache.store(cache.embed(question), question, None, 1, f"answer for {question}")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(cache.embed("warranty"), None, 1) is None
+    assert cache.lookup(cache.embed("bike price"), None, 1)["answer"] == "answer for bike price"
+    time.sleep(0.06)
+    assert cache.lookup(cache.embed("bike price"), None, 1) is None
+    assert cache.stats()["entries"] == 0
+    print("✅ TTL expiry and size bound")
+
+def test_invalidated_by_new_index():
+    """A new index generation drops old answers; late stale answers are ignored"""
+    cache = make_cache()
+    vector = cache.embed("dealer")
+    cache.store(vector, "dealer", None, 1, "old answer")
+    assert cache.lookup(vector, None, 2) is None
+    cache.store(vector, "dealer", None, 1, "answered on the old index")
+    assert cache.stats()["entries"] == 0
+    cache.store(vector, "dealer", None, 2, "new answer")
+    assert cache.lookup(vector, None, 2)["answer"] == "new answer"
+    assert cache.stats()["invalidations"] == 1
+    print("✅ Invalidated when the index changes")
+
+def test_text_keys_need_no_embedding():
+    """Exact size/pattern questions are keyed on their normalised text"""
+    cache = make_cache()
+    cache.store(text_key("185/65 R15 price?"), "185/65 R15 price?", None, 1, "From Rs 4,000.")
+    cache.store(cache.embed("tyre price"), "tyre price", None, 1, "Depends on the size.")
+    assert cache.lookup(text_key("  185/65 r15   PRICE? "), None, 1)["answer"] == "From Rs 4,000."
+    assert cache.lookup(text_key("195/55 R16 price?"), None, 1) is None
+    assert cache.lookup(cache.embed("tyre price"), None, 1)["answer"] == "Depends on the size."
+    print("✅ Text-keyed entries for exact-match questions")
+
+if __name__ == "__main__":
+    test_hits_similar_questions_in_bucket()
+    test_ttl_and_size_bound()
+    test_invalidated_by_new_index()
+    test_text_keys_need_no_embedding()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for near-duplicate description elimination.
+Needs no catalog or API key.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from app.catalog import split_descriptions
+from app.dedup import DescriptionDeduper
+from app.query_analyzer import QueryAnalyzer, FilteredRetriever
+
+FEATURES = ("Wide circumferential grooves evacuate water quickly for confident wet braking, "
+            "while the optimised tread compound lowers rolling resistance and improves fuel "
+            "efficiency over the whole life of the tyre. Silica rich rubber keeps the tread "
+            "flexible in cold weather and a reinforced sidewall resists cuts on rough roads.")
+
+def test_splits_long_fields():
+    """Long free text is split off; key columns stay with the row"""
+    row = {"Brand": "Apollo", "Pattern": "Alnac 4G", "Size": "185/65 R15", "Price": 5200, "Features": FEATURES}
+    short, description = split_descriptions(row, 200)
+    assert "Features" not in short and short["Size"] == "185/65 R15"
+    assert description == f"Features: {FEATURES}"
+    assert split_descriptions(row, 1000)[1] == ""
+    print("✅ Long descriptive fields split off")
+
+def test_groups_exact_and_near_duplicates():
+    """Copies and near-copies share one document, other patterns do not"""
+    deduper = DescriptionDeduper(threshold=0.8)
+    first, new = deduper.assign("apollo|alnac 4g", FEATURES)
+    assert new
+    assert deduper.assign("apollo|alnac 4g", FEATURES) == (first, False)
+    near = FEATURES.replace("confident", "very confident")
+    assert deduper.assign("apollo|alnac 4g", near) == (first, False)
+    other, new = deduper.assign("apollo|alnac 4g", "Deep lugs give traction in mud and loose soil for farm use.")
+    assert new and other != first
+    assert deduper.assign("apollo|amazer 4g life", FEATURES)[1]
+
+    report = deduper.report(dim=768)
+    assert report["descriptions"] == 5 and report["shared_documents"] == 3
+    assert report["exact_duplicates"] == 1 and report["near_duplicates"] == 1
+    assert report["description_copies_embedded_saved"] == 2
+    assert report["index_bytes_saved"] == report["embedded_bytes_saved"] - 3 * 768 * 4
+    print("✅ Exact and near duplicates grouped per pattern")
+
+class SharedStore:
+    """Two variants of one pattern pointing at the same description"""
+
+    def __init__(self):
+        self.variants = [
+            Document(page_content=f"Apollo Alnac 4G {size}", metadata={"row_id": size, "shared_id": "shared:1"})
+            for size in ("185/65 R15", "195/55 R16")
+        ]
+
+    def similarity_search(self, query, k=5, filter=None):
+        return self.variants
+
+    def get(self, ids=None, include=None):
+        assert ids == ["shared:1:0"]
+        return {"ids": ids, "documents": [FEATURES], "metadatas": [{"row_id": "shared:1"}]}
+
+def test_retriever_attaches_shared_once():
+    """Retrieved variants bring their shared description along, once"""
+    retriever = FilteredRetriever(store=SharedStore(), analyzer=QueryAnalyzer(), k=5)
+    documents = retriever.invoke("alnac tyres")
+    assert [d.page_content for d in documents][-1] == FEATURES
+    assert len(documents) == 3
+    assert retriever.stats()["shared_attached"] == 1
+    print("✅ Shared description attached once to retrieved variants")
+
+if __name__ == "__main__":
+    test_splits_long_fields()
+    test_groups_exact_and_near_duplicates()
+    test_retriever_attaches_shared_once()
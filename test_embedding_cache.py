@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script for the two-tier embedding cache.
+Uses a fake embeddings model, so no Gemini API key is needed.
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.embedding_cache import CachedEmbeddings
+
+class FakeEmbeddings:
+    """Counts calls and returns a deterministic vector per text"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 0.5]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._vector(text)
+
+def test_memory_tier():
+    """Repeated and re-spaced questions are served from memory"""
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, model_name="fake", memory_size=10)
+    first = cache.embed_query("Show me tyres for Toyota cars")
+    second = cache.embed_query("  show me tyres   for toyota cars ")
+    assert first == second
+    assert fake.calls == 1
+    assert cache.stats()["memory_hits"] == 1
+    print("✅ Memory tier works")
+
+def test_disk_tier_survives_restart():
+    """A new cache instance reads vectors written by an earlier one"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        fake = FakeEmbeddings()
+        CachedEmbeddings(fake, model_name="fake", disk_path=path).embed_documents(["Alnac 4G", "Apterra HT2"])
+
+        restarted = CachedEmbeddings(fake, model_name="fake", disk_path=path)
+        vectors = restarted.embed_documents(["Alnac 4G", "Apterra HT2"])
+        assert fake.calls == 1
+        assert restarted.stats()["disk_hits"] == 2
+        assert vectors[0] == fake._vector("Alnac 4G")
+    print("✅ Disk tier survives restarts")
+
+def test_documents_and_queries_are_separate():
+    """Query and document embeddings of the same text are cached separately"""
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, model_name="fake")
+    cache.embed_query("warranty")
+    cache.embed_documents(["warranty"])
+    assert fake.calls == 2
+    print("✅ Query and document entries are kept apart")
+
+def test_lru_eviction_and_batch_dedup():
+    """Duplicates in a batch are embedded once and the LRU stays bounded"""
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, model_name="fake", memory_size=2)
+    cache.embed_documents(["a", "b", "a", "c"])
+    assert cache.stats()["misses"] == 3
+    assert cache.stats()["memory_entries"] == 2
+    print("✅ LRU eviction and batch de-duplication work")
+
+if __name__ == "__main__":
+    test_memory_tier()
+    test_disk_tier_survives_restart()
+    test_documents_and_queries_are_separate()
+    test_lru_eviction_and_batch_dedup()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for the NumPy flat vector index backend.
+Uses a fake embeddings model, so no Gemini API key is needed.
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from app.flat_index import FlatIndex, MAX_MASKS
+from app.quantization import CompressedVectors
+
+class AxisEmbeddings:
+    """Maps a few words onto axes so nearest neighbours are predictable"""
+
+    AXES = {"car": [1.0, 0.0, 0.0], "bike": [0.0, 1.0, 0.0], "truck": [0.0, 0.0, 1.0]}
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [sum(axis) for axis in zip(*[self.AXES[w] for w in text.split() if w in self.AXES])]
+
+def make_index(path=None):
+    index = FlatIndex(AxisEmbeddings(), path=path)
+    index.add_texts(
+        ["car", "car bike", "bike", "truck"],
+        metadatas=[{"category_key": "car"}, {"category_key": "car"}, {"category_key": "bike"}, {"category_key": "truck"}],
+        ids=["a", "b", "c", "d"]
+    )
+    return index
+
+def test_top_k_and_filters():
+    """Cosine top-k, Chroma-style where filters and upserts"""
+    index = make_index()
+    assert [d.page_content for d in index.similarity_search("car", k=2)] == ["car", "car bike"]
+    hits = index.similarity_search("bike", k=1, filter={"category_key": "car"})
+    assert [d.page_content for d in hits] == ["car bike"]
+    assert index.similarity_search("bike", k=5, filter={"$and": [{"category_key": "bike"}, {"rim": 17}]}) == []
+
+    index.add_texts(["truck"], metadatas=[{"category_key": "car"}], ids=["a"])
+    assert len(index) == 4
+    assert index.similarity_search("truck", k=1, filter={"category_key": "car"})[0].page_content == "truck"
+    print("✅ Top-k search, filters and upserts work")
+
+def test_delete_and_persistence():
+    """Deleted rows disappear and a saved index loads back identically"""
+    with tempfile.TemporaryDirectory() as tmp:
+        index = make_index(path=tmp)
+        index.delete(ids=["b"])
+        index.persist()
+
+        loaded = FlatIndex.load(tmp, AxisEmbeddings())
+        assert loaded.get(include=["metadatas"])["ids"] == ["a", "c", "d"]
+        assert [d.page_content for d in loaded.similarity_search("bike", k=1)] == ["bike"]
+    print("✅ Delete and save/load work")
+
+def test_quantised_search_rescores_exactly():
+    """int8 + PCA candidates are re-scored against the float32 originals"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 64)).astype(np.float32)
+    ids = [str(i) for i in range(len(vectors))]
+    index = FlatIndex.from_arrays(None, vectors, ids, [""] * len(ids), [{}] * len(ids))
+    query = vectors[123] + 0.1 * rng.standard_normal(64).astype(np.float32)
+    exact = index.search_vector(query, 5)
+
+    index.compressed = CompressedVectors.build(vectors, kind="int8", pca_dim=32)
+    assert index.compressed.nbytes < vectors.nbytes / 4
+    approx = index.search_vector(query, 5)
+    assert approx[0] == exact[0]
+    assert abs(approx[0][1] - exact[0][1]) < 1e-6
+    print("✅ Quantised search re-scores with exact similarities")
+
+def test_mask_cache_bounded_and_empty_include():
+    """Filter masks are evicted past the cap; include=[] returns ids only"""
+    index = make_index()
+    for rim in range(MAX_MASKS + 10):
+        index.similarity_search("car", k=1, filter={"rim": rim})
+    assert len(index._masks) == MAX_MASKS
+    assert index.get(include=[]) == {"ids": ["a", "b", "c", "d"]}
+    print("✅ Mask cache bounded, empty include honoured")
+
+if __name__ == "__main__":
+    test_top_k_and_filters()
+    test_delete_and_persistence()
+    test_quantised_search_rescores_exactly()
+    test_mask_cache_bounded_and_empty_include()
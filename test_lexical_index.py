@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the BM25 / inverted catalog index and hybrid retrieval.
+Builds a tiny in-memory catalog, so no CSV, Chroma or API key is needed.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from app.catalog import build_document
+from app.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.query_analyzer import QueryAnalyzer, FilteredRetriever
+
+ROWS = [
+    {"Brand": "Apollo", "Pattern": "Alnac 4G", "Tyre Size": "185/65 R15", "Category": "Passenger Car", "Price": "₹ 5,400"},
+    {"Brand": "Apollo", "Pattern": "Apterra HT2", "Tyre Size": "265/65 R17", "Category": "SUV", "Price": "₹ 14,200"},
+    {"Brand": "Apollo", "Pattern": "Apterra AT2", "Tyre Size": "265/65 R17", "Category": "SUV", "Price": "₹ 15,100"},
+    {"Brand": "Vredestein", "Pattern": "Pinza HT", "Tyre Size": "265/65 R17", "Category": "SUV", "Price": "₹ 18,500"},
+    {"Brand": "Apollo", "Pattern": "Actigrip R3", "Tyre Size": "90/90-17", "Category": "Two Wheeler", "Price": "₹ 2,100"},
+]
+
+def make_index():
+    documents = []
+    for number, row in enumerate(ROWS):
+        text, metadata = build_document(row)
+        metadata["row_id"] = f"row{number}"
+        documents.append(Document(page_content=text, metadata=metadata))
+    return LexicalIndex.from_documents(documents)
+
+class ExplodingStore:
+    """Fails the test if the vector path is used"""
+
+    def similarity_search(self, *args, **kwargs):
+        raise AssertionError("vector search should not run")
+
+def test_exact_size_and_pattern():
+    """Sizes match in any spelling; longer pattern names win"""
+    index = make_index()
+    hits = index.exact_search("price of 265/65r17?", k=5)
+    assert {d.metadata["row_id"] for d in hits} == {"row1", "row2", "row3"}
+    hits = index.exact_search("Is the Apterra HT2 good off-road?", k=5)
+    assert [d.metadata["row_id"] for d in hits] == ["row1"]
+    assert index.exact_search("Which tyre is best for monsoon?") == []
+    print("✅ Exact size and pattern lookups work")
+
+def test_exact_queries_skip_vector_search():
+    """An exact match is answered lexically, quickly and without embeddings"""
+    retriever = FilteredRetriever(store=ExplodingStore(), analyzer=QueryAnalyzer(), lexical=make_index(), k=3)
+    start = time.perf_counter()
+    hits = retriever.invoke("alnac 4g 185/65 R15 price")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert hits[0].metadata["row_id"] == "row0"
+    assert retriever.stats()["lexical_only"] == 1
+    print(f"✅ Exact query served lexically in {elapsed_ms:.3f} ms")
+
+def test_bm25_and_fusion():
+    """BM25 ranks term matches and RRF merges both result lists"""
+    index = make_index()
+    assert index.search("vredestein", k=1)[0].metadata["row_id"] == "row3"
+    lexical = index.search("apollo suv", k=3)
+    vector = [index.documents[4], index.documents[1]]
+    fused = reciprocal_rank_fusion([vector, lexical], k=3)
+    assert fused[0].metadata["row_id"] == "row1"
+    assert len({d.metadata["row_id"] for d in fused}) == 3
+    print("✅ BM25 ranking and rank fusion work")
+
+if __name__ == "__main__":
+    test_exact_size_and_pattern()
+    test_exact_queries_skip_vector_search()
+    test_bm25_and_fusion()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for token-budgeted prompt assembly.
+Needs no LLM or API key.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from app.prompt_budget import PromptAssembler
+
+# 40 characters of fixed instructions = 10 tokens at 4 chars per token
+PROMPT = PromptTemplate.from_template("{user_location}{chat_history}{context}{question}" + "x" * 40)
+
+def documents(*sizes):
+    return [Document(page_content=str(rank) * size) for rank, size in enumerate(sizes)]
+
+def test_everything_fits():
+    """Under budget nothing is dropped and the parts add up"""
+    assembler = PromptAssembler(budget=1000, history_tokens=100, chars_per_token=4)
+    _, tokens = assembler.build(PROMPT, "q" * 8, [("hi", "hello")], documents(40, 40), "Pune")
+    assert tokens["instructions"] == 10 and tokens["question"] == 2 and tokens["location"] == 1
+    assert tokens["documents_dropped"] == 0 and tokens["turns_dropped"] == 0
+    assert tokens["total"] <= tokens["budget"]
+    print("✅ Prompt under budget kept whole")
+
+def test_trims_lowest_ranked_and_oldest():
+    """Low-ranked documents and old turns are dropped first"""
+    assembler = PromptAssembler(budget=60, history_tokens=12, chars_per_token=4)
+    history = [("old question " * 3, "old answer " * 3), ("new q", "new a")]
+    text, tokens = assembler.build(PROMPT, "question", history, documents(80, 80, 80), "")
+    assert tokens["documents_kept"] == 1 and tokens["documents_dropped"] == 2
+    assert "0" * 80 in text and "1" * 80 not in text
+    assert tokens["turns_kept"] == 1 and "new q" in text and "old question" not in text
+    assert tokens["total"] <= 60
+    print("✅ Lowest-ranked documents and oldest turns trimmed")
+
+def test_truncates_oversized_top_document():
+    """A top document bigger than the whole budget is cut, not dropped"""
+    assembler = PromptAssembler(budget=40, history_tokens=0, chars_per_token=4)
+    text, tokens = assembler.build(PROMPT, "question", [], documents(1000), "")
+    assert tokens["truncated"] and tokens["documents_kept"] == 1
+    assert tokens["total"] <= 40
+    stats = assembler.stats()
+    assert stats["prompts"] == 1 and stats["truncations"] == 1 and stats["over_budget"] == 0
+    print("✅ Oversized top document truncated")
+
+if __name__ == "__main__":
+    test_everything_fits()
+    test_trims_lowest_ranked_and_oldest()
+    test_truncates_oversized_top_document()
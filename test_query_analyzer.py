@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for query analysis and metadata-filtered retrieval.
+Uses a fake vector store, so no Chroma collection or API key is needed.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from app.catalog import build_document
+from app.query_analyzer import QueryAnalyzer, FilteredRetriever, to_where
+
+class FakeStore:
+    """Records the filters it was searched with; only 'bike' has documents"""
+
+    def __init__(self):
+        self.filters = []
+
+    def similarity_search(self, query, k=5, filter=None):
+        self.filters.append(filter)
+        if filter is None or filter == {"category_key": "bike"}:
+            return [Document(page_content="doc")]
+        return []
+
+def test_extracts_filters():
+    """Sizes, rims, categories and brands are normalised"""
+    analyzer = QueryAnalyzer()
+    assert analyzer.analyze("Price of 185/65R15 for my sedan?") == {
+        "size_key": "185/65r15", "rim": 15, "category_key": "car"
+    }
+    assert analyzer.analyze("apollo tyres for a 17 inch motorcycle rim") == {
+        "rim": 17, "category_key": "bike", "brand_key": "apollo"
+    }
+    assert analyzer.analyze("What is your warranty policy?") == {}
+    print("✅ Filters extracted from questions")
+
+def test_catalog_metadata_matches_query_keys():
+    """Catalog rows carry the same normalised keys the analyser produces"""
+    _, metadata = build_document({"Brand": "Apollo", "Tyre Size": "185/65 R15", "Category": "Passenger Car"})
+    filters = QueryAnalyzer().analyze("apollo 185/65 r15 car tyre")
+    for field, value in filters.items():
+        assert metadata[field] == value, field
+    print("✅ Catalog metadata matches query filters")
+
+def test_relaxes_until_results():
+    """Filters are relaxed step by step, ending unfiltered"""
+    store = FakeStore()
+    retriever = FilteredRetriever(store=store, analyzer=QueryAnalyzer(), k=5)
+    assert [d.page_content for d in retriever.invoke("vredestein scooter tyre")] == ["doc"]
+    assert store.filters[0] == to_where({"brand_key": "vredestein", "category_key": "bike"})
+    assert store.filters[-1] == {"category_key": "bike"}
+
+    store.filters.clear()
+    retriever.invoke("tractor tyres")
+    assert store.filters == [{"category_key": "tractor"}, None]
+    assert retriever.stats() == {"queries": 2, "lexical_only": 0, "filtered": 0, "relaxed": 1, "unfiltered": 1,
+                                 "shared_attached": 0}
+    print("✅ Filters relax down to an unfiltered search")
+
+if __name__ == "__main__":
+    test_extracts_filters()
+    test_catalog_metadata_matches_query_keys()
+    test_relaxes_until_results()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the RAG pipeline's condense-question step.
+Uses fake LLMs and a fake retriever, so no Gemini API key is needed.
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.prompts import PromptTemplate
+from app.query_analyzer import QueryAnalyzer
+from app.rag_pipeline import RAGPipeline, QuestionCondenser, format_history
+
+PROMPT = PromptTemplate.from_template("{chat_history}|{context}|{question}|{user_location}")
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content="What is the price of Apollo Alnac 4G?")
+
+    async def astream(self, prompt):
+        self.prompts.append(prompt)
+        for word in ("Rs ", "5200"):
+            yield AIMessageChunk(content=word)
+
+class FakeRetriever:
+    analyzer = QueryAnalyzer()
+    lexical = None
+
+    def __init__(self):
+        self.queries = []
+
+    async def ainvoke(self, query):
+        self.queries.append(query)
+        return [Document(page_content="Apollo Alnac 4G 185/65 R15")]
+
+def make_pipeline():
+    condenser = QuestionCondenser(llm=FakeLLM())
+    return RAGPipeline(FakeRetriever(), condenser, FakeLLM(), PROMPT), condenser
+
+def test_skips_condense_when_not_needed():
+    """First turns and self-contained questions make no rewrite call"""
+    pipeline, condenser = make_pipeline()
+    parts = asyncio.run(collect(pipeline, "Best tyres for my SUV?", []))
+    assert [p["delta"] for p in parts[:-1]] == ["Rs ", "5200"]
+    assert parts[-1] == {"answer": "Rs 5200", "question": "Best tyres for my SUV?", "path": "no_history",
+                         "tokens": None}
+
+    history = [("Tell me about Alnac 4G", "It is a comfort tyre.")]
+    result = asyncio.run(pipeline.ainvoke({"question": "What is the warranty on car tyres?", "chat_history": history}))
+    assert result["path"] == "standalone"
+    assert condenser.llm.prompts == []
+    assert "Assistant: It is a comfort tyre." in pipeline.answer_llm.prompts[-1]
+    print("✅ Condense skipped without history and for standalone questions")
+
+def test_rewrites_follow_ups_once():
+    """Follow-ups are rewritten, and the rewrite is memoised per history"""
+    pipeline, condenser = make_pipeline()
+    history = [("Tell me about Alnac 4G", "It is a comfort tyre.")]
+    first = asyncio.run(pipeline.ainvoke({"question": "how much is it?", "chat_history": history}))
+    second = asyncio.run(pipeline.ainvoke({"question": "How much is  it?", "chat_history": history}))
+    assert first["path"] == "rewritten" and second["path"] == "memoized"
+    assert pipeline.retriever.queries == ["What is the price of Apollo Alnac 4G?"] * 2
+    assert len(condenser.llm.prompts) == 1
+    assert condenser.stats()["paths"] == {"no_history": 0, "standalone": 0, "memoized": 1, "rewritten": 1}
+    assert format_history([("q", "")]) == "Human: q"
+    print("✅ Follow-ups rewritten once and memoised")
+
+async def collect(pipeline, question, history):
+    return [part async for part in pipeline.astream({"question": question, "chat_history": history})]
+
+if __name__ == "__main__":
+    test_skips_condense_when_not_needed()
+    test_rewrites_follow_ups_once()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for per-session memory (rolling summary and slots).
+Uses a fake LLM, so no Gemini API key is needed.
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.session_memory import SessionMemoryStore, extract_slots
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+class SummaryLLM:
+    """Summarises by listing the customer questions it was shown"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        questions = [line[len("Customer: "):] for line in prompt.splitlines() if line.startswith("Customer: ")]
+        previous = prompt.split("Current summary:\n")[1].split("\n")[0]
+        summary = [] if previous == "(none)" else [previous]
+        return Reply(" | ".join(summary + questions))
+
+def test_extract_slots():
+    """Vehicle, size, usage and priorities come from the question text"""
+    slots = extract_slots("I drive a Hyundai Creta mostly on the highway, want good mileage")
+    assert slots["vehicle"] == "hyundai creta"
+    assert slots["usage"] == ["highway"]
+    assert slots["priorities"] == ["fuel efficiency"]
+    assert extract_slots("hello there") == {}
+    print("✅ Slots extracted from questions")
+
+def test_recent_turns_and_pending():
+    """Only the last turns stay recent; older ones wait for a fold"""
+    store = SessionMemoryStore(recent_turns=2, max_pending=3, llm=SummaryLLM())
+    for i in range(4):
+        store.record("s", f"question {i}", f"answer {i}")
+    memory = store.get("s")
+    assert memory.recent == [("question 2", "answer 2"), ("question 3", "answer 3")]
+    assert memory.pending == [("question 0", "answer 0"), ("question 1", "answer 1")]
+    assert store.history("s") == memory.pending + memory.recent
+    for i in range(4, 7):
+        store.record("s", f"question {i}", f"answer {i}")
+    assert len(memory.pending) == 3 and store.stats()["turns_dropped"] == 2
+    print("✅ Recent turns kept verbatim, pending turns bounded")
+
+def test_fold_into_summary():
+    """Folding replaces pending turns with the summary; context renders slots and summary"""
+    llm = SummaryLLM()
+    store = SessionMemoryStore(recent_turns=1, llm=llm)
+    store.observe("s", "Tyres for my Honda City, I want comfort", "Pune, Maharashtra")
+    for i in range(3):
+        store.record("s", f"question {i}", f"answer {i}")
+    asyncio.run(store.fold("s"))
+    memory = store.get("s")
+    assert memory.pending == [] and memory.summary == "question 0 | question 1"
+    assert store.history("s") == [("question 2", "answer 2")]
+    context = store.context("s")
+    assert "vehicle: honda city" in context and "priorities: comfort" in context
+    assert "location: Pune, Maharashtra" in context
+    assert context.endswith("Earlier conversation (summary): question 0 | question 1")
+    assert store.stats()["folds"] == 1 and llm.calls == 1
+    print("✅ Pending turns folded into the summary")
+
+def test_fold_runs_in_background():
+    """Inside an event loop, recording a turn starts the fold itself"""
+    store = SessionMemoryStore(recent_turns=1, llm=SummaryLLM())
+
+    async def converse():
+        for i in range(3):
+            store.record("s", f"question {i}", f"answer {i}")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(converse())
+    assert store.get("s").summary.startswith("question 0")
+    assert store.get("s").pending == []
+    print("✅ Folds scheduled in the background")
+
+def test_fold_keeps_identical_later_turns():
+    """A repeated turn queued during a fold is summarised too, not dropped with the first"""
+    llm = SummaryLLM()
+    store = SessionMemoryStore(recent_turns=1, llm=llm)
+    store.record("s", "warranty?", "Five years.")
+    store.record("s", "warranty?", "Five years.")
+    original = llm.ainvoke
+
+    async def summarise_while_user_repeats(prompt):
+        if llm.calls == 0:
+            store.record("s", "warranty?", "Five years.")
+        return await original(prompt)
+
+    llm.ainvoke = summarise_while_user_repeats
+    asyncio.run(store.fold("s"))
+    assert llm.calls == 2
+    assert store.get("s").summary == "warranty? | warranty?"
+    assert store.get("s").pending == []
+    print("✅ Identical turns are removed by count, not by value")
+
+def test_resume_replays_missed_turns():
+    """A resume token brings back the session and only the turns after last_seq"""
+    store = SessionMemoryStore(recent_turns=2, llm=SummaryLLM())
+    assert [store.record("s", f"question {i}", f"answer {i}") for i in range(3)] == [1, 2, 3]
+    token = store.token("s")
+    store.detach("s")
+    assert store.stats()["disconnected"] == 1
+    assert store.resume(token) == "s"
+    assert store.turns_since("s", 1) == [(2, "question 1", "answer 1"), (3, "question 2", "answer 2")]
+    assert store.turns_since("s", 3) == []
+    assert store.resume("unknown-token") is None and store.resume(None) is None
+    store.drop("s")
+    assert store.resume(token) is None
+    assert store.stats()["resumes"] == 1 and store.stats()["resume_misses"] == 2
+    print("✅ Sessions resume from a token and replay missed turns")
+
+def test_resume_keeps_identity():
+    """User, start time and disconnect identity survive a resume"""
+    store = SessionMemoryStore(llm=SummaryLLM())
+    memory = store.get("s")
+    memory.user_id, memory.started_at = "user_1", "start"
+    first = store.detach("s")
+    assert store.find("s").detached_at == first
+    assert store.resume(memory.token) == "s"
+    resumed = store.find("s")
+    assert resumed.connections == 1 and (resumed.user_id, resumed.started_at) == ("user_1", "start")
+    assert store.find("missing") is None and not store.has("missing")
+    print("✅ Resumed sessions keep their user and start time")
+
+if __name__ == "__main__":
+    test_extract_slots()
+    test_recent_turns_and_pending()
+    test_fold_into_summary()
+    test_fold_runs_in_background()
+    test_fold_keeps_identical_later_turns()
+    test_resume_replays_missed_turns()
+    test_resume_keeps_identity()